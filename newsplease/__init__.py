@@ -1,7 +1,12 @@
+import asyncio
 import datetime
+import logging
 import os
 import sys
+import threading
+import traceback
 import urllib
+from multiprocessing import Pool
 
 from bs4.dammit import EncodingDetector
 from six.moves import urllib
@@ -12,68 +17,182 @@ from newsplease.pipeline.extractor import article_extractor
 from newsplease.crawler.items import NewscrawlerItem
 from dotmap import DotMap
 from newsplease.pipeline.pipelines import ExtractedInformationStorage
-from newsplease.crawler.simple_crawler import SimpleCrawler
+from newsplease.crawler.simple_crawler import SimpleCrawler, MAX_WORKERS
+from newsplease.crawler.async_crawler import AsyncCrawler
+from newsplease.helper_classes.checkpoint import LineCheckpoint
+from newsplease.helper_classes.jsonl_sink import JsonLinesSink
+
+LOGGER = logging.getLogger(__name__)
+
+
+# extractors used by the library mode if no other extractors are given
+DEFAULT_EXTRACTORS = ['newspaper_extractor', 'readability_extractor', 'date_extractor', 'lang_detect_extractor']
 
 
 class EmptyResponseError(ValueError):
     pass
 
 
-class NewsPlease:
+class ExtractionError(Exception):
     """
-    Access news-please functionality via this interface
+    Returned by the batch functions in place of an article if the extraction of a single document failed
     """
 
-    @staticmethod
-    def from_warc(warc_record, decode_errors="replace", fetch_images=True):
+    def __init__(self, url, message, details=None):
+        super(ExtractionError, self).__init__(url, message, details)
+        self.url = url
+        self.message = message
+        # the formatted traceback of the original exception, which itself might not be picklable
+        self.details = details
+
+    def __str__(self):
+        return '%s: %s' % (self.url, self.message)
+
+
+def _read_warc_record(warc_record):
+    """
+    Reads the parts of a WARC record that are needed for the extraction, so that they can be sent to other processes.
+    :return: A tuple of the raw payload, the Content-Type header, the target URL and the WARC date of the record
+    """
+    content_type = warc_record.http_headers.get_header('Content-Type') if warc_record.http_headers else None
+    return (warc_record.raw_stream.read(), content_type, warc_record.rec_headers.get_header('WARC-Target-URI'),
+            warc_record.rec_headers.get_header('WARC-Date'))
+
+
+def _decode_warc_record(warc_record, decode_errors="replace"):
+    """
+    Reads and decodes the payload of a WARC record.
+    :return: A tuple of the decoded html, the target URL and the WARC date of the record
+    """
+    return _decode_warc_payload(*_read_warc_record(warc_record), decode_errors=decode_errors)
+
+
+def _decode_warc_payload(raw_stream, content_type, url, download_date, decode_errors="replace"):
+    """
+    Decodes the payload of a WARC record that was read by _read_warc_record.
+    :return: A tuple of the decoded html, the target URL and the WARC date of the record
+    """
+    encoding = None
+    try:
+        encoding = content_type.split(';')[1].split('=')[1]
+    except:
+        pass
+    if not encoding:
+        encoding = EncodingDetector.find_declared_encoding(raw_stream, is_html=True)
+    if not encoding:
+        # assume utf-8
+        encoding = 'utf-8'
+
+    try:
+        html = raw_stream.decode(encoding, errors=decode_errors)
+    except LookupError:
+        # non-existent encoding: fallback to utf-9
+        html = raw_stream.decode('utf-8', errors=decode_errors)
+    if not html:
+        raise EmptyResponseError()
+    return html, url, download_date
+
+
+# configuration of the extraction session used within a batch worker process, set by _init_batch_worker
+_batch_worker_config = None
+
+# number of chunks per worker process that are submitted to the pool but whose results have not been consumed yet
+BATCH_CHUNKS_IN_FLIGHT_PER_PROCESS = 4
+
+
+def _gate_batch_tasks(tasks, semaphore, stopped):
+    """
+    Yields the tasks of a batch, but waits for a slot of semaphore before each task, so that the task feeder of a pool
+    does not read the whole input into memory. A slot is released whenever a result has been consumed.
+    :param stopped: a threading.Event, once it is set, no more tasks are yielded
+    """
+    for task in tasks:
+        semaphore.acquire()
+        if stopped.is_set():
+            return
+        yield task
+
+
+def _init_batch_worker(extractors, fetch_images, fields, decode_errors):
+    """
+    Initializes a batch worker process, i.e., sets up its extraction session before the first document arrives.
+    """
+    global _batch_worker_config
+    _batch_worker_config = (extractors, fetch_images, fields, decode_errors)
+    NewsPlease.session(extractors=extractors, fetch_images=fetch_images, fields=fields)
+
+
+def _extract_batch_document_in_worker(task):
+    """
+    Extracts a single document of a batch within a worker process, see _extract_batch_document.
+    """
+    return _extract_batch_document(task, _batch_worker_config)
+
+
+def _extract_batch_document(task, config):
+    """
+    Extracts a single document of a batch. Errors are caught and returned, so that one bad document does not abort
+    the whole batch.
+    :param task: A tuple of the index of the document, its kind ('html' or 'warc') and the document itself
+    :param config: A tuple of the extractors, fetch_images, fields and decode_errors
+    :return: A tuple of the index and either a NewsArticle or an ExtractionError
+    """
+    index, kind, document = task
+    extractors, fetch_images, fields, decode_errors = config
+    url = document[2] if kind == 'warc' else document[1]
+    try:
+        session = NewsPlease.session(extractors=extractors, fetch_images=fetch_images, fields=fields)
+        if kind == 'warc':
+            html, url, download_date = _decode_warc_payload(*document, decode_errors=decode_errors)
+        else:
+            html, url, download_date = document
+        return index, session.from_html(html, url=url, download_date=download_date)
+    except Exception as e:
+        return index, ExtractionError(url, '%s: %s' % (type(e).__name__, e), traceback.format_exc())
+
+
+class ExtractionSession:
+    """
+    Holds an initialized chain of extractors, the cleaner and the comparer, so that they are set up only once and can
+    then be reused for many articles. The extractors do not keep any per-article state, hence a session can safely be
+    shared by multiple threads. Use NewsPlease.session(...) to get a cached session instead of creating one yourself.
+    """
+
+    def __init__(self, extractors=None, fetch_images=True, fields=None):
         """
-        Extracts relevant information from a WARC record. This function does not invoke scrapy but only uses the article
-        extractor.
-        :return:
+        :param extractors: List of extractors (see the ArticleMasterExtractor section in config.cfg), if None, the
+        default extractors of the library mode are used
+        :param fetch_images: if False and the default extractors are used, newspaper will not fetch images
+        :param fields: List of NewsArticle fields to extract, e.g., ['title', 'date_publish', 'language']. Extractors
+        and comparers that do not contribute to these fields are skipped and all other extracted fields are None. If
+        None, all fields are extracted.
         """
-        raw_stream = warc_record.raw_stream.read()
-        encoding = None
-        try:
-            encoding = warc_record.http_headers.get_header('Content-Type').split(';')[1].split('=')[1]
-        except:
-            pass
-        if not encoding:
-            encoding = EncodingDetector.find_declared_encoding(raw_stream, is_html=True)
-        if not encoding:
-            # assume utf-8
-            encoding = 'utf-8'
+        if extractors is None:
+            extractors = list(DEFAULT_EXTRACTORS)
+            if not fetch_images:
+                extractors[0] = ("newspaper_extractor_no_images", "NewspaperExtractorNoImages")
+        self.extractor_list = extractors
+        self.fields = fields
+        self.extractor = article_extractor.Extractor(self.extractor_list, fields=fields)
 
-        try:
-            html = raw_stream.decode(encoding, errors=decode_errors)
-        except LookupError:
-            # non-existent encoding: fallback to utf-9
-            html = raw_stream.decode('utf-8', errors=decode_errors)
-        if not html:
-            raise EmptyResponseError()
-        url = warc_record.rec_headers.get_header('WARC-Target-URI')
-        download_date = warc_record.rec_headers.get_header('WARC-Date')
-        article = NewsPlease.from_html(html, url=url, download_date=download_date, fetch_images=fetch_images)
-        return article
+    def from_warc(self, warc_record, decode_errors="replace"):
+        """
+        Extracts relevant information from a WARC record.
+        :param warc_record:
+        :param decode_errors: error handling scheme used when decoding the payload, e.g., "strict" or "replace"
+        :return: A NewsArticle object
+        """
+        html, url, download_date = _decode_warc_record(warc_record, decode_errors=decode_errors)
+        return self.from_html(html, url=url, download_date=download_date)
 
-    @staticmethod
-    def from_html(html, url=None, download_date=None, fetch_images=True):
+    def from_html(self, html, url=None, download_date=None):
         """
-        Extracts relevant information from an HTML page given as a string. This function does not invoke scrapy but only
-        uses the article extractor. If you have the original URL make sure to provide it as this helps NewsPlease
-        to extract the publishing date and title.
+        Extracts relevant information from an HTML page given as a string.
         :param html:
         :param url:
-        :return:
+        :param download_date:
+        :return: A NewsArticle object
         """
-        extractor = article_extractor.Extractor(
-            (
-                ['newspaper_extractor']
-                if fetch_images
-                else [("newspaper_extractor_no_images", "NewspaperExtractorNoImages")]
-            ) +
-            ['readability_extractor', 'date_extractor', 'lang_detect_extractor']
-        )
-
         title_encoded = ''.encode()
         if not url:
             url = ''
@@ -92,33 +211,176 @@ class NewsPlease:
         item['filename'] = filename
         item['download_date'] = download_date
         item['modified_date'] = None
-        item = extractor.extract(item)
+        item = self.extractor.extract(item)
 
         tmp_article = ExtractedInformationStorage.extract_relevant_info(item)
         final_article = ExtractedInformationStorage.convert_to_class(tmp_article)
         return final_article
 
+
+class NewsPlease:
+    """
+    Access news-please functionality via this interface
+    """
+
+    # extraction sessions, keyed by their configuration, that are shared by all calls within this process
+    _sessions = {}
+    _sessions_lock = threading.Lock()
+
+    @staticmethod
+    def session(extractors=None, fetch_images=True, fields=None):
+        """
+        Returns an ExtractionSession for the given configuration. Sessions are created once per process and
+        configuration and then reused by all subsequent calls.
+        :param extractors: List of extractors, if None, the default extractors are used
+        :param fetch_images:
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :return: An ExtractionSession object
+        """
+        key = (tuple(extractors) if extractors is not None else None, fetch_images,
+               frozenset(fields) if fields is not None else None)
+        session = NewsPlease._sessions.get(key)
+        if session is None:
+            with NewsPlease._sessions_lock:
+                session = NewsPlease._sessions.get(key)
+                if session is None:
+                    session = ExtractionSession(extractors=extractors, fetch_images=fetch_images, fields=fields)
+                    NewsPlease._sessions[key] = session
+        return session
+
     @staticmethod
-    def from_url(url, timeout=None):
+    def from_warc(warc_record, decode_errors="replace", fetch_images=True, fields=None):
+        """
+        Extracts relevant information from a WARC record. This function does not invoke scrapy but only uses the article
+        extractor.
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :return:
+        """
+        return NewsPlease.session(fetch_images=fetch_images, fields=fields).from_warc(warc_record,
+                                                                                     decode_errors=decode_errors)
+
+    @staticmethod
+    def from_html(html, url=None, download_date=None, fetch_images=True, fields=None):
+        """
+        Extracts relevant information from an HTML page given as a string. This function does not invoke scrapy but only
+        uses the article extractor. If you have the original URL make sure to provide it as this helps NewsPlease
+        to extract the publishing date and title.
+        :param html:
+        :param url:
+        :param fields: List of NewsArticle fields to extract, e.g., ['title', 'date_publish', 'language'], which is
+        considerably faster than extracting all fields (if None). Fields that are not extracted are None.
+        :return:
+        """
+        return NewsPlease.session(fetch_images=fetch_images, fields=fields).from_html(html, url=url,
+                                                                                     download_date=download_date)
+
+    @staticmethod
+    def from_html_batch(documents, processes=None, chunksize=16, ordered=True, extractors=None, fetch_images=True,
+                        fields=None):
+        """
+        Extracts relevant information from many HTML pages in parallel using a pool of worker processes. Each worker
+        sets up its extraction session once and then processes chunks of documents.
+        :param documents: An iterable of (html, url, download_date) tuples, url and download_date can be omitted
+        :param processes: number of worker processes, if None, the number of CPUs is used. If 1, all documents are
+        extracted in the current process
+        :param chunksize: number of documents that are sent to a worker at once. At most
+        processes * chunksize * BATCH_CHUNKS_IN_FLIGHT_PER_PROCESS documents are read ahead of the consumed results
+        :param ordered: if True, results are yielded in the order of the documents, else as soon as they are completed
+        :param extractors: List of extractors, if None, the default extractors are used
+        :param fetch_images:
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :return: A generator of (index, result) tuples, where index is the position of the document in documents and
+        result either a NewsArticle object or an ExtractionError if the extraction of this document failed
+        """
+        tasks = ((index, 'html', NewsPlease._to_batch_document(document)) for index, document in enumerate(documents))
+        return NewsPlease._run_batch(tasks, processes, chunksize, ordered, (extractors, fetch_images, fields, "replace"))
+
+    @staticmethod
+    def from_warc_batch(warc_records, decode_errors="replace", processes=None, chunksize=16, ordered=True,
+                        extractors=None, fetch_images=True, fields=None):
+        """
+        Extracts relevant information from many WARC records in parallel using a pool of worker processes. The
+        payloads of the records are read in the current process, so warc_records may be an ArchiveIterator. Note that
+        all given records are extracted, so you might want to pass only records of the type 'response'.
+        :param warc_records: An iterable of WARC records
+        :param decode_errors:
+        :param processes: number of worker processes, if None, the number of CPUs is used. If 1, all records are
+        extracted in the current process
+        :param chunksize: number of records that are sent to a worker at once. At most
+        processes * chunksize * BATCH_CHUNKS_IN_FLIGHT_PER_PROCESS records are read ahead of the consumed results
+        :param ordered: if True, results are yielded in the order of the records, else as soon as they are completed
+        :param extractors: List of extractors, if None, the default extractors are used
+        :param fetch_images:
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :return: A generator of (index, result) tuples, where index is the position of the record in warc_records and
+        result either a NewsArticle object or an ExtractionError if the extraction of this record failed
+        """
+        tasks = ((index, 'warc', _read_warc_record(record)) for index, record in enumerate(warc_records))
+        return NewsPlease._run_batch(tasks, processes, chunksize, ordered, (extractors, fetch_images, fields,
+                                                                            decode_errors))
+
+    @staticmethod
+    def _to_batch_document(document):
+        """
+        Pads a document given to from_html_batch to a (html, url, download_date) tuple
+        """
+        if isinstance(document, str):
+            document = (document,)
+        return tuple(document) + (None,) * (3 - len(document))
+
+    @staticmethod
+    def _run_batch(tasks, processes, chunksize, ordered, config):
+        """
+        Runs the given batch tasks, see from_html_batch.
+        :param config: A tuple of the extractors, fetch_images, fields and decode_errors
+        """
+        if processes == 1:
+            for task in tasks:
+                yield _extract_batch_document(task, config)
+        else:
+            # the pool reads its input in a separate thread as fast as it can, hence the number of tasks whose results
+            # have not been consumed yet is bounded, which must be at least chunksize, so that a full chunk is sent
+            semaphore = threading.Semaphore((processes or os.cpu_count() or 1) * chunksize
+                                            * BATCH_CHUNKS_IN_FLIGHT_PER_PROCESS)
+            stopped = threading.Event()
+            gated_tasks = _gate_batch_tasks(tasks, semaphore, stopped)
+            with Pool(processes, initializer=_init_batch_worker, initargs=config) as pool:
+                if ordered:
+                    results = pool.imap(_extract_batch_document_in_worker, gated_tasks, chunksize)
+                else:
+                    results = pool.imap_unordered(_extract_batch_document_in_worker, gated_tasks, chunksize)
+                try:
+                    for result in results:
+                        semaphore.release()
+                        yield result
+                finally:
+                    # wakes up the task feeder if it waits for a slot, otherwise the pool could not be terminated
+                    stopped.set()
+                    semaphore.release()
+
+    @staticmethod
+    def from_url(url, timeout=None, fields=None):
         """
         Crawls the article from the url and extracts relevant information.
         :param url:
         :param timeout: in seconds, if None, the urllib default is used
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
         :return: A NewsArticle object containing all the information of the article. Else, None.
         :rtype: NewsArticle, None
         """
-        articles = NewsPlease.from_urls([url], timeout=timeout)
+        articles = NewsPlease.from_urls([url], timeout=timeout, fields=fields)
         if url in articles.keys():
             return articles[url]
         else:
             return None
 
     @staticmethod
-    def from_urls(urls, timeout=None):
+    def from_urls(urls, timeout=None, fields=None):
         """
         Crawls articles from the urls and extracts relevant information.
         :param urls:
         :param timeout: in seconds, if None, the urllib default is used
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
         :return: A dict containing given URLs as keys, and extracted information as corresponding values.
         """
         results = {}
@@ -131,19 +393,109 @@ class NewsPlease:
         elif len(urls) == 1:
             url = urls[0]
             html = SimpleCrawler.fetch_url(url, timeout=timeout)
-            results[url] = NewsPlease.from_html(html, url, download_date)
+            results[url] = NewsPlease.from_html(html, url, download_date, fields=fields) if html is not None else None
         else:
-            results = SimpleCrawler.fetch_urls(urls)
-            for url in results:
-                results[url] = NewsPlease.from_html(results[url], url, download_date)
+            for url, article in NewsPlease.iter_urls(urls, timeout=timeout, fields=fields):
+                results[url] = article
 
         return results
 
     @staticmethod
-    def from_file(path):
+    def iter_urls(urls, timeout=None, fields=None, max_workers=MAX_WORKERS):
+        """
+        Crawls articles from the urls in parallel and yields each article as soon as it is extracted. The urls are
+        consumed lazily and each html is released after its extraction, so memory is bounded by max_workers rather than
+        by the number of urls.
+        :param urls: An iterable of urls
+        :param timeout: in seconds, if None, the urllib default is used
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :param max_workers: maximum number of urls that are crawled in parallel
+        :return: A generator of (url, article) tuples in the order of completion, article is None if the url could not
+        be crawled
+        """
+        session = NewsPlease.session(fields=fields)
+        download_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for url, html in SimpleCrawler.iter_urls(urls, timeout=timeout, max_workers=max_workers):
+            yield url, session.from_html(html, url, download_date) if html is not None else None
+
+    @staticmethod
+    async def iter_urls_async(urls, timeout=None, fields=None, max_concurrency=64, max_concurrency_per_host=4):
+        """
+        Crawls articles from the urls concurrently using asyncio and yields each article as soon as it is extracted.
+        Each article is extracted in a separate thread as soon as its download has completed, while other downloads
+        continue. The urls are consumed lazily, so memory is bounded by max_concurrency rather than by the number of
+        urls. Requires aiohttp.
+        :param urls: An iterable of urls
+        :param timeout: in seconds per request, if None, there is no timeout
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :param max_concurrency: maximum number of concurrent requests
+        :param max_concurrency_per_host: maximum number of concurrent requests to the same host
+        :return: An asynchronous generator of (url, article) tuples in the order of completion, article is None if the
+        url could not be crawled or the extraction failed
+        """
+        crawler = AsyncCrawler(timeout=timeout, max_concurrency=max_concurrency,
+                               max_concurrency_per_host=max_concurrency_per_host)
+        session = NewsPlease.session(fields=fields)
+        download_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        loop = asyncio.get_running_loop()
+
+        downloads = crawler.fetch_urls(urls)
+        try:
+            async for url, html in downloads:
+                article = None
+                if html is not None:
+                    try:
+                        article = await loop.run_in_executor(None, session.from_html, html, url, download_date)
+                    except Exception as e:
+                        LOGGER.error('extraction failed: %s %s', url, e)
+                yield url, article
+        finally:
+            # the pending downloads are cancelled if the caller stops early
+            await downloads.aclose()
+
+    @staticmethod
+    async def from_urls_async(urls, timeout=None, fields=None, max_concurrency=64, max_concurrency_per_host=4):
+        """
+        Crawls articles from the urls concurrently using asyncio and extracts relevant information, see iter_urls_async.
+        Returns once all articles have been extracted. Requires aiohttp.
+        :param urls: An iterable of urls
+        :param timeout: in seconds per request, if None, there is no timeout
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :param max_concurrency: maximum number of concurrent requests
+        :param max_concurrency_per_host: maximum number of concurrent requests to the same host
+        :return: A dict containing the successfully crawled URLs as keys, and extracted information as corresponding
+        values.
+        """
+        results = {}
+        async for url, article in NewsPlease.iter_urls_async(urls, timeout=timeout, fields=fields,
+                                                             max_concurrency=max_concurrency,
+                                                             max_concurrency_per_host=max_concurrency_per_host):
+            if article is not None:
+                results[url] = article
+        return results
+
+    @staticmethod
+    def from_urls_concurrent(urls, timeout=None, fields=None, max_concurrency=64, max_concurrency_per_host=4):
+        """
+        Blocking variant of from_urls_async, which must not be called from a running event loop. Requires aiohttp.
+        :param urls: An iterable of urls
+        :param timeout: in seconds per request, if None, there is no timeout
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :param max_concurrency: maximum number of concurrent requests
+        :param max_concurrency_per_host: maximum number of concurrent requests to the same host
+        :return: A dict containing the successfully crawled URLs as keys, and extracted information as corresponding
+        values.
+        """
+        return asyncio.run(NewsPlease.from_urls_async(urls, timeout=timeout, fields=fields,
+                                                      max_concurrency=max_concurrency,
+                                                      max_concurrency_per_host=max_concurrency_per_host))
+
+    @staticmethod
+    def from_file(path, fields=None):
         """
         Crawls articles from the urls and extracts relevant information.
         :param path: path to file containing urls (each line contains one URL)
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
         :return: A dict containing given URLs as keys, and extracted information as corresponding values.
         """
         with open(path) as f:
@@ -151,4 +503,76 @@ class NewsPlease:
         content = [x.strip() for x in content]
         urls = list(filter(None, content))
 
-        return NewsPlease.from_urls(urls)
+        return NewsPlease.from_urls(urls, fields=fields)
+
+    @staticmethod
+    def from_file_streaming(path, sink, checkpoint_path=None, checkpoint_interval=1000, timeout=None, fields=None,
+                            max_workers=MAX_WORKERS, max_lines_ahead=10000):
+        """
+        Crawls articles from the urls in a file of any size and passes each article to the sink as soon as it is
+        extracted. The file is read lazily and at most max_workers urls are crawled in parallel, so memory does not grow
+        with the number of urls. If a checkpoint_path is given, an interrupted call resumes where it stopped when it is
+        called again with the same arguments. Articles that were completed after the last checkpoint are passed to the
+        sink again after resuming.
+        :param path: path to file containing urls (each line contains one URL)
+        :param sink: Either a callable, which is called with (url, article) for each url, where article is None if the
+        url could not be crawled, or the path of a JSON lines file to which the articles are appended
+        :param checkpoint_path: path of a file to which the progress is saved, if None, the progress is not saved
+        :param checkpoint_interval: number of urls after which the checkpoint is saved
+        :param timeout: in seconds, if None, the urllib default is used
+        :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+        :param max_workers: maximum number of urls that are crawled in parallel
+        :param max_lines_ahead: maximum number of lines by which the crawled urls may be ahead of the first line that
+        is not completed yet, e.g., while a slow url is crawled, so that the lines completed after it and kept for the
+        checkpoint, and the lines processed again after resuming, are bounded
+        :return: The number of urls processed by this call
+        """
+        owns_sink = not callable(sink)
+        if owns_sink:
+            sink = JsonLinesSink(sink)
+        checkpoint = LineCheckpoint(checkpoint_path, path)
+        start_line = checkpoint.line
+        if start_line:
+            LOGGER.info('resuming %s from line %s', path, start_line)
+        session = NewsPlease.session(fields=fields)
+        download_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        def keyed_urls(file):
+            for line_number, line in enumerate(file):
+                if line_number < start_line:
+                    continue
+                url = line.strip()
+                if url:
+                    yield line_number, url
+                else:
+                    checkpoint.complete(line_number)
+
+        def save_checkpoint():
+            # the sink is flushed first, so that the checkpoint never covers articles that are not persisted
+            if hasattr(sink, 'flush'):
+                sink.flush()
+            checkpoint.save()
+
+        processed = 0
+        try:
+            with open(path) as file:
+                for line_number, url, html in SimpleCrawler.iter_keyed_urls(keyed_urls(file), timeout=timeout,
+                                                                            max_workers=max_workers,
+                                                                            max_keys_ahead=max_lines_ahead):
+                    article = None
+                    if html is not None:
+                        try:
+                            article = session.from_html(html, url, download_date)
+                        except Exception as e:
+                            LOGGER.error('extraction failed: %s %s', url, e)
+                    sink(url, article)
+                    checkpoint.complete(line_number)
+                    processed += 1
+                    if processed % checkpoint_interval == 0:
+                        save_checkpoint()
+        finally:
+            save_checkpoint()
+            if owns_sink:
+                sink.close()
+
+        return processed
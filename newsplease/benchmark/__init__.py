@@ -0,0 +1,265 @@
+"""
+Offline benchmark of the article extraction. A fixed corpus of news pages is run through the extraction of the library
+mode, both as HTML and packed into a WARC file, while the time spent in each extractor, the cleaner and each comparer
+is recorded. The bundled corpus consists of synthetic pages on .example domains that mimic common layouts of news
+sites, e.g., JSON-LD metadata, meta tags only or heavy boilerplate, so results on real pages may differ. Run it with
+"python -m newsplease.benchmark" and compare the JSON output between commits.
+"""
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from warcio.archiveiterator import ArchiveIterator
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from newsplease import ExtractionSession
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'corpus')
+CORPUS_MANIFEST = 'corpus.json'
+
+
+def load_corpus(directory=CORPUS_DIR):
+    """
+    Loads the documents of a corpus. If the directory contains a corpus.json, which lists the files with their url and
+    download date, only these files are loaded, else all .html files of the directory.
+    :param directory:
+    :return: A list of dicts with the keys name, html, url and download_date
+    """
+    manifest_path = os.path.join(directory, CORPUS_MANIFEST)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as file:
+            entries = json.load(file)
+    else:
+        entries = [{'file': name} for name in sorted(os.listdir(directory)) if name.endswith('.html')]
+
+    documents = []
+    for entry in entries:
+        with open(os.path.join(directory, entry['file']), encoding='utf-8', errors='replace') as file:
+            documents.append({
+                'name': entry['file'],
+                'html': file.read(),
+                'url': entry.get('url'),
+                'download_date': entry.get('download_date'),
+            })
+    return documents
+
+
+def build_warc(documents):
+    """
+    Packs the documents into an in-memory WARC file with one response record per document.
+    :param documents: A list of documents as returned by load_corpus
+    :return: The gzipped WARC file as bytes
+    """
+    buffer = io.BytesIO()
+    writer = WARCWriter(buffer, gzip=True)
+    for document in documents:
+        payload = document['html'].encode('utf-8')
+        http_headers = StatusAndHeaders('200 OK', [('Content-Type', 'text/html; charset=utf-8'),
+                                                   ('Content-Length', str(len(payload)))], protocol='HTTP/1.1')
+        warc_headers = None
+        if document['download_date']:
+            date = datetime.datetime.strptime(document['download_date'], '%Y-%m-%d %H:%M:%S')
+            warc_headers = {'WARC-Date': date.strftime('%Y-%m-%dT%H:%M:%SZ')}
+        record = writer.create_warc_record(document['url'] or 'http://localhost/' + document['name'], 'response',
+                                           payload=io.BytesIO(payload), http_headers=http_headers,
+                                           warc_headers_dict=warc_headers)
+        writer.write_record(record)
+    return buffer.getvalue()
+
+
+class StageTimer:
+    """
+    Measures the wall time spent in methods of the components of an extraction session by replacing the methods of the
+    component instances with timed wrappers.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def instrument(self, instance, method_name, stage):
+        method = getattr(instance, method_name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                self.calls[stage] += 1
+
+        setattr(instance, method_name, timed)
+
+    def instrument_session(self, session):
+        """
+        Instruments all extractors, the cleaner and all comparers of the given session.
+        :param session: An ExtractionSession, which should not be used by anything else than the benchmark
+        """
+        extractor = session.extractor
+        for instance in extractor.extractor_list:
+            self.instrument(instance, 'extract', 'extractor.' + instance.name)
+        self.instrument(extractor.cleaner, 'clean', 'cleaner')
+        for comparer in vars(extractor.comparer).values():
+            self.instrument(comparer, 'extract', 'comparer.' + type(comparer).__name__[len('Comparer'):].lower())
+
+    def reset(self):
+        self.seconds.clear()
+        self.calls.clear()
+
+    def report(self):
+        return {stage: {'seconds': self.seconds[stage], 'calls': self.calls[stage],
+                        'ms_per_call': 1000 * self.seconds[stage] / self.calls[stage] if self.calls[stage] else None}
+                for stage in sorted(self.seconds)}
+
+
+def _run_html(session, documents):
+    for document in documents:
+        session.from_html(document['html'], url=document['url'], download_date=document['download_date'])
+    return len(documents)
+
+
+def _run_warc(session, warc):
+    count = 0
+    for record in ArchiveIterator(io.BytesIO(warc)):
+        if record.rec_type == 'response':
+            session.from_warc(record)
+            count += 1
+    return count
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _measure_allocations(session, documents):
+    """
+    Measures the allocations and the peak memory traced by tracemalloc while extracting each document. The allocations
+    of an article are the number of memory blocks that were allocated during its extraction and not freed, as counted
+    by the difference of the snapshots before and after it. This slows down the extraction considerably and is hence
+    done in a separate pass.
+    :return: A dict with the mean and maximum of the allocations and of the peak traced memory in bytes per article
+    """
+    allocations = []
+    peaks = []
+    # the blocks allocated by tracemalloc itself, e.g., for the snapshots, are not counted
+    tracemalloc_filter = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    for document in documents:
+        # restarting tracemalloc resets the traced peak
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(tracemalloc_filter)
+            session.from_html(document['html'], url=document['url'], download_date=document['download_date'])
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            after = tracemalloc.take_snapshot().filter_traces(tracemalloc_filter)
+        finally:
+            tracemalloc.stop()
+        allocations.append(sum(statistic.count_diff for statistic in after.compare_to(before, 'lineno')))
+    return {'allocations_per_article_mean': sum(allocations) / len(allocations) if allocations else None,
+            'allocations_per_article_max': max(allocations) if allocations else None,
+            'peak_bytes_per_article_mean': sum(peaks) / len(peaks) if peaks else None,
+            'peak_bytes_per_article_max': max(peaks) if peaks else None}
+
+
+def _run_timed(run, timer, iterations):
+    timer.reset()
+    articles = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        articles += run()
+    seconds = time.perf_counter() - start
+    return {'articles': articles, 'seconds': seconds,
+            'articles_per_second': articles / seconds if seconds else None,
+            'ms_per_article': 1000 * seconds / articles if articles else None,
+            'stages': timer.report()}
+
+
+def run_benchmark(documents, iterations=5, warmup=1, extractors=None, fields=None, warc=True, allocations=True):
+    """
+    Runs the benchmark on the given documents.
+    :param documents: A list of documents as returned by load_corpus
+    :param iterations: number of times the corpus is extracted per mode
+    :param warmup: number of untimed passes over the corpus before measuring, e.g., to load lazily imported modules
+    :param extractors: List of extractors, if None, the default extractors of the library mode are used
+    :param fields: List of NewsArticle fields to extract, if None, all fields are extracted
+    :param warc: if True, the corpus is also extracted from a WARC file
+    :param allocations: if True, the allocations and the peak memory traced by tracemalloc per article are measured
+    :return: A JSON serializable dict containing the results
+    """
+    # images are never fetched, so that the benchmark does not depend on the network
+    session = ExtractionSession(extractors=extractors, fetch_images=False, fields=fields)
+    timer = StageTimer()
+    timer.instrument_session(session)
+
+    for _ in range(warmup):
+        _run_html(session, documents)
+
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'extractors': [extractor.name for extractor in session.extractor.extractor_list],
+        'fields': fields,
+        'corpus': {'documents': len(documents),
+                   'bytes': sum(len(document['html'].encode('utf-8')) for document in documents)},
+        'iterations': iterations,
+        'html': _run_timed(lambda: _run_html(session, documents), timer, iterations),
+    }
+    if warc:
+        warc_file = build_warc(documents)
+        results['warc'] = _run_timed(lambda: _run_warc(session, warc_file), timer, iterations)
+    results['memory'] = {'peak_rss_bytes': _peak_rss_bytes()}
+    if allocations:
+        results['memory'].update(_measure_allocations(session, documents))
+    return results
+
+
+def _format_number(number, number_format):
+    """
+    Formats number, which is None if it could not be computed, e.g., because no article was extracted
+    """
+    return 'n/a' if number is None else number_format % number
+
+
+def format_report(results):
+    """
+    Formats the results of run_benchmark as human-readable text.
+    """
+    lines = ['news-please extraction benchmark, %s documents (%s bytes), %s iterations, Python %s' % (
+        results['corpus']['documents'], results['corpus']['bytes'], results['iterations'], results['python'])]
+    for mode in ('html', 'warc'):
+        if mode not in results:
+            continue
+        run = results[mode]
+        lines.append('')
+        lines.append('%s: %s articles/s, %s ms/article' % (mode, _format_number(run['articles_per_second'], '%.1f'),
+                                                          _format_number(run['ms_per_article'], '%.2f')))
+        for stage, timing in run['stages'].items():
+            lines.append('  %-36s %10s ms/call %8d calls' % (stage, _format_number(timing['ms_per_call'], '%.2f'),
+                                                             timing['calls']))
+    memory = results['memory']
+    lines.append('')
+    if memory['peak_rss_bytes'] is not None:
+        lines.append('peak RSS: %.1f MiB' % (memory['peak_rss_bytes'] / 2 ** 20))
+    if memory.get('allocations_per_article_mean') is not None:
+        lines.append('allocations per article: %.0f mean, %d max' % (memory['allocations_per_article_mean'],
+                                                                     memory['allocations_per_article_max']))
+    if memory.get('peak_bytes_per_article_mean') is not None:
+        lines.append('peak traced memory per article: %.1f KiB mean, %.1f KiB max' % (
+            memory['peak_bytes_per_article_mean'] / 2 ** 10, memory['peak_bytes_per_article_max'] / 2 ** 10))
+    return '\n'.join(lines)
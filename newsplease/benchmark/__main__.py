@@ -0,0 +1,42 @@
+import json
+import logging
+
+import plac
+
+from newsplease.benchmark import CORPUS_DIR, format_report, load_corpus, run_benchmark
+
+
+@plac.annotations(
+    corpus=plac.Annotation('directory containing the HTML files to extract', 'option', 'c'),
+    iterations=plac.Annotation('number of times the corpus is extracted', 'option', 'n', int),
+    warmup=plac.Annotation('number of untimed passes over the corpus', 'option', 'w', int),
+    fields=plac.Annotation('comma separated list of NewsArticle fields to extract', 'option', 'f'),
+    json_output=plac.Annotation('write the results as JSON to this file, - for stdout', 'option', 'j'),
+    no_warc=plac.Annotation('do not extract the corpus from a WARC file', 'flag'),
+    no_allocations=plac.Annotation('do not measure the allocations and the peak traced memory per article', 'flag')
+)
+def cli(corpus=CORPUS_DIR, iterations=5, warmup=1, fields=None, json_output=None, no_warc=False,
+        no_allocations=False):
+    "Benchmarks the article extraction of news-please on an offline corpus."
+    logging.basicConfig(level=logging.WARNING)
+    # the extractors log every skipped extractor and every failed candidate
+    logging.getLogger('newsplease').setLevel(logging.ERROR)
+
+    results = run_benchmark(load_corpus(corpus), iterations=iterations, warmup=warmup,
+                            fields=fields.split(',') if fields else None, warc=not no_warc,
+                            allocations=not no_allocations)
+    if json_output == '-':
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_report(results))
+        if json_output:
+            with open(json_output, 'w') as file:
+                json.dump(results, file, indent=2)
+
+
+def main():
+    plac.call(cli)
+
+
+if __name__ == "__main__":
+    main()
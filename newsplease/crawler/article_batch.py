@@ -0,0 +1,97 @@
+"""
+Collects the articles extracted from a WARC file into batches, so that they can be sent from the extraction processes
+to a single consumer in the parent process.
+"""
+from ..NewsArticle import NewsArticle
+
+ARTICLE_FIELDS = tuple(NewsArticle().get_dict().keys())
+# kinds of the checkpoints of batches, see ArticleBatcher
+RESUME = 'resume'
+CHECKPOINT = 'checkpoint'
+
+
+def serialize_article(article):
+    """
+    Converts an article into a compact, picklable tuple of its fields
+    :param article: A NewsArticle
+    :return: A tuple of the values of ARTICLE_FIELDS
+    """
+    return tuple(getattr(article, field) for field in ARTICLE_FIELDS)
+
+
+def deserialize_article(values):
+    """
+    Restores an article that was converted by serialize_article
+    :param values:
+    :return: A NewsArticle
+    """
+    article = NewsArticle()
+    for field, value in zip(ARTICLE_FIELDS, values):
+        setattr(article, field, value)
+    return article
+
+
+class ArticleBatcher(object):
+    """
+    Collects the articles of the WARC file that is currently extracted and sends them in batches of batch_size articles.
+    Use an instance as callback_on_article_extracted.
+
+    Each batch is a tuple of the WARC URL, a list of serialized articles, whether the WARC file has been extracted
+    completely and a checkpoint, which is None or a tuple of RESUME or CHECKPOINT and an offset within the WARC file.
+    RESUME is sent before the first batch if the extraction uses checkpoints, with the offset from which it starts,
+    CHECKPOINT with the last batch before a checkpoint is saved, with the offset from which the extraction resumes if it
+    is interrupted after the checkpoint.
+    """
+
+    def __init__(self, send, batch_size, wait_until_delivered=None):
+        """
+        :param send: called with a batch, e.g., the put method of a bounded queue, so that the extraction waits if the
+        consumer of the batches is slower than the extraction
+        :param batch_size: maximum number of articles per batch
+        :param wait_until_delivered: if not None and send only queues the batches, called by flush to wait until the
+        consumer has delivered all batches sent so far
+        """
+        self.send = send
+        self.batch_size = batch_size
+        self.wait_until_delivered = wait_until_delivered
+        self.warc_download_url = None
+        self.articles = []
+
+    def start_warc(self, warc_download_url, resume_offset=None):
+        """
+        Starts collecting the articles of a new WARC file, the articles of the previous one are discarded
+        :param resume_offset: if not None, the extraction uses checkpoints and starts at this offset, which is sent to
+        the consumer, so that it can restore the state of the WARC file at the checkpoint
+        """
+        self.warc_download_url = warc_download_url
+        self.articles = []
+        if resume_offset is not None:
+            self.send((warc_download_url, [], False, (RESUME, resume_offset)))
+
+    def __call__(self, article):
+        self.extend([serialize_article(article)])
+
+    def extend(self, serialized_articles):
+        """
+        Adds articles that were already serialized by serialize_article
+        """
+        self.articles.extend(serialized_articles)
+        if len(self.articles) >= self.batch_size:
+            self.__send()
+
+    def __send(self, warc_completed=False, checkpoint=None):
+        articles, self.articles = self.articles, []
+        self.send((self.warc_download_url, articles, warc_completed, checkpoint))
+
+    def flush(self, warc_completed=False, checkpoint_offset=None):
+        """
+        Sends the collected articles, if the WARC file has been completed or a checkpoint is saved even if there are
+        none, and returns once all batches have been delivered, e.g., before a checkpoint is saved or the WARC file is
+        recorded as done
+        :param warc_completed: if True, the batch is the last batch of the WARC file
+        :param checkpoint_offset: if not None, a checkpoint with this offset is saved once the batches are delivered
+        """
+        if self.articles or warc_completed or checkpoint_offset is not None:
+            self.__send(warc_completed, (CHECKPOINT, checkpoint_offset) if checkpoint_offset is not None else None)
+        if self.wait_until_delivered is not None:
+            self.wait_until_delivered()
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from .response_decoder import decode_content
+from .simple_crawler import HEADERS, MAX_FILE_SIZE, MIN_FILE_SIZE
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+LOGGER = logging.getLogger(__name__)
+
+# size of the chunks in which responses are read
+CHUNK_SIZE = 65536
+
+
+class AsyncCrawler(object):
+    """
+    Crawls the html content of many urls concurrently using asyncio. In contrast to SimpleCrawler, connections are
+    kept alive and reused, DNS lookups are cached, the number of concurrent requests is limited globally and per host,
+    and responses are read in chunks, so that downloads exceeding MAX_FILE_SIZE are aborted early.
+    """
+
+    def __init__(self, timeout=None, max_concurrency=64, max_concurrency_per_host=4, dns_cache_ttl=300,
+                 max_file_size=MAX_FILE_SIZE):
+        """
+        :param timeout: in seconds per request, if None, there is no timeout
+        :param max_concurrency: maximum number of concurrent requests
+        :param max_concurrency_per_host: maximum number of concurrent requests to the same host
+        :param dns_cache_ttl: in seconds, how long resolved host names are cached
+        :param max_file_size: in bytes, larger responses are discarded
+        """
+        if aiohttp is None:
+            raise ModuleNotFoundError("Using AsyncCrawler requires aiohttp")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.max_file_size = max_file_size
+
+    async def fetch_urls(self, urls):
+        """
+        Crawls the html content of all given urls. The urls are consumed lazily and only up to max_concurrency
+        requests are pending at any time.
+        :param urls: An iterable of urls
+        :return: An asynchronous generator of (url, html) tuples in the order of completion. html is None if the url
+        could not be crawled.
+        """
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.max_concurrency_per_host,
+                                         ttl_dns_cache=self.dns_cache_ttl, ssl=False)
+        headers = {'User-Agent': HEADERS['User-Agent']}
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+            urls = iter(urls)
+            pending = set()
+            try:
+                while True:
+                    for url in urls:
+                        pending.add(asyncio.ensure_future(self._fetch_url(session, url)))
+                        if len(pending) >= self.max_concurrency:
+                            break
+                    if not pending:
+                        break
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            finally:
+                # e.g., if the caller stops iterating early
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _fetch_url(self, session, url):
+        """
+        Crawls the html content of the given url
+        :param session: The aiohttp.ClientSession to use
+        :param url:
+        :return: A tuple of the url and its html, which is None if the url could not be crawled
+        """
+        try:
+            async with session.get(url, allow_redirects=True) as response:
+                if response.status != 200:
+                    LOGGER.error('not a 200 response: %s %s', url, response.status)
+                    return url, None
+                if response.content_length is not None and response.content_length > self.max_file_size:
+                    LOGGER.error('too large: %s %s', url, response.content_length)
+                    return url, None
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_file_size:
+                        LOGGER.error('too large: %s %s', url, size)
+                        return url, None
+                    chunks.append(chunk)
+                charset = response.charset
+        except (aiohttp.InvalidURL, ValueError):
+            LOGGER.error('malformed URL: %s', url)
+            return url, None
+        except aiohttp.TooManyRedirects:
+            LOGGER.error('too many redirects: %s', url)
+            return url, None
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as err:
+            LOGGER.error('connection/timeout error: %s %s', url, err)
+            return url, None
+
+        if size < MIN_FILE_SIZE:
+            LOGGER.error('too small/incorrect: %s %s', url, size)
+            return url, None
+        return url, decode_content(b''.join(chunks), charset)
@@ -0,0 +1,160 @@
+"""
+Lists the WARC files of the CC-NEWS crawl of commoncrawl.org. The files are listed with the S3 ListObjectsV2 API over
+plain HTTP, which neither requires the AWS CLI nor credentials, and the listing is cached in a local manifest, so that
+only months that may have changed since the last listing are listed again.
+"""
+import datetime
+import logging
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+
+from six.moves import urllib
+
+from ..helper_classes.checkpoint import read_json, write_json_atomically
+
+LOGGER = logging.getLogger(__name__)
+
+# endpoint of the commoncrawl bucket, can be replaced by any endpoint that implements ListObjectsV2
+S3_ENDPOINT = 'https://commoncrawl.s3.amazonaws.com/'
+CC_NEWS_PREFIX = 'crawl-data/CC-NEWS/'
+# When Common Crawl started.
+CC_NEWS_START_DATE = datetime.datetime(2016, 8, 26)
+# files may be added to the folder of a month shortly after the month has ended, so a month is considered complete only
+# if it was listed at least this long after its end
+MONTH_COMPLETION_DELAY = datetime.timedelta(days=2)
+LIST_TIMEOUT = 60
+MAX_LIST_WORKERS = 8
+
+_S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+
+def _find_text(element, tag):
+    child = element.find(_S3_NAMESPACE + tag)
+    if child is None:
+        child = element.find(tag)
+    return child.text if child is not None else None
+
+
+def list_objects(prefix, endpoint=S3_ENDPOINT, timeout=LIST_TIMEOUT):
+    """
+    Lists all objects below prefix with the S3 ListObjectsV2 API. Pages of the listing are requested until the listing
+    is no longer truncated.
+    :param prefix: e.g., 'crawl-data/CC-NEWS/2021/05/'
+    :param endpoint: URL of the bucket, ending with a slash
+    :param timeout: in seconds, per request
+    :return: A generator of dicts with the keys name, size and etag
+    """
+    continuation_token = None
+    while True:
+        parameters = [('list-type', '2'), ('prefix', prefix)]
+        if continuation_token:
+            parameters.append(('continuation-token', continuation_token))
+        url = endpoint + '?' + urllib.parse.urlencode(parameters)
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            root = ElementTree.fromstring(response.read())
+
+        for content in root.iter(_S3_NAMESPACE + 'Contents'):
+            yield {'name': _find_text(content, 'Key'),
+                   'size': int(_find_text(content, 'Size') or 0),
+                   'etag': (_find_text(content, 'ETag') or '').strip('"')}
+
+        if _find_text(root, 'IsTruncated') != 'true':
+            return
+        continuation_token = _find_text(root, 'NextContinuationToken')
+        if not continuation_token:
+            return
+
+
+def iterate_months(start_date=None, end_date=None):
+    """
+    Iterates the first days of all months that overlap with [start_date, end_date)
+    :param start_date: if None, the start of CC-NEWS
+    :param end_date: if None, now
+    :return: A generator of datetimes
+    """
+    current_date = (start_date or CC_NEWS_START_DATE).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end_date = end_date or datetime.datetime.today()
+    while current_date < end_date:
+        yield current_date
+        carry, month = divmod(current_date.month, 12)
+        current_date = current_date.replace(year=current_date.year + carry, month=month + 1)
+
+
+def _get_month_key(month):
+    return month.strftime('%Y/%m')
+
+
+def _get_month_end(month):
+    carry, next_month = divmod(month.month, 12)
+    return month.replace(year=month.year + carry, month=next_month + 1)
+
+
+class CCNewsIndex(object):
+    """
+    The listing of the CC-NEWS WARC files, which is cached in a JSON manifest. For each month, the manifest contains the
+    name, size and ETag of all files of the month and the time of the listing. A month is listed again only if it was
+    not complete when it was listed the last time, i.e., if it is the current month or was listed shortly after its end.
+    """
+
+    def __init__(self, manifest_path=None, endpoint=S3_ENDPOINT, max_workers=MAX_LIST_WORKERS,
+                 timeout=LIST_TIMEOUT):
+        """
+        :param manifest_path: path of the manifest, if None, the listing is not cached
+        :param endpoint: URL of the bucket, ending with a slash
+        :param max_workers: number of months that are listed concurrently
+        :param timeout: in seconds, per request
+        """
+        self.manifest_path = manifest_path
+        self.endpoint = endpoint
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.months = {}
+
+        manifest = read_json(manifest_path)
+        if manifest and manifest.get('endpoint') == endpoint:
+            self.months = manifest['months']
+
+    def __is_complete(self, month):
+        listing = self.months.get(_get_month_key(month))
+        if not listing:
+            return False
+        listed_at = datetime.datetime.strptime(listing['listed_at'], '%Y-%m-%dT%H:%M:%S')
+        return listed_at >= _get_month_end(month) + MONTH_COMPLETION_DELAY
+
+    def __list_month(self, month):
+        listed_at = datetime.datetime.utcnow().replace(microsecond=0)
+        objects = [obj for obj in list_objects(CC_NEWS_PREFIX + _get_month_key(month) + '/', endpoint=self.endpoint,
+                                               timeout=self.timeout)
+                   if obj['name'].endswith('.warc.gz')]
+        return {'listed_at': listed_at.strftime('%Y-%m-%dT%H:%M:%S'), 'objects': objects}
+
+    def refresh(self, start_date=None, end_date=None):
+        """
+        Lists all months within [start_date, end_date) that are not complete in the manifest and saves the manifest.
+        :param start_date: if None, the start of CC-NEWS
+        :param end_date: if None, now
+        """
+        months = [month for month in iterate_months(start_date, end_date) if not self.__is_complete(month)]
+        if not months:
+            return
+        LOGGER.info('listing %i months of CC-NEWS at %s', len(months), self.endpoint)
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for month, listing in zip(months, executor.map(self.__list_month, months)):
+                self.months[_get_month_key(month)] = listing
+
+        if self.manifest_path:
+            write_json_atomically(self.manifest_path, {'endpoint': self.endpoint, 'months': self.months})
+
+    def get_objects(self, start_date=None, end_date=None):
+        """
+        Returns the WARC files of all months within [start_date, end_date), after refreshing the listing if needed.
+        Note that files are not filtered by the exact date in their name, only by their month.
+        :param start_date: if None, the start of CC-NEWS
+        :param end_date: if None, now
+        :return: A list of dicts with the keys name, size and etag, sorted by name
+        """
+        self.refresh(start_date, end_date)
+        objects = []
+        for month in iterate_months(start_date, end_date):
+            objects.extend(self.months.get(_get_month_key(month), {}).get('objects', []))
+        return sorted(objects, key=lambda obj: obj['name'])
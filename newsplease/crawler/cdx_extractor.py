@@ -0,0 +1,359 @@
+"""
+Extracts articles from selected records of the main crawl of commoncrawl.org instead of whole WARC files. The records
+are looked up in a URL index, i.e., the CDX server of commoncrawl.org, a local CDXJ file or the columnar (Parquet)
+index, by URL patterns and a capture time window. Only the matching records are fetched from their WARC files with
+range requests, which transfers orders of magnitude less data than downloading the WARC files if only a few hosts are
+of interest.
+
+Example:
+CdxExtractor().extract_from_cdx('https://index.commoncrawl.org/CC-MAIN-2024-10-index', print,
+                                url_patterns=['*.elrancaguino.cl'])
+"""
+import collections
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from six.moves import urllib
+from warcio.archiveiterator import ArchiveIterator
+
+from .commoncrawl_extractor import CommonCrawlExtractor
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+except ImportError:
+    pa = None
+    pa_dataset = None
+
+LOGGER = logging.getLogger(__name__)
+
+# URL from which the records are fetched, followed by the filename given in the index
+CC_DATA_URL = 'https://data.commoncrawl.org/'
+# timeout in seconds of the requests to the index and of the range requests
+FETCH_TIMEOUT = 60
+# number of requests after which a request to the index or a range request gives up
+FETCH_ATTEMPTS = 3
+# seconds to wait before the second attempt, doubled for each further attempt
+RETRY_DELAY = 2
+# responses with these status codes are retried, e.g., 503 if commoncrawl.org throttles requests
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# number of records that are fetched in parallel
+NUMBER_OF_FETCH_THREADS = 16
+
+# columns of the columnar index that are read
+_PARQUET_COLUMNS = ['url', 'fetch_time', 'fetch_status', 'content_mime_detected', 'warc_filename',
+                    'warc_record_offset', 'warc_record_length']
+
+
+def _format_timestamp(date):
+    return date.strftime('%Y%m%d%H%M%S') if date else None
+
+
+def _strip_url(url):
+    """
+    Returns url without scheme and leading www., lowercased, which is how URLs are compared with URL patterns
+    """
+    url = url.lower()
+    if '://' in url:
+        url = url.split('://', 1)[1]
+    return url[4:] if url.startswith('www.') else url
+
+
+class UrlPattern(object):
+    """
+    A URL pattern as understood by the CDX server: '*.example.com' matches all URLs of example.com and its subdomains,
+    'example.com/news/*' all URLs starting with example.com/news/, and any other pattern only the URL itself. The scheme
+    and a leading www. are ignored.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.__domain = None
+        self.__prefix = None
+        self.__url = None
+        if pattern.startswith('*.'):
+            self.__domain = _strip_url(pattern[2:]).rstrip('/')
+        elif pattern.endswith('*'):
+            self.__prefix = _strip_url(pattern[:-1])
+        else:
+            self.__url = _strip_url(pattern)
+
+    def match(self, url):
+        stripped_url = _strip_url(url)
+        if self.__domain is not None:
+            host = stripped_url.split('/', 1)[0].split(':', 1)[0]
+            return host == self.__domain or host.endswith('.' + self.__domain)
+        if self.__prefix is not None:
+            return stripped_url.startswith(self.__prefix)
+        return stripped_url == self.__url
+
+
+def _get_with_retries(session, url, timeout=FETCH_TIMEOUT, max_attempts=FETCH_ATTEMPTS, **kwargs):
+    """
+    Sends a GET request, which is retried with an increasing delay on connection errors and on the status codes in
+    RETRY_STATUS_CODES
+    :return: the response, whose status code is not checked otherwise
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response = session.get(url, timeout=timeout, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_attempts:
+                return response
+            LOGGER.warning('attempt %i of %i to get %s failed with status %i', attempt, max_attempts, url,
+                           response.status_code)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == max_attempts:
+                raise
+            LOGGER.warning('attempt %i of %i to get %s failed: %s', attempt, max_attempts, url, e)
+        time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+
+
+def __query_cdx_server(session, endpoint, url_pattern, from_timestamp, to_timestamp):
+    """
+    Yields the captures of url_pattern from a CDX server, page by page
+    """
+    parameters = [('url', url_pattern), ('output', 'json'), ('filter', '=status:200')]
+    if from_timestamp:
+        parameters.append(('from', from_timestamp))
+    if to_timestamp:
+        parameters.append(('to', to_timestamp))
+
+    response = _get_with_retries(session, endpoint, params=parameters + [('showNumPages', 'true')])
+    if response.status_code == 404:
+        # no captures
+        return
+    response.raise_for_status()
+    try:
+        number_of_pages = int(response.json()['pages'])
+    except (ValueError, KeyError, TypeError):
+        # the server does not paginate
+        number_of_pages = 1
+
+    for page in range(number_of_pages):
+        page_parameters = parameters + [('page', page)] if number_of_pages > 1 else parameters
+        response = _get_with_retries(session, endpoint, params=page_parameters)
+        if response.status_code == 404:
+            continue
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line.strip():
+                yield json.loads(line)
+
+
+def __list_index_files(path, extensions):
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(extensions))
+    return [path]
+
+
+def __read_cdxj_files(path):
+    """
+    Yields the captures of local CDXJ files, i.e., lines of the form 'SURT TIMESTAMP JSON', which may be gzipped
+    :param path: a file or a directory of files
+    """
+    for file_path in __list_index_files(path, ('.cdx', '.cdxj', '.gz')):
+        open_file = gzip.open if file_path.endswith('.gz') else open
+        with open_file(file_path, 'rt', encoding='utf-8') as cdx_file:
+            for line in cdx_file:
+                parts = line.rstrip('\n').split(' ', 2)
+                if len(parts) != 3:
+                    continue
+                capture = json.loads(parts[2])
+                capture.setdefault('timestamp', parts[1])
+                yield capture
+
+
+def __read_parquet_files(path, from_date, to_date):
+    """
+    Yields the captures of the columnar index of commoncrawl.org, i.e., Parquet files, in the format of the CDX server
+    :param path: a file or a directory of files
+    """
+    if pa_dataset is None:
+        raise ModuleNotFoundError("Using a columnar index requires pyarrow")
+    dataset = pa_dataset.dataset(__list_index_files(path, ('.parquet',)), format='parquet')
+    # naive dates are compared as UTC with the timestamps of the index
+    fetch_time_type = dataset.schema.field('fetch_time').type
+    condition = pa_dataset.field('fetch_status') == 200
+    if from_date:
+        condition &= pa_dataset.field('fetch_time') >= pa.scalar(from_date, type=fetch_time_type)
+    if to_date:
+        condition &= pa_dataset.field('fetch_time') <= pa.scalar(to_date, type=fetch_time_type)
+    for batch in dataset.to_batches(columns=_PARQUET_COLUMNS, filter=condition):
+        for row in batch.to_pylist():
+            yield {'url': row['url'], 'timestamp': _format_timestamp(row['fetch_time']),
+                   'status': str(row['fetch_status']), 'mime-detected': row['content_mime_detected'],
+                   'filename': row['warc_filename'], 'offset': row['warc_record_offset'],
+                   'length': row['warc_record_length']}
+
+
+def query_cdx(cdx_index, url_patterns, from_date=None, to_date=None, session=None):
+    """
+    Looks up the captures of HTML pages that match url_patterns in a URL index
+    :param cdx_index: the URL of a CDX server, e.g., https://index.commoncrawl.org/CC-MAIN-2024-10-index, or the path
+    of a local CDXJ file, of a Parquet file of the columnar index, or of a directory of such files
+    :param url_patterns: a list of URL patterns, see UrlPattern
+    :param from_date: if not None, only captures from this date on are returned, as datetime
+    :param to_date: if not None, only captures until this date are returned, as datetime
+    :param session: if not None, the requests.Session used to query a CDX server
+    :return: A generator of dicts with at least the keys url, timestamp, filename, offset and length, as returned by
+    the CDX server
+    """
+    from_timestamp = _format_timestamp(from_date)
+    to_timestamp = _format_timestamp(to_date)
+    patterns = [UrlPattern(url_pattern) for url_pattern in url_patterns]
+
+    if urllib.parse.urlparse(cdx_index).scheme in ('http', 'https'):
+        session = session or requests.Session()
+        # the server matches the URL patterns and the time window
+        captures = (capture for url_pattern in url_patterns
+                    for capture in __query_cdx_server(session, cdx_index, url_pattern, from_timestamp, to_timestamp))
+    elif cdx_index.endswith('.parquet') or (os.path.isdir(cdx_index) and
+                                           any(name.endswith('.parquet') for name in os.listdir(cdx_index))):
+        captures = __read_parquet_files(cdx_index, from_date, to_date)
+    else:
+        captures = __read_cdxj_files(cdx_index)
+
+    for capture in captures:
+        if str(capture.get('status', '200')) != '200':
+            continue
+        mime = capture.get('mime-detected') or capture.get('mime') or ''
+        if mime and 'html' not in mime:
+            continue
+        timestamp = capture.get('timestamp', '')
+        if (from_timestamp and timestamp < from_timestamp) or (to_timestamp and timestamp[:14] > to_timestamp):
+            continue
+        if not any(pattern.match(capture['url']) for pattern in patterns):
+            continue
+        yield capture
+
+
+class CdxExtractor(CommonCrawlExtractor):
+    """
+    Extracts articles from the records of the main crawl of commoncrawl.org that match URL patterns, see query_cdx. The
+    records are fetched with range requests by a pool of threads, each of which keeps its connections open, and are
+    extracted and filtered one at a time in the calling thread like the records of a WARC file, see process_record.
+    """
+
+    def __init__(self):
+        self._sessions = threading.local()
+
+    def __get_session(self):
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session
+
+    def fetch_record(self, capture, cc_data_url=CC_DATA_URL):
+        """
+        Fetches the WARC record of a capture with a range request
+        :param capture: a dict as returned by query_cdx
+        :param cc_data_url: URL from which the WARC files are fetched
+        :return: the WARC record
+        """
+        offset = int(capture['offset'])
+        length = int(capture['length'])
+        response = _get_with_retries(self.__get_session(), cc_data_url + capture['filename'],
+                                     headers={'Range': 'bytes=%i-%i' % (offset, offset + length - 1)})
+        if response.status_code != 206:
+            raise IOError('range request for %s of %s failed with status %i' % (capture['url'], capture['filename'],
+                                                                                response.status_code))
+        if len(response.content) != length:
+            raise IOError('range request for %s of %s returned %i bytes instead of %i' % (
+                capture['url'], capture['filename'], len(response.content), length))
+        # each record is a gzip member of its own
+        return next(iter(ArchiveIterator(io.BytesIO(response.content))))
+
+    def __fetch(self, capture, cc_data_url):
+        try:
+            return capture, self.fetch_record(capture, cc_data_url), None
+        except Exception as e:
+            return capture, None, e
+
+    def __fetch_parallel(self, captures, cc_data_url, number_of_fetch_threads):
+        """
+        Fetches the records of captures in parallel and yields them in the order of captures. At most twice as many
+        records as there are threads are fetched ahead, so that the memory used is bounded.
+        """
+        with ThreadPoolExecutor(max_workers=number_of_fetch_threads) as executor:
+            pending = collections.deque()
+            for capture in captures:
+                pending.append(executor.submit(self.__fetch, capture, cc_data_url))
+                if len(pending) >= 2 * number_of_fetch_threads:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def extract_from_cdx(self, cdx_index, callback_on_article_extracted, url_patterns=None, valid_hosts=None,
+                         from_date=None, to_date=None, start_date=None, end_date=None, strict_date=True,
+                         continue_after_error=True, ignore_unicode_errors=False, log_level=logging.ERROR,
+                         fetch_images=False, substring_host_match=False, cc_data_url=CC_DATA_URL,
+                         number_of_fetch_threads=NUMBER_OF_FETCH_THREADS):
+        """
+        Extracts articles from the records that match url_patterns in a URL index of commoncrawl.org. For each article
+        that was extracted successfully and passes the filter criteria, callback_on_article_extracted is invoked with
+        the article object.
+        :param cdx_index: a CDX server or local index, see query_cdx
+        :param callback_on_article_extracted:
+        :param url_patterns: a list of URL patterns, see UrlPattern, if None, all URLs of the valid_hosts and their
+        subdomains
+        :param valid_hosts:
+        :param from_date: if not None, only records captured from this date on are extracted, as datetime
+        :param to_date: if not None, only records captured until this date are extracted, as datetime
+        :param start_date: if not None, articles published earlier are discarded, as datetime
+        :param end_date: if not None, articles published later are discarded, as datetime
+        :param strict_date:
+        :param continue_after_error: if True, records that cannot be fetched or extracted are counted as errors, else
+        the error is raised
+        :param ignore_unicode_errors:
+        :param log_level:
+        :param fetch_images:
+        :param substring_host_match:
+        :param cc_data_url: URL from which the WARC files are fetched, followed by the filename given in the index
+        :param number_of_fetch_threads: number of records that are fetched in parallel
+        :return: A tuple of the counters of passed, discarded, erroneous and all articles
+        """
+        if not url_patterns:
+            if not valid_hosts:
+                raise ValueError('url_patterns or valid_hosts are required')
+            url_patterns = ['*.' + host for host in valid_hosts]
+        if not cc_data_url.endswith('/'):
+            cc_data_url += '/'
+        self.configure(cdx_index, callback_on_article_extracted, valid_hosts=valid_hosts, start_date=start_date,
+                       end_date=end_date, strict_date=strict_date, continue_after_error=continue_after_error,
+                       ignore_unicode_errors=ignore_unicode_errors, log_level=log_level, fetch_images=fetch_images,
+                       substring_host_match=substring_host_match)
+        LOGGER.setLevel(log_level)
+
+        counters = collections.Counter()
+        start_time = time.time()
+        captures = query_cdx(cdx_index, url_patterns, from_date=from_date, to_date=to_date,
+                             session=self.__get_session())
+        for capture, record, error in self.__fetch_parallel(captures, cc_data_url, number_of_fetch_threads):
+            counters['total'] += 1
+            if error is not None:
+                if not continue_after_error:
+                    raise error
+                LOGGER.error('could not fetch %s: %s', capture['url'], error)
+                counters['error'] += 1
+            elif record.rec_type != 'response':
+                LOGGER.error('record of %s is a %s record', capture['url'], record.rec_type)
+                counters['error'] += 1
+            else:
+                counters[self.process_record(record)] += 1
+
+            if counters['total'] % 100 == 0:
+                LOGGER.info('pass = %i, discard = %i, error = %i, total = %i; %f s/article', counters['passed'],
+                            counters['discarded'], counters['error'], counters['total'],
+                            (time.time() - start_time) / counters['total'])
+
+        LOGGER.info('extracted %i of %i records of %s in %s', counters['passed'], counters['total'], cdx_index,
+                    datetime.timedelta(seconds=int(time.time() - start_time)))
+        return counters['passed'], counters['discarded'], counters['error'], counters['total']
@@ -6,17 +6,33 @@ not otherwise specified.
 """
 import logging
 import os
-import subprocess
-import tempfile
+import queue
+import socket
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
-from multiprocessing import Pool
+from contextlib import contextmanager
+from multiprocessing import Manager, Pool
 import datetime
 
 from dateutil import parser
+from warcio.archiveiterator import ArchiveIterator
 from scrapy.utils.log import configure_logging
 
-from ..crawler.commoncrawl_extractor import CommonCrawlExtractor
+from ..crawler.cc_news_index import CC_NEWS_START_DATE, CCNewsIndex
+from ..crawler.commoncrawl_extractor import CommonCrawlExtractor, _accepts_keyword_argument
+from ..crawler.article_batch import RESUME, ArticleBatcher, deserialize_article, serialize_article
+from ..crawler.crawl_metrics import CrawlMetrics, measure
+from ..crawler.warc_dedup import RecordDeduplicator
+from ..crawler.warc_download import download_file, get_checkpoint_path, get_local_filepath, is_downloaded
+from ..crawler.warc_ledger import DONE, FAILED, WarcLedger
+from ..crawler.warc_record import deserialize_warc_record, serialize_warc_record
+from ..crawler.warc_sharding import LEASE_TIMEOUT, LeaseDirectory, assign_shards
+from ..crawler.warc_stream import open_remote_stream
+from ..helper_classes.bloom_filter import DEFAULT_CAPACITY, DEFAULT_ERROR_RATE, BloomFilter
+from ..helper_classes.host_index import get_host_index
 
 __author__ = "Felix Hamborg"
 __copyright__ = "Copyright 2017"
@@ -25,8 +41,16 @@ __credits__ = ["Sebastian Nagel"]
 # commoncrawl.org
 __cc_base_url = 'https://commoncrawl.s3.amazonaws.com/'
 
-# log file of fully extracted WARC files
+# log file of fully extracted WARC files of former versions, which is imported into the ledger
 __log_pathname_fully_extracted_warcs = None
+# the state of each WARC file, see WarcLedger
+__warc_ledger = None
+# if not None, the LeaseDirectory through which nodes share the WARC files
+__lease_directory = None
+# manifest of the listing of the WARC files, see CCNewsIndex
+__cc_news_index_pathname = None
+# the size of each WARC file according to the listing, set before the extraction processes are forked
+__warc_sizes = {}
 
 # logging
 logging.basicConfig(level=logging.INFO)
@@ -35,16 +59,31 @@ __logger = logging.getLogger(__name__)
 __number_of_warc_files_on_cc = 0
 
 __extern_callback_on_warc_completed = None
-__counter_article_passed = 0
-__counter_article_discarded = 0
-__counter_article_error = 0
-__counter_article_total = 0
+__extern_callback_on_progress = None
 __counter_warc_skipped = 0
-__counter_warc_processed = 0
-__start_time = time.time()
+# statistics of the whole crawl, only available in the parent process, see CrawlMetrics
+__metrics = None
+__metrics_lock = threading.Lock()
+# within an extraction process, the queue through which completed WARC files are reported to the parent process
+__metrics_queue = None
 
-# When Common Crawl started.
-__common_crawl_start_date = datetime.datetime(2016, 8, 26)
+# if articles are sent in batches to the parent process, see crawl_from_commoncrawl
+__extern_callback_on_article_batch = None
+__article_batch_size = 100
+__max_pending_article_batches = None
+__article_batch_lock = threading.Lock()
+# the ArticleBatcher of the WARC file that is currently extracted by this process
+__article_batcher = None
+# within an extraction process, the queue through which the batches are sent to the parent process, the number of
+# batches sent so far, and the dict and condition through which the parent process reports their delivery
+__article_queue = None
+__article_batches_sent = 0
+__delivered_article_batches = None
+__article_delivery = None
+
+# default budget of WARC files that are downloaded but not yet extracted, if prefetching is enabled
+__default_prefetch_max_bytes = 8 * 1024 ** 3
+__default_prefetch_max_files = 8
 
 def __setup(local_download_dir_warc, log_level):
     """
@@ -55,6 +94,15 @@ def __setup(local_download_dir_warc, log_level):
 
     global __log_pathname_fully_extracted_warcs
     __log_pathname_fully_extracted_warcs = os.path.join(local_download_dir_warc, 'fullyextractedwarcs.list')
+    global __cc_news_index_pathname
+    __cc_news_index_pathname = os.path.join(local_download_dir_warc, 'cc-news-index.json')
+    global __warc_ledger
+    __warc_ledger = WarcLedger(os.path.join(local_download_dir_warc, 'warcs.sqlite'))
+    if os.path.isfile(__log_pathname_fully_extracted_warcs):
+        number_of_warcs = __warc_ledger.import_list(__log_pathname_fully_extracted_warcs)
+        os.replace(__log_pathname_fully_extracted_warcs, __log_pathname_fully_extracted_warcs + '.imported')
+        logging.getLogger(__name__).info('imported %i fully extracted WARC files from %s', number_of_warcs,
+                                         __log_pathname_fully_extracted_warcs)
 
     # make loggers quite
     configure_logging({"LOG_LEVEL": "ERROR"})
@@ -93,22 +141,6 @@ def __get_download_url(name):
     return __cc_base_url + name
 
 
-def __iterate_by_month(start_date=None, end_date=None, month_step=1):
-    if start_date is None:
-        # The starting month of Common Crawl.
-        start_date = __common_crawl_start_date
-    if end_date is None:
-        # Until now.
-        end_date = datetime.datetime.today()
-    current_date = start_date
-    while current_date < end_date:
-        yield current_date
-        carry, new_month = divmod(current_date.month - 1 + month_step, 12)
-        new_month += 1
-        current_date = current_date.replace(year=current_date.year + carry,
-                                            month=new_month)
-
-
 def __extract_date_from_warc_filename(path):
     fn = os.path.basename(path)
     # Assume the filename pattern is CC-NEWS-20160911145202-00018.warc.gz
@@ -121,7 +153,7 @@ def __extract_date_from_warc_filename(path):
 def __date_within_period(date, start_date=None, end_date=None):
     if start_date is None:
         # The starting month of Common Crawl.
-        start_date = __common_crawl_start_date
+        start_date = CC_NEWS_START_DATE
     if end_date is None:
         # Until now.
         end_date = datetime.datetime.today()
@@ -130,50 +162,17 @@ def __date_within_period(date, start_date=None, end_date=None):
 
 def __get_remote_index(warc_files_start_date, warc_files_end_date):
     """
-    Gets the index of news crawl files from commoncrawl.org and returns an array of names
+    Gets the index of news crawl files from commoncrawl.org and returns an array of names. The listing is cached in a
+    manifest in the local download directory, see CCNewsIndex.
     :param warc_files_start_date: only list .warc files with greater or equal date in
     their filename
     :param warc_files_end_date: only list .warc files with smaller date in their filename
     :return:
     """
-
-    with tempfile.NamedTemporaryFile() as temp:
-        temp_filename = temp.name
-
-        if os.name == 'nt':
-            awk_parameter = '"{ print $4 }"'
-        else:
-            awk_parameter = "'{ print $4 }'"
-
-        # get the remote info
-
-        cmd = ''
-        if warc_files_start_date or warc_files_end_date:
-            # cleanup
-            try:
-                os.remove(temp_filename)
-            except OSError:
-                pass
-
-            # The news files are grouped per year and month in separate folders
-            warc_dates = __iterate_by_month(start_date=warc_files_start_date, end_date=warc_files_end_date)
-            for date in warc_dates:
-                year = date.strftime('%Y')
-                month = date.strftime('%m')
-                cmd += "aws s3 ls --recursive s3://commoncrawl/crawl-data/CC-NEWS/%s/%s/ --no-sign-request >> %s && " % (year, month, temp_filename)
-
-        else:
-            cmd = "aws s3 ls --recursive s3://commoncrawl/crawl-data/CC-NEWS/ --no-sign-request > %s && " % temp_filename
-
-        cmd += "awk %s %s " % (awk_parameter, temp_filename)
-
-        __logger.info('executing: %s', cmd)
-        exitcode, stdout_data = subprocess.getstatusoutput(cmd)
-
-        if exitcode > 0:
-            raise Exception(stdout_data)
-
-    lines = stdout_data.splitlines()
+    index = CCNewsIndex(__cc_news_index_pathname, endpoint=__cc_base_url)
+    objects = index.get_objects(warc_files_start_date, warc_files_end_date)
+    __warc_sizes.update((__get_download_url(obj['name']), obj['size']) for obj in objects if obj['size'])
+    lines = [obj['name'] for obj in objects]
 
     if warc_files_start_date or warc_files_end_date:
         # Now filter further on day of month, hour, minute
@@ -188,63 +187,190 @@ def __get_remote_index(warc_files_start_date, warc_files_end_date):
     return lines
 
 
-def __get_list_of_fully_extracted_warc_urls():
-    """
-    Reads in the log file that contains a list of all previously, fully extracted WARC urls
-    :return:
-    """
-    if not os.path.isfile(__log_pathname_fully_extracted_warcs):
-        return []
-
-    with open(__log_pathname_fully_extracted_warcs) as log_file:
-        list_warcs = log_file.readlines()
-    # remove break lines
-    list_warcs = [x.strip() for x in list_warcs]
-
-    return list_warcs
-
-
 def __callback_on_warc_completed(warc_path, counter_article_passed, counter_article_discarded, counter_article_error,
-                                 counter_article_total):
+                                 counter_article_total, filter_stage_counters=None, stage_seconds=None,
+                                 busy_seconds=None):
     """
-    Internal callback on completion of one WARC file. Calculating some statistics on processing speed.
+    Internal callback on completion of one WARC file. Within an extraction process, the statistics of the WARC file are
+    sent to the parent process, which aggregates the statistics of all processes, see __on_warc_completed.
     :param warc_path:
     :param counter_article_passed:
     :param counter_article_discarded:
     :param counter_article_error:
     :param counter_article_total:
+    :param filter_stage_counters: A dict of the number of records discarded or passed at each filter stage, see
+    CommonCrawlExtractor.filter_record
+    :param stage_seconds: A dict of the seconds spent in each stage of the extraction, see crawl_metrics.STAGES
+    :param busy_seconds: the seconds spent on the WARC file
     :return:
     """
-    # have to use the global keyword in order to assign a value to a global variable (see https://stackoverflow.com/a/9936482)
-    global __counter_article_passed
-    global __counter_article_discarded
-    global __counter_article_error
-    global __counter_article_total
-    global __counter_warc_processed
-    # global __counter_warc_skipped
+    report = (os.getpid(), warc_path, counter_article_passed, counter_article_discarded, counter_article_error,
+              counter_article_total, filter_stage_counters, stage_seconds, busy_seconds)
+    if __metrics_queue is not None:
+        __metrics_queue.put(report)
+    else:
+        __on_warc_completed(*report)
+
+
+def __on_warc_completed(worker, warc_path, counter_article_passed, counter_article_discarded, counter_article_error,
+                        counter_article_total, filter_stage_counters, stage_seconds, busy_seconds):
+    """
+    Aggregates the statistics of a completed WARC file in the parent process, logs the statistics of the whole crawl
+    and invokes the external callbacks.
+    """
+    if __lease_directory is not None:
+        __lease_directory.complete(warc_path)
 
-    elapsed_secs = time.time() - __start_time
+    with __metrics_lock:
+        __metrics.add_warc(worker, counter_article_passed, counter_article_discarded, counter_article_error,
+                           counter_article_total, filter_stage_counters=filter_stage_counters,
+                           stage_seconds=stage_seconds, busy_seconds=busy_seconds)
+        metrics = __metrics.log(__logger)
 
-    __counter_article_discarded += counter_article_discarded
-    __counter_article_error += counter_article_error
-    __counter_article_passed += counter_article_passed
-    __counter_article_total += counter_article_total
-    __counter_warc_processed += 1
+        # invoke the external callbacks
+        if __extern_callback_on_warc_completed:
+            articles = metrics['articles']
+            kwargs = {}
+            if _accepts_keyword_argument(__extern_callback_on_warc_completed, 'filter_stage_counters'):
+                kwargs['filter_stage_counters'] = metrics['filter_stages']
+            __extern_callback_on_warc_completed(warc_path, articles['passed'], articles['discarded'],
+                                                articles['error'], articles['total'], metrics['warcs']['processed'],
+                                                **kwargs)
+        if __extern_callback_on_progress:
+            __extern_callback_on_progress(metrics)
 
-    sec_per_article = elapsed_secs / counter_article_total
-    h_per_warc = elapsed_secs / __counter_warc_processed / 3600
-    remaining_warcs = __number_of_warc_files_on_cc - (__counter_warc_processed + __counter_warc_skipped)
 
-    __logger.info("warc processing statistics")
-    __logger.info("warc files skipped = %i, processed = %i, remaining = %i, total = %i", __counter_warc_skipped,
-                  __counter_warc_processed, remaining_warcs, __number_of_warc_files_on_cc)
-    __logger.info("global [s/article] = %f", sec_per_article)
-    __logger.info("global [h/warc] = %.3f", h_per_warc)
-    __logger.info("estimated remaining time [h] = %f", remaining_warcs / h_per_warc)
+def __init_extraction_process(metrics_queue, article_queue=None, delivered_article_batches=None,
+                              article_delivery=None):
+    """
+    Initializes an extraction process, which reports completed WARC files to the parent process through metrics_queue
+    and, if article_queue is not None, sends the extracted articles in batches through article_queue, see
+    __receive_article_batches
+    """
+    global __metrics_queue
+    __metrics_queue = metrics_queue
+    if article_queue is not None:
+        global __article_batcher, __article_queue, __delivered_article_batches, __article_delivery
+        __article_queue = article_queue
+        __delivered_article_batches = delivered_article_batches
+        __article_delivery = article_delivery
+        __article_batcher = ArticleBatcher(__send_article_batch, __article_batch_size,
+                                           wait_until_delivered=__wait_until_article_batches_delivered)
+
 
-    # invoke the external callback
-    __extern_callback_on_warc_completed(warc_path, __counter_article_passed, __counter_article_discarded,
-                                        __counter_article_error, __counter_article_total, __counter_warc_processed)
+def __send_article_batch(batch):
+    """
+    Sends a batch of articles from an extraction process to the parent process
+    """
+    global __article_batches_sent
+    __article_queue.put((os.getpid(), batch))
+    __article_batches_sent += 1
+
+
+def __wait_until_article_batches_delivered():
+    """
+    Waits within an extraction process until the parent process has delivered all batches that the process has sent
+    :raises IOError: if callback_on_article_batch failed on one of these batches
+    """
+    worker = os.getpid()
+    with __article_delivery:
+        delivered, error = __delivered_article_batches.get(worker, (0, None))
+        while delivered < __article_batches_sent:
+            __article_delivery.wait()
+            delivered, error = __delivered_article_batches.get(worker, (0, None))
+        if error:
+            __delivered_article_batches[worker] = (delivered, None)
+    if error:
+        raise IOError('delivering the articles failed: %s' % error)
+
+
+def __deliver_article_batch(batch):
+    """
+    Invokes callback_on_article_batch with a batch of articles, only one batch is delivered at a time. If the batch
+    has a checkpoint, the resume_warc or save_checkpoint method of the callback is invoked, too, if it has one.
+    :param batch: A tuple of the WARC URL, a list of serialized articles, whether the WARC file has been completed and
+    a checkpoint, see ArticleBatcher
+    """
+    warc_download_url, articles, warc_completed, checkpoint = batch
+    with __article_batch_lock:
+        if checkpoint is not None and checkpoint[0] == RESUME:
+            resume_warc = getattr(__extern_callback_on_article_batch, 'resume_warc', None)
+            if resume_warc is not None:
+                resume_warc(warc_download_url, checkpoint[1])
+            return
+        if articles or warc_completed:
+            __extern_callback_on_article_batch(warc_download_url,
+                                               [deserialize_article(article) for article in articles], warc_completed)
+        if checkpoint is not None:
+            save_checkpoint = getattr(__extern_callback_on_article_batch, 'save_checkpoint', None)
+            if save_checkpoint is not None:
+                save_checkpoint(warc_download_url, checkpoint[1])
+
+
+def __receive_article_batches(article_queue, delivered_article_batches, article_delivery):
+    """
+    Receives batches of articles from the extraction processes until None is received. After each batch, the number of
+    batches delivered for its extraction process and the last error are updated in delivered_article_batches, so that
+    the extraction process can wait until its articles have been delivered before it saves a checkpoint or records the
+    WARC file as done, see __wait_until_article_batches_delivered.
+    """
+    for worker, batch in iter(article_queue.get, None):
+        error = None
+        try:
+            __deliver_article_batch(batch)
+        except Exception as e:
+            __logger.error('processing articles failed: %s %s', batch[0], e, exc_info=True)
+            error = repr(e)
+        with article_delivery:
+            delivered, last_error = delivered_article_batches.get(worker, (0, None))
+            delivered_article_batches[worker] = (delivered + 1, error or last_error)
+            article_delivery.notify_all()
+
+
+def __receive_metrics(metrics_queue):
+    """
+    Receives the reports of completed WARC files from the extraction processes until None is received
+    """
+    for report in iter(metrics_queue.get, None):
+        try:
+            __on_warc_completed(*report)
+        except Exception as e:
+            __logger.error('processing statistics failed: %s', e)
+
+
+@contextmanager
+def __extraction_process_pool(number_of_extraction_processes):
+    """
+    Creates a pool of extraction processes, which report completed WARC files and, if callback_on_article_batch is
+    set, batches of articles to the parent process
+    """
+    with Manager() as manager:
+        metrics_queue = manager.Queue()
+        receivers = [threading.Thread(target=__receive_metrics, args=(metrics_queue,), daemon=True)]
+        article_queue = None
+        delivered_article_batches = None
+        article_delivery = None
+        if __extern_callback_on_article_batch:
+            # the extraction processes wait if the batches are consumed slower than they are extracted
+            article_queue = manager.Queue(__max_pending_article_batches or 4 * number_of_extraction_processes)
+            delivered_article_batches = manager.dict()
+            article_delivery = manager.Condition()
+            receivers.append(threading.Thread(target=__receive_article_batches,
+                                              args=(article_queue, delivered_article_batches, article_delivery),
+                                              daemon=True))
+        for receiver in receivers:
+            receiver.start()
+        try:
+            with Pool(number_of_extraction_processes, initializer=__init_extraction_process,
+                      initargs=(metrics_queue, article_queue, delivered_article_batches,
+                                article_delivery)) as extraction_process_pool:
+                yield extraction_process_pool
+        finally:
+            metrics_queue.put(None)
+            if article_queue is not None:
+                article_queue.put(None)
+            for receiver in receivers:
+                receiver.join()
 
 
 def __start_commoncrawl_extractor(warc_download_url, callback_on_article_extracted=None,
@@ -256,9 +382,15 @@ def __start_commoncrawl_extractor(warc_download_url, callback_on_article_extract
                                   log_level=logging.ERROR,
                                   delete_warc_after_extraction=True,
                                   continue_process=True,
-                                  log_pathname_fully_extracted_warcs=None,
+                                  warc_ledger=None,
+                                  verify_gzip=False,
                                   extractor_cls=CommonCrawlExtractor,
-                                  fetch_images=False):
+                                  fetch_images=False,
+                                  stream_warc=False,
+                                  substring_host_match=False,
+                                  checkpoint_interval=0,
+                                  duplicate_filter=None,
+                                  deduplicate_urls=False):
     """
     Starts a single CommonCrawlExtractor
     :param warc_download_url:
@@ -275,8 +407,21 @@ def __start_commoncrawl_extractor(warc_download_url, callback_on_article_extract
     :param log_level:
     :param extractor_cls: A subclass of CommonCrawlExtractor, which can be used
         to add custom filtering by overriding .filter_record(...)
+    :param fetch_images:
+    :param stream_warc:
+    :param substring_host_match:
+    :param checkpoint_interval:
+    :param warc_ledger:
+    :param verify_gzip:
+    :param duplicate_filter:
+    :param deduplicate_urls:
     :return:
     """
+    if not __acquire_lease(warc_download_url):
+        return
+    if __article_batcher is not None:
+        # the articles are sent in batches by the ArticleBatcher of this process, which the extractor starts
+        callback_on_article_extracted = __article_batcher
     commoncrawl_extractor = extractor_cls()
     commoncrawl_extractor.extract_from_commoncrawl(warc_download_url, callback_on_article_extracted,
                                                    callback_on_warc_completed=callback_on_warc_completed,
@@ -289,8 +434,475 @@ def __start_commoncrawl_extractor(warc_download_url, callback_on_article_extract
                                                    show_download_progress=show_download_progress,
                                                    log_level=log_level,
                                                    delete_warc_after_extraction=delete_warc_after_extraction,
-                                                   log_pathname_fully_extracted_warcs=__log_pathname_fully_extracted_warcs,
-                                                   fetch_images=fetch_images)
+                                                   warc_ledger=warc_ledger,
+                                                   expected_size=__warc_sizes.get(warc_download_url),
+                                                   verify_gzip=verify_gzip,
+                                                   fetch_images=fetch_images,
+                                                   stream_warc=stream_warc,
+                                                   substring_host_match=substring_host_match,
+                                                   checkpoint_interval=checkpoint_interval,
+                                                   duplicate_filter=duplicate_filter,
+                                                   deduplicate_urls=deduplicate_urls)
+
+
+def __requeue_unsaved_warcs(saved_warc_urls):
+    """
+    Queues the WARC files that are done in the ledger again if their articles have not all been saved, e.g., since
+    some were in a Parquet shard that was not completed before the crawl was interrupted
+    :param saved_warc_urls: the URLs of the WARC files whose articles have all been saved
+    """
+    unsaved_warc_urls = __warc_ledger.get_urls(DONE) - set(saved_warc_urls)
+    if not unsaved_warc_urls:
+        return
+    __logger.info('extracting %i WARC files again, since not all of their articles were saved', len(unsaved_warc_urls))
+    __warc_ledger.requeue(unsaved_warc_urls)
+
+
+def __acquire_lease(warc_download_url):
+    """
+    Takes the lease of the WARC file if leases are used
+    :return: False if another node extracts the WARC file
+    """
+    if __lease_directory is None or __lease_directory.acquire(warc_download_url):
+        return True
+    __logger.info('skipping WARC because it is leased by another node: %s', warc_download_url)
+    return False
+
+
+class _WarcPrefetcher:
+    """
+    Downloads upcoming WARC files in a background thread into the local download directory, so that the extraction
+    processes do not need to wait for downloads. The number and size of the files that are downloaded but not yet
+    extracted is limited.
+    """
+
+    def __init__(self, warc_download_urls, local_download_dir_warc, reuse_previously_downloaded_files, max_bytes,
+                 max_files, on_downloaded=None, expected_sizes=None, verify_gzip=False, acquire=None):
+        """
+        :param on_downloaded: if not None, called with the seconds spent on each download
+        :param acquire: if not None, called with the URL of each WARC file before it is downloaded, the WARC file is
+        skipped if it returns False
+        :param expected_sizes: if not None, a dict of the sizes of the WARC files, see download_file
+        :param verify_gzip: see download_file
+        """
+        self.on_downloaded = on_downloaded
+        self.expected_sizes = expected_sizes or {}
+        self.verify_gzip = verify_gzip
+        self.acquire = acquire
+        self.warc_download_urls = warc_download_urls
+        self.local_download_dir_warc = local_download_dir_warc
+        self.reuse_previously_downloaded_files = reuse_previously_downloaded_files
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.logger = logging.getLogger(__name__)
+        # (start, end) of each download
+        self.download_intervals = []
+
+        self.__downloaded = queue.Queue()
+        self.__condition = threading.Condition()
+        self.__bytes_in_flight = 0
+        self.__files_in_flight = 0
+        self.__error = None
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def __has_budget(self):
+        return self.__files_in_flight < self.max_files and \
+               (self.__bytes_in_flight < self.max_bytes or self.__files_in_flight == 0)
+
+    def __run(self):
+        try:
+            self.__prefetch()
+        except BaseException as e:
+            # e.g., if the lease directory cannot be accessed, the error is raised by __iter__
+            self.__error = e
+        finally:
+            self.__downloaded.put(None)
+
+    def __prefetch(self):
+        for warc_download_url in self.warc_download_urls:
+            if self.acquire and not self.acquire(warc_download_url):
+                continue
+            with self.__condition:
+                self.__condition.wait_for(self.__has_budget)
+                self.__files_in_flight += 1
+
+            local_filepath = get_local_filepath(self.local_download_dir_warc, warc_download_url)
+            start = time.time()
+            try:
+                expected_size = self.expected_sizes.get(warc_download_url)
+                if self.reuse_previously_downloaded_files and is_downloaded(local_filepath, expected_size):
+                    self.logger.info('found local file %s, not downloading again due to configuration', local_filepath)
+                else:
+                    self.logger.info('prefetching %s (local: %s)', warc_download_url, local_filepath)
+                    download_file(warc_download_url, local_filepath, expected_size=expected_size,
+                                  verify_gzip=self.verify_gzip)
+                    self.download_intervals.append((start, time.time()))
+                    if self.on_downloaded:
+                        self.on_downloaded(time.time() - start)
+                size = os.path.getsize(local_filepath)
+            except Exception as e:
+                # the extraction process will try to download the file again
+                self.logger.error('prefetching failed: %s %s', warc_download_url, e)
+                size = 0
+
+            with self.__condition:
+                self.__bytes_in_flight += size
+            self.__downloaded.put((warc_download_url, size))
+
+    def __iter__(self):
+        """
+        Starts the downloads and yields a (url, size) tuple for each downloaded WARC file, which must be passed to
+        release once the file has been extracted.
+        :raises Exception: the error by which the downloads were stopped, if any
+        """
+        self.__thread.start()
+        while True:
+            item = self.__downloaded.get()
+            if item is None:
+                if self.__error is not None:
+                    raise self.__error
+                return
+            yield item
+
+    def release(self, size):
+        """
+        Frees the budget of a WARC file after its extraction
+        :param size:
+        """
+        with self.__condition:
+            self.__files_in_flight -= 1
+            self.__bytes_in_flight -= size
+            self.__condition.notify_all()
+
+
+def __extract_prefetched_warc(warc_download_url, **extractor_kwargs):
+    """
+    Extracts a prefetched WARC file, see __start_commoncrawl_extractor
+    :return: A tuple of the start and the end time of the extraction
+    """
+    start = time.time()
+    __start_commoncrawl_extractor(warc_download_url, **extractor_kwargs)
+    return start, time.time()
+
+
+def __merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def __log_overlap(download_intervals, extraction_intervals, start_time):
+    """
+    Logs how much of the time spent downloading overlapped with the time spent extracting
+    """
+    downloads = __merge_intervals(download_intervals)
+    extractions = __merge_intervals(extraction_intervals)
+    download_secs = sum(end - start for start, end in downloads)
+    extraction_secs = sum(end - start for start, end in extractions)
+    overlap_secs = sum(max(0, min(d_end, e_end) - max(d_start, e_start))
+                       for d_start, d_end in downloads for e_start, e_end in extractions)
+
+    __logger.info('prefetching statistics')
+    __logger.info('wall time [s] = %.1f, downloading [s] = %.1f, extracting [s] = %.1f, both [s] = %.1f',
+                  time.time() - start_time, download_secs, extraction_secs, overlap_secs)
+    if download_secs:
+        __logger.info('%.0f%% of the download time overlapped with extraction', 100 * overlap_secs / download_secs)
+
+
+def __crawl_with_prefetching(warc_download_urls, number_of_extraction_processes, extractor_kwargs, max_bytes,
+                             max_files):
+    """
+    Extracts the WARC files as soon as they have been downloaded by a _WarcPrefetcher
+    """
+    start_time = time.time()
+    # the prefetched files must be used by the extraction processes
+    prefetcher = _WarcPrefetcher(warc_download_urls, extractor_kwargs['local_download_dir_warc'],
+                                  extractor_kwargs['reuse_previously_downloaded_files'], max_bytes, max_files,
+                                  on_downloaded=lambda seconds: __metrics.add_worker_time(
+                                      'prefetcher', seconds, {'download': seconds}),
+                                  expected_sizes=__warc_sizes, verify_gzip=extractor_kwargs['verify_gzip'],
+                                  acquire=__acquire_lease)
+    extractor_kwargs = dict(extractor_kwargs, reuse_previously_downloaded_files=True)
+    extraction_intervals = []
+
+    if number_of_extraction_processes > 1:
+        with __extraction_process_pool(number_of_extraction_processes) as extraction_process_pool:
+            results = []
+            for warc_download_url, size in prefetcher:
+                def on_completed(interval, size=size):
+                    extraction_intervals.append(interval)
+                    prefetcher.release(size)
+
+                def on_error(error, warc_download_url=warc_download_url, size=size):
+                    __logger.error('extraction failed: %s %s', warc_download_url, error)
+                    prefetcher.release(size)
+
+                results.append(extraction_process_pool.apply_async(
+                    __extract_prefetched_warc, (warc_download_url,), extractor_kwargs,
+                    callback=on_completed, error_callback=on_error))
+            for result in results:
+                result.wait()
+    else:
+        for warc_download_url, size in prefetcher:
+            try:
+                extraction_intervals.append(__extract_prefetched_warc(warc_download_url, **extractor_kwargs))
+            finally:
+                prefetcher.release(size)
+
+    __log_overlap(prefetcher.download_intervals, extraction_intervals, start_time)
+
+
+# the extractor of an extraction process if records are distributed
+__record_worker_extractor = None
+# the serialized articles that were extracted from the current record if articles are sent in batches
+__record_worker_articles = []
+
+
+def __init_record_worker(extractor_cls, extractor_kwargs):
+    """
+    Initializes an extraction process that processes distributed records
+    """
+    global __record_worker_extractor
+    __record_worker_extractor = extractor_cls()
+    __record_worker_extractor.configure(None, **extractor_kwargs)
+
+
+def __collect_record_article(article):
+    """
+    Callback on extracted articles of distributed records if the articles are sent in batches
+    """
+    __record_worker_articles.append(serialize_article(article))
+
+
+def __process_records_in_worker(serialized_records):
+    """
+    Processes a chunk of distributed records of one WARC file within an extraction process
+    :return: A tuple of a list with a tuple for each record, i.e., 'passed', 'discarded' or 'error', a dict of the
+    filter stages of the record and a list of the serialized articles that were extracted if they are sent in batches,
+    a dict of the seconds spent in each stage, the seconds spent on the chunk and the pid of the extraction process
+    """
+    __record_worker_extractor.stage_seconds.clear()
+    start = time.perf_counter()
+    results = []
+    for serialized_record in serialized_records:
+        __record_worker_extractor.filter_stage_counters.clear()
+        del __record_worker_articles[:]
+        outcome = __record_worker_extractor.process_record(deserialize_warc_record(serialized_record))
+        results.append((outcome, dict(__record_worker_extractor.filter_stage_counters),
+                        list(__record_worker_articles)))
+    return (results, dict(__record_worker_extractor.stage_seconds), time.perf_counter() - start, os.getpid())
+
+
+def __register_fully_extracted_warc(warc_download_url, counter_article_passed, counter_article_discarded,
+                                    counter_article_error, counter_article_total):
+    """
+    Records the WARC file warc_download_url as done in the ledger
+    """
+    __warc_ledger.complete(warc_download_url, counter_article_passed, counter_article_discarded,
+                           counter_article_error, counter_article_total)
+
+
+class _DistributedWarc:
+    """
+    Keeps track of the records of one WARC file that were distributed to the extraction processes
+    """
+
+    def __init__(self, warc_download_url, article_batcher=None, deduplicator=None):
+        """
+        :param warc_download_url:
+        :param article_batcher: if not None, the ArticleBatcher to which the articles of the WARC file are added
+        :param deduplicator: if not None, the RecordDeduplicator by which the records of the WARC file are checked
+        """
+        self.warc_download_url = warc_download_url
+        self.article_batcher = article_batcher
+        self.deduplicator = deduplicator
+        if article_batcher is not None:
+            article_batcher.start_warc(warc_download_url)
+        self.counters = {'passed': 0, 'discarded': 0, 'error': 0}
+        self.filter_stage_counters = Counter()
+        self.stage_seconds = Counter()
+        self.dispatched = 0
+        self.completed = 0
+        self.read_completely = False
+        self.lock = threading.Lock()
+
+    def complete_record(self, outcome, filter_stage_counters=None, articles=()):
+        """
+        :param articles: the serialized articles that were extracted from the record
+        :return: True if this was the last record of the WARC file
+        """
+        with self.lock:
+            self.counters[outcome] += 1
+            self.filter_stage_counters.update(filter_stage_counters or {})
+            self.completed += 1
+            # the batches are sent while holding the lock, so that the last batch is sent after all others
+            if self.article_batcher is not None:
+                self.article_batcher.extend(articles)
+            return self.__complete_if_done()
+
+    def complete_reading(self):
+        """
+        :return: True if all records of the WARC file have already been processed
+        """
+        with self.lock:
+            self.read_completely = True
+            return self.__complete_if_done()
+
+    def __complete_if_done(self):
+        done = self.read_completely and self.completed == self.dispatched
+        if done and self.article_batcher is not None:
+            self.article_batcher.flush(warc_completed=True)
+        return done
+
+
+def __crawl_distributing_records(warc_download_urls, number_of_extraction_processes, extractor_kwargs,
+                                 number_of_reader_threads, max_pending_records, records_per_task):
+    """
+    Reads the WARC files in reader threads of the current process and distributes their response records in chunks of
+    records_per_task records to a pool of extraction processes. The number of records that were read but not yet
+    processed is limited, so that the readers wait for the extraction processes.
+    """
+    if max_pending_records is None:
+        max_pending_records = 64 * number_of_extraction_processes
+    # the chunks are counted, so that the records that a reader collects for its next chunk never block another reader
+    max_pending_tasks = max(1, max_pending_records // records_per_task)
+    pending_tasks = threading.BoundedSemaphore(max_pending_tasks)
+    errors = []
+
+    local_download_dir_warc = extractor_kwargs['local_download_dir_warc']
+    reuse_previously_downloaded_files = extractor_kwargs['reuse_previously_downloaded_files']
+    delete_warc_after_extraction = extractor_kwargs['delete_warc_after_extraction']
+    continue_after_error = extractor_kwargs['continue_after_error']
+    worker_kwargs = {key: value for key, value in extractor_kwargs.items()
+                     if key not in ('callback_on_warc_completed', 'warc_ledger', 'extractor_cls', 'stream_warc',
+                                    'verify_gzip', 'duplicate_filter', 'deduplicate_urls')}
+    # duplicates are skipped by the readers, so that they are not sent to the extraction processes
+    duplicate_filter = extractor_kwargs['duplicate_filter']
+    deduplicate_urls = extractor_kwargs['deduplicate_urls']
+    in_flight_keys = set()
+    if __extern_callback_on_article_batch:
+        worker_kwargs['callback_on_article_extracted'] = __collect_record_article
+
+    def complete_warc(warc, local_filepath):
+        if local_filepath and delete_warc_after_extraction:
+            os.remove(local_filepath)
+        __register_fully_extracted_warc(warc.warc_download_url, warc.counters['passed'], warc.counters['discarded'],
+                                        warc.counters['error'], warc.dispatched)
+        if warc.deduplicator is not None:
+            warc.deduplicator.commit()
+        __callback_on_warc_completed(warc.warc_download_url, warc.counters['passed'], warc.counters['discarded'],
+                                     warc.counters['error'], warc.dispatched,
+                                     filter_stage_counters=dict(warc.filter_stage_counters),
+                                     stage_seconds=dict(warc.stage_seconds))
+
+    def read_warc(extraction_process_pool, warc_download_url):
+        if not __acquire_lease(warc_download_url):
+            return
+        article_batcher = None
+        if __extern_callback_on_article_batch:
+            article_batcher = ArticleBatcher(__deliver_article_batch, __article_batch_size)
+        deduplicator = RecordDeduplicator(duplicate_filter, deduplicate_urls, in_flight_keys) \
+            if duplicate_filter is not None else None
+        warc = _DistributedWarc(warc_download_url, article_batcher, deduplicator)
+        local_filepath = get_local_filepath(local_download_dir_warc, warc_download_url)
+        __warc_ledger.start(warc_download_url)
+        try:
+            if reuse_previously_downloaded_files and is_downloaded(local_filepath,
+                                                                  __warc_sizes.get(warc_download_url)):
+                __logger.info('found local file %s, not downloading again due to configuration', local_filepath)
+                stream = open(local_filepath, 'rb')
+            else:
+                tee_path = local_filepath if reuse_previously_downloaded_files and not delete_warc_after_extraction \
+                    else None
+                __logger.info('streaming %s (local: %s)', warc_download_url, tee_path)
+                stream = open_remote_stream(warc_download_url, tee_path=tee_path)
+                local_filepath = None
+        except Exception as e:
+            __warc_ledger.fail(warc_download_url, repr(e))
+            raise
+        __warc_ledger.start_extraction(warc_download_url)
+
+        def on_completed(result):
+            results, stage_seconds, busy_seconds, worker = result
+            __metrics.add_worker_time(worker, busy_seconds, stage_seconds)
+            pending_tasks.release()
+            for outcome, filter_stage_counters, articles in results:
+                if warc.complete_record(outcome, filter_stage_counters, articles):
+                    complete_warc(warc, local_filepath)
+
+        def on_error(error, number_of_records):
+            errors.append(error)
+            pending_tasks.release()
+            for _ in range(number_of_records):
+                if warc.complete_record('error'):
+                    complete_warc(warc, local_filepath)
+
+        def dispatch(serialized_records):
+            pending_tasks.acquire()
+            extraction_process_pool.apply_async(__process_records_in_worker, (serialized_records,),
+                                                callback=on_completed,
+                                                error_callback=partial(on_error,
+                                                                       number_of_records=len(serialized_records)))
+
+        def iterate_timed(records):
+            while True:
+                with measure(warc.stage_seconds, 'decompress'):
+                    record = next(records, None)
+                if record is None:
+                    return
+                yield record
+
+        try:
+            with stream:
+                serialized_records = []
+                for record in iterate_timed(iter(ArchiveIterator(stream))):
+                    if record.rec_type != 'response':
+                        continue
+                    if errors and not continue_after_error:
+                        __warc_ledger.fail(warc_download_url, 'aborted after an error: %r' % errors[0])
+                        if deduplicator is not None:
+                            deduplicator.abort()
+                        return
+                    if deduplicator is not None and deduplicator.is_duplicate(record):
+                        warc.dispatched += 1
+                        warc.complete_record('discarded', {'duplicate_discarded': 1})
+                        continue
+                    warc.dispatched += 1
+                    serialized_records.append(serialize_warc_record(record))
+                    if len(serialized_records) >= records_per_task:
+                        dispatch(serialized_records)
+                        serialized_records = []
+                if serialized_records:
+                    dispatch(serialized_records)
+        except Exception as e:
+            __logger.error('reading failed: %s %s', warc_download_url, e)
+            __warc_ledger.fail(warc_download_url, repr(e))
+            if deduplicator is not None:
+                deduplicator.abort()
+            errors.append(e)
+            return
+        except BaseException as e:
+            __warc_ledger.fail(warc_download_url, repr(e))
+            if deduplicator is not None:
+                deduplicator.abort()
+            raise
+        if warc.complete_reading():
+            complete_warc(warc, local_filepath)
+
+    with Pool(number_of_extraction_processes, initializer=__init_record_worker,
+              initargs=(extractor_kwargs['extractor_cls'], worker_kwargs)) as extraction_process_pool:
+        with ThreadPoolExecutor(number_of_reader_threads) as readers:
+            list(readers.map(partial(read_warc, extraction_process_pool), warc_download_urls))
+        # wait for the records that are still extracted
+        for _ in range(max_pending_tasks):
+            pending_tasks.acquire()
+
+    if errors and not continue_after_error:
+        raise errors[0]
 
 
 def crawl_from_commoncrawl(callback_on_article_extracted, callback_on_warc_completed=None, valid_hosts=None,
@@ -299,7 +911,17 @@ def crawl_from_commoncrawl(callback_on_article_extracted, callback_on_warc_compl
                            continue_after_error=True, show_download_progress=False,
                            number_of_extraction_processes=4, log_level=logging.ERROR,
                            delete_warc_after_extraction=True, continue_process=True,
-                           extractor_cls=CommonCrawlExtractor, fetch_images=False):
+                           extractor_cls=CommonCrawlExtractor, fetch_images=False, stream_warc=False,
+                           prefetch_warcs=False, prefetch_max_bytes=__default_prefetch_max_bytes,
+                           prefetch_max_files=__default_prefetch_max_files, distribute_records=False,
+                           number_of_reader_threads=2, max_pending_records=None, records_per_task=16,
+                           substring_host_match=False,
+                           cc_base_url=None, checkpoint_interval=0, callback_on_progress=None,
+                           callback_on_article_batch=None, article_batch_size=100, max_pending_article_batches=None,
+                           retry_failed_warcs_only=False, verify_gzip=False, shard_index=0, shard_count=1,
+                           lease_dir=None, lease_timeout=LEASE_TIMEOUT, duplicate_filter_dir=None,
+                           deduplicate_urls=False, duplicate_filter_capacity=DEFAULT_CAPACITY,
+                           duplicate_filter_error_rate=DEFAULT_ERROR_RATE):
     """
     Crawl and extract articles form the news crawl provided by commoncrawl.org. For each article that was extracted
     successfully the callback function callback_on_article_extracted is invoked where the first parameter is the
@@ -320,14 +942,108 @@ def crawl_from_commoncrawl(callback_on_article_extracted, callback_on_warc_compl
     :param show_download_progress:
     :param log_level:
     :param extractor_cls:
+    :param fetch_images:
+    :param stream_warc: if True, each WARC file is extracted while it is downloaded instead of downloading it
+    completely first. It is only saved locally if reuse_previously_downloaded_files is True and
+    delete_warc_after_extraction is False.
+    :param prefetch_warcs: if True, a dedicated thread downloads upcoming WARC files into local_download_dir_warc while
+    the extraction processes extract the already downloaded ones
+    :param prefetch_max_bytes: maximum size of the WARC files that are downloaded but not yet extracted. The budget may
+    be exceeded by the size of one WARC file, since the size of a WARC file is only known after its download.
+    :param prefetch_max_files: maximum number of WARC files that are downloaded but not yet extracted
+    :param distribute_records: if True, the records of the WARC files are read in the current process and distributed
+    to the extraction processes, instead of extracting each WARC file in one process. Hence, all extraction processes
+    are busy until the last record has been extracted, even if the WARC files differ in size. WARC files are streamed
+    unless a local file exists and reuse_previously_downloaded_files is True.
+    :param number_of_reader_threads: number of WARC files that are read in parallel if distribute_records is True
+    :param max_pending_records: maximum number of records that were read but are not yet extracted if
+    distribute_records is True, if None, 64 per extraction process
+    :param records_per_task: number of records that are sent to an extraction process at once if distribute_records
+    is True
+    :param substring_host_match: if True, an article passes the host filter if one of the valid_hosts is contained
+    anywhere in its URL (which may give false positives), else its host must equal one of the valid_hosts or be a
+    subdomain of one of them
+    :param cc_base_url: URL of the commoncrawl bucket from which the WARC files are listed and downloaded, e.g., a local
+    stand-in that implements the S3 ListObjectsV2 API, if None, commoncrawl.s3.amazonaws.com is used
+    :param checkpoint_interval: if not 0, the position within each WARC file is saved every checkpoint_interval
+    records, so that if the crawl is interrupted and continue_process is True, the extraction of a partially extracted
+    WARC file resumes from its last checkpoint instead of from its start. Not supported if distribute_records is True.
+    :param callback_on_progress: if not None, invoked with a dict of the statistics of the whole crawl after each
+    completed WARC file, see CrawlMetrics.snapshot. Like callback_on_warc_completed, it is invoked in the current
+    process, which aggregates the statistics of all extraction processes.
+    :param callback_on_article_batch: if not None, the extracted articles are sent in batches to the current process,
+    which invokes callback_on_article_batch(warc_download_url, articles, warc_completed) instead of invoking
+    callback_on_article_extracted in the extraction processes. The batches are delivered one at a time, so the callback
+    is the single writer of the crawl, and the batches of a WARC file are delivered in order, the last one with
+    warc_completed=True (possibly without articles). A checkpoint is only saved and a WARC file is only recorded as done
+    once all batches sent before have been delivered, so the articles of batches that were not delivered are
+    extracted again if an interrupted crawl is continued. If the callback only buffers the articles, it must have a
+    method save_checkpoint(warc_download_url, offset), which is invoked before a checkpoint is saved and must save the
+    articles of the WARC file delivered so far, and a method resume_warc(warc_download_url, offset), which is invoked
+    before the first batch of a WARC file with the offset of the checkpoint from which the extraction resumes, or 0,
+    see ParquetShardWriter. If the callback raises an exception, the extraction of the
+    WARC file fails. If the callback has a method get_completed_warc_urls, e.g., a ParquetShardWriter, the WARC files
+    that are done but not in the set it returns are extracted again if continue_process is True.
+    :param article_batch_size: maximum number of articles per batch
+    :param max_pending_article_batches: maximum number of batches that were extracted but not yet delivered, if None, 4
+    per extraction process. If callback_on_article_batch is slower than the extraction, the extraction processes wait.
+    :param retry_failed_warcs_only: if True, only the WARC files whose last extraction failed are extracted. The state
+    of each WARC file is recorded in warcs.sqlite in local_download_dir_warc, see WarcLedger.
+    :param verify_gzip: if True, all gzip members of each downloaded WARC file are decompressed once to verify the
+    file before it is extracted. Independent of this, downloads are resumed with range requests after interruptions and
+    validated against the size of the WARC file in the listing.
+    :param shard_index: if shard_count is greater than 1, only the WARC files of this shard are extracted. The WARC
+    files are assigned to the shards by a hash of their names, so that several nodes with the same shard_count and
+    different shard_index share the work without coordination.
+    :param shard_count: number of shards, e.g., nodes
+    :param lease_dir: if not None, a directory shared by all nodes, in which each node takes a lease on a WARC file
+    before extracting it. A node extracts the WARC files of its own shard first and then those of the other shards
+    that no node has started yet, so that idle nodes take over the work of slow ones.
+    :param lease_timeout: seconds after which the lease of a WARC file that was not completed expires, e.g., if its
+    node crashed, if None, leases never expire
+    :param duplicate_filter_dir: if not None, the directory of a BloomFilter of the payload digests of the records that
+    have been extracted, which is shared by all extraction processes and by later crawls that use the same directory.
+    Response records whose WARC-Payload-Digest is in the filter are skipped before they are decoded and are counted as
+    duplicate_discarded in the filter stages. Delete the directory to extract all records again. A ParquetShardWriter as
+    callback_on_article_batch must use shard_per_warc then, since the records of WARC files that are extracted again
+    because their articles were not all saved would be skipped as duplicates.
+    :param deduplicate_urls: if True, records whose normalized URL is in the filter are skipped, too, see normalize_url
+    :param duplicate_filter_capacity: number of records for which the false positive rate of the filter, i.e., the
+    share of records that are skipped although they are not duplicates, is at most duplicate_filter_error_rate. Only
+    used when the filter is created.
+    :param duplicate_filter_error_rate:
     :return:
     """
+    if duplicate_filter_dir and getattr(callback_on_article_batch, 'shard_per_warc', True) is False:
+        raise ValueError('deduplicating records requires a ParquetShardWriter with shard_per_warc')
     __setup(local_download_dir_warc, log_level)
 
+    if cc_base_url:
+        global __cc_base_url
+        __cc_base_url = cc_base_url if cc_base_url.endswith('/') else cc_base_url + '/'
+
     global __extern_callback_on_warc_completed
     __extern_callback_on_warc_completed = callback_on_warc_completed
+    global __extern_callback_on_progress
+    __extern_callback_on_progress = callback_on_progress
+    global __extern_callback_on_article_batch, __article_batch_size, __max_pending_article_batches
+    __extern_callback_on_article_batch = callback_on_article_batch
+    __article_batch_size = article_batch_size
+    __max_pending_article_batches = max_pending_article_batches
+    if callback_on_article_batch and not distribute_records:
+        # extraction in the current process, the extraction processes replace it in __init_extraction_process
+        global __article_batcher
+        __article_batcher = ArticleBatcher(__deliver_article_batch, article_batch_size)
 
     cc_news_crawl_names = __get_remote_index(warc_files_start_date, warc_files_end_date)
+    if shard_count > 1 or lease_dir:
+        cc_news_crawl_names = assign_shards(cc_news_crawl_names, shard_index, shard_count, steal=bool(lease_dir))
+        __logger.info('shard %i of %i', shard_index, shard_count)
+    global __lease_directory
+    __lease_directory = None
+    if lease_dir:
+        __lease_directory = LeaseDirectory(lease_dir, node_id='%s-%i' % (socket.gethostname(), shard_index),
+                                           lease_timeout=lease_timeout)
     global __number_of_warc_files_on_cc
     __number_of_warc_files_on_cc = len(cc_news_crawl_names)
     __logger.info('found %i files at commoncrawl.org', __number_of_warc_files_on_cc)
@@ -335,57 +1051,82 @@ def crawl_from_commoncrawl(callback_on_article_extracted, callback_on_warc_compl
     # multiprocessing (iterate the list of crawl_names, and for each: download and process it)
     __logger.info('creating extraction process pool with %i processes', number_of_extraction_processes)
     warc_download_urls = []
-    fully_extracted_warc_urls = __get_list_of_fully_extracted_warc_urls()
+    get_completed_warc_urls = getattr(callback_on_article_batch, 'get_completed_warc_urls', None)
+    if continue_process and get_completed_warc_urls is not None:
+        __requeue_unsaved_warcs(get_completed_warc_urls())
+    fully_extracted_warc_urls = __warc_ledger.get_urls(DONE)
+    failed_warc_urls = __warc_ledger.get_urls(FAILED) if retry_failed_warcs_only else None
+    global __counter_warc_skipped
     for name in cc_news_crawl_names:
         warc_download_url = __get_download_url(name)
-        if continue_process:
+        if failed_warc_urls is not None and warc_download_url not in failed_warc_urls:
+            __counter_warc_skipped += 1
+        elif continue_process:
             # check if the current WARC has already been fully extracted (assuming that the filter criteria have not
             # been changed!)
             if warc_download_url in fully_extracted_warc_urls:
                 __logger.info('skipping WARC because fully extracted: %s' % warc_download_url)
-                global __counter_warc_skipped
                 __counter_warc_skipped += 1
                 pass
             else:
                 warc_download_urls.append(warc_download_url)
 
         else:
-            # if not continue process, then always add
+            # if not continue process, then always add and start from the beginning of the file
+            try:
+                os.remove(get_checkpoint_path(local_download_dir_warc, warc_download_url))
+            except OSError:
+                pass
             warc_download_urls.append(warc_download_url)
 
+    __warc_ledger.queue(warc_download_urls)
+    __warc_ledger.log_status(__logger)
+
+    global __metrics
+    __metrics = CrawlMetrics(__number_of_warc_files_on_cc, __counter_warc_skipped)
+
+    if valid_hosts and not substring_host_match:
+        # build the index of the valid hosts before the extraction processes are forked, so that they inherit it
+        get_host_index(valid_hosts)
+
+    duplicate_filter = None
+    if duplicate_filter_dir:
+        duplicate_filter = BloomFilter(duplicate_filter_dir, capacity=duplicate_filter_capacity,
+                                       error_rate=duplicate_filter_error_rate)
+
+    extractor_kwargs = dict(callback_on_article_extracted=callback_on_article_extracted,
+                            callback_on_warc_completed=__callback_on_warc_completed,
+                            valid_hosts=valid_hosts,
+                            start_date=start_date, end_date=end_date,
+                            strict_date=strict_date,
+                            reuse_previously_downloaded_files=reuse_previously_downloaded_files,
+                            local_download_dir_warc=local_download_dir_warc,
+                            continue_after_error=continue_after_error,
+                            show_download_progress=show_download_progress,
+                            log_level=log_level,
+                            delete_warc_after_extraction=delete_warc_after_extraction,
+                            warc_ledger=__warc_ledger,
+                            extractor_cls=extractor_cls,
+                            fetch_images=fetch_images,
+                            stream_warc=stream_warc,
+                            substring_host_match=substring_host_match,
+                            checkpoint_interval=checkpoint_interval,
+                            verify_gzip=verify_gzip,
+                            duplicate_filter=duplicate_filter,
+                            deduplicate_urls=deduplicate_urls)
+
+    if distribute_records:
+        __crawl_distributing_records(warc_download_urls, number_of_extraction_processes, extractor_kwargs,
+                                     number_of_reader_threads, max_pending_records, records_per_task)
+    elif prefetch_warcs:
+        __crawl_with_prefetching(warc_download_urls, number_of_extraction_processes, extractor_kwargs,
+                                 prefetch_max_bytes, prefetch_max_files)
     # run the crawler in the current, single process if number of extraction processes is set to 1
-    if number_of_extraction_processes > 1:
-        with Pool(number_of_extraction_processes) as extraction_process_pool:
-            extraction_process_pool.map(partial(__start_commoncrawl_extractor,
-                                                callback_on_article_extracted=callback_on_article_extracted,
-                                                callback_on_warc_completed=__callback_on_warc_completed,
-                                                valid_hosts=valid_hosts,
-                                                start_date=start_date, end_date=end_date,
-                                                strict_date=strict_date,
-                                                reuse_previously_downloaded_files=reuse_previously_downloaded_files,
-                                                local_download_dir_warc=local_download_dir_warc,
-                                                continue_after_error=continue_after_error,
-                                                show_download_progress=show_download_progress,
-                                                log_level=log_level,
-                                                delete_warc_after_extraction=delete_warc_after_extraction,
-                                                log_pathname_fully_extracted_warcs=__log_pathname_fully_extracted_warcs,
-                                                extractor_cls=extractor_cls,
-                                                fetch_images=fetch_images),
-                                        warc_download_urls)
+    elif number_of_extraction_processes > 1:
+        with __extraction_process_pool(number_of_extraction_processes) as extraction_process_pool:
+            extraction_process_pool.map(partial(__start_commoncrawl_extractor, **extractor_kwargs), warc_download_urls)
     else:
         for warc_download_url in warc_download_urls:
-            __start_commoncrawl_extractor(warc_download_url,
-                                          callback_on_article_extracted=callback_on_article_extracted,
-                                          callback_on_warc_completed=__callback_on_warc_completed,
-                                          valid_hosts=valid_hosts,
-                                          start_date=start_date, end_date=end_date,
-                                          strict_date=strict_date,
-                                          reuse_previously_downloaded_files=reuse_previously_downloaded_files,
-                                          local_download_dir_warc=local_download_dir_warc,
-                                          continue_after_error=continue_after_error,
-                                          show_download_progress=show_download_progress,
-                                          log_level=log_level,
-                                          delete_warc_after_extraction=delete_warc_after_extraction,
-                                          log_pathname_fully_extracted_warcs=__log_pathname_fully_extracted_warcs,
-                                          extractor_cls=extractor_cls,
-                                          fetch_images=fetch_images)
+            __start_commoncrawl_extractor(warc_download_url, **extractor_kwargs)
+
+    __warc_ledger.log_status(__logger)
@@ -4,11 +4,14 @@ Provides functionality to crawl and extract news articles from a single WARC fil
 and host list, can be defined. Currently, the WARC file will be downloaded to the path WORKINGDIR/cc_download_warc, if
 not otherwise specified.
 """
+import datetime
+import inspect
 import logging
 import os
-import subprocess
+import re
 import sys
 import time
+from collections import Counter
 
 from ago import human
 from dateutil import parser
@@ -17,12 +20,52 @@ from scrapy.utils.log import configure_logging
 from six.moves import urllib
 from warcio.archiveiterator import ArchiveIterator
 
-from .. import NewsPlease, EmptyResponseError
+from .. import NewsPlease, EmptyResponseError, _decode_warc_record
+from ..helper_classes.host_index import get_host_index
+from ..helper_classes.checkpoint import read_json, write_json_atomically
+from .article_batch import ArticleBatcher
+from .crawl_metrics import measure
+from .warc_dedup import RecordDeduplicator
+from .warc_download import download_file, get_checkpoint_path, get_local_filepath, is_downloaded
+from .warc_stream import STREAM_TIMEOUT, open_remote_stream
 
 __author__ = "Felix Hamborg"
 __copyright__ = "Copyright 2017"
 __credits__ = ["Sebastian Nagel"]
 
+# a full date, i.e., year, month and day, in the path of a URL, e.g., /2021/05/18/ or /2021-05-18-
+re_url_path_date = re.compile(r'[/_-]((?:19|20)\d{2})[/_-](0?[1-9]|1[0-2])[/_-](0?[1-9]|[12]\d|3[01])(?=[/_.-]|$)')
+
+# extractors and fields of the metadata pass, which only determines the publishing date of an article
+METADATA_EXTRACTORS = ['date_extractor']
+METADATA_FIELDS = ['date_publish']
+
+
+def _accepts_keyword_argument(function, name):
+    """
+    Returns True if function can be called with the keyword argument name
+    """
+    try:
+        parameters = inspect.signature(function).parameters
+    except (TypeError, ValueError):
+        return False
+    return name in parameters or any(parameter.kind == inspect.Parameter.VAR_KEYWORD
+                                     for parameter in parameters.values())
+
+
+def _get_url_path_date(url):
+    """
+    Returns the date contained in the path of url, if the path contains a full date, else None
+    """
+    path = urllib.parse.urlparse(url).path
+    match = re_url_path_date.search(path)
+    if not match:
+        return None
+    try:
+        return datetime.datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+
 
 class CommonCrawlExtractor:
     # remote url where we can download the warc file
@@ -31,14 +74,21 @@ class CommonCrawlExtractor:
     __local_download_dir_warc = './cc_download_warc/'
     # hosts (if None or empty list, any host is OK)
     __filter_valid_hosts = []  # example: ['elrancaguino.cl']
+    # if True, a record passes the host filter if one of the valid hosts is contained anywhere in its URL, which is
+    # how hosts were matched before, else its host must equal one of the valid hosts or be a subdomain of one of them
+    __substring_host_match = False
     # start date (if None, any date is OK as start date), as datetime
     __filter_start_date = None
     # end date (if None, any date is OK as end date)
     __filter_end_date = None
     # if date filtering is string, e.g., if we could not detect the date of an article, we will discard the article
     __filter_strict_date = True
+    # the date in the path of a URL may differ from the publishing date, e.g., due to time zones, so records are only
+    # discarded by their URL if the date in the URL is outside the date range by more than this tolerance
+    __url_date_tolerance = datetime.timedelta(days=2)
     # if True, the script checks whether a file has been downloaded already and uses that file instead of downloading
-    # again. Note that there is no check whether the file has been downloaded completely or is valid!
+    # again. Files are downloaded to a partial file first, so only complete downloads are found, and if the size of the
+    # file is known from the listing, files of another size are not reused.
     __reuse_previously_downloaded_files = True
     # continue after error
     __continue_after_error = False
@@ -50,6 +100,18 @@ class CommonCrawlExtractor:
     __log_level = logging.INFO
     __delete_warc_after_extraction = True
     __log_pathname_fully_extracted_warcs = None
+    # if not None, the WarcLedger in which the state of the WARC file is recorded
+    __warc_ledger = None
+    # if not None, the size of the WARC file according to the listing, against which downloads are validated
+    __expected_size = None
+    # if True, the gzip members of downloaded WARC files are verified, see verify_gzip_members
+    __verify_gzip = False
+    # if not None, records whose payload digest is in this filter, e.g., a BloomFilter, are skipped, see warc_dedup
+    __duplicate_filter = None
+    # if True, records whose normalized URL is in the duplicate filter are skipped, too
+    __deduplicate_urls = False
+    # the RecordDeduplicator of the current WARC file
+    __deduplicator = None
 
     # commoncrawl.org
     __cc_base_url = 'https://commoncrawl.s3.amazonaws.com/'
@@ -61,6 +123,18 @@ class CommonCrawlExtractor:
     __callback_on_warc_completed = None
     # if the download progress is shown
     __show_download_progress = False
+    # if True, the WARC file is extracted while it is downloaded instead of downloading it completely first
+    __stream_warc = False
+    # timeout in seconds of the requests to commoncrawl.org when streaming WARC files
+    __stream_timeout = STREAM_TIMEOUT
+    # number of response records after which the offset of the next record is saved, so that an interrupted extraction
+    # resumes from there instead of from the start of the WARC file, if 0, no checkpoints are saved
+    __checkpoint_interval = 0
+
+    # number of records that were discarded or passed at each stage of filter_record, reset for each WARC file
+    filter_stage_counters = None
+    # seconds spent in each stage of the extraction (see crawl_metrics.STAGES), reset for each WARC file
+    stage_seconds = None
 
     # logging
     logging.basicConfig(level=__log_level)
@@ -71,8 +145,6 @@ class CommonCrawlExtractor:
         Setup
         :return:
         """
-        os.makedirs(self.__local_download_dir_warc, exist_ok=True)
-
         # make loggers quite
         configure_logging({"LOG_LEVEL": "ERROR"})
         logging.getLogger('requests').setLevel(logging.CRITICAL)
@@ -87,54 +159,104 @@ class CommonCrawlExtractor:
         self.__logger = logging.getLogger(__name__)
         self.__logger.setLevel(self.__log_level)
 
-    def __register_fully_extracted_warc_file(self, warc_url):
+        self.filter_stage_counters = Counter()
+        self.stage_seconds = Counter()
+        self.__host_index = get_host_index(self.__filter_valid_hosts) if self.__filter_valid_hosts else None
+
+    def __register_fully_extracted_warc_file(self, warc_url, counter_article_passed, counter_article_discarded,
+                                             counter_article_error, counter_article_total):
         """
-        Saves the URL warc_url in the log file for fully extracted WARC URLs
+        Records the WARC file as done in the ledger and saves the URL warc_url in the log file for fully extracted WARC
+        URLs
         :param warc_url:
         :return:
         """
+        if self.__warc_ledger is not None:
+            self.__warc_ledger.complete(warc_url, counter_article_passed, counter_article_discarded,
+                                        counter_article_error, counter_article_total)
         if self.__log_pathname_fully_extracted_warcs is not None:
             with open(self.__log_pathname_fully_extracted_warcs, 'a') as log_file:
                 log_file.write(warc_url + '\n')
 
     def filter_record(self, warc_record, article=None):
         """
-        Returns true if a record passes all tests: hosts, publishing date
+        Returns true if a record passes all tests: hosts, publishing date. The tests are staged by their cost, so that
+        most records are discarded before the full extraction:
+        1. the host of the WARC-Target-URI must be one of the valid hosts or one of their subdomains, see HostIndex
+        2. if the path of the URL contains a date, it must be within the date range (with some tolerance)
+        3. the publishing date found by a metadata-only pass (ld+json, meta tags, <time>) must be within the date range
+        4. the publishing date of the fully extracted article must be within the date range
+        The number of records discarded at each stage is counted in filter_stage_counters.
         :param warc_record:
+        :param article: if not None, the already extracted article, so that only the host and its date are checked
         :return: A tuple of (True or False) and an article (might be None)
         """
         # filter by host
         if self.__filter_valid_hosts:
             url = warc_record.rec_headers.get_header('WARC-Target-URI')
-
-            # very simple check, check if one of the required host names is contained in the url of the WARC transaction
-            # better would be to extract the host name from the WARC transaction Target URI and then check for equality
-            # because currently something like g.co?forward_url=facebook.com would yield a positive filter test for
-            # facebook.com even though the actual host is g.co
-            for valid_host in self.__filter_valid_hosts:
-                if valid_host in url:
-                    break
-            else:
+            if not self.__is_valid_host(url):
+                self.filter_stage_counters['host_discarded'] += 1
                 return False, article
 
         # filter by date
         if self.__filter_start_date or self.__filter_end_date:
             if not article:
-                article = self._from_warc(warc_record)
+                url = warc_record.rec_headers.get_header('WARC-Target-URI')
+                url_date = _get_url_path_date(url)
+                if url_date and not self.__is_in_date_range(url_date, self.__url_date_tolerance):
+                    self.filter_stage_counters['url_date_discarded'] += 1
+                    return False, article
+
+                # decode the payload only once for both the metadata pass and the full extraction
+                html, url, download_date = _decode_warc_record(warc_record, decode_errors=self.__get_decode_errors())
+                metadata = NewsPlease.session(extractors=METADATA_EXTRACTORS, fields=METADATA_FIELDS).from_html(
+                    html, url=url, download_date=download_date)
+                publishing_date = self.__get_publishing_date(warc_record, metadata)
+                if publishing_date and not self.__is_in_date_range(publishing_date):
+                    self.filter_stage_counters['metadata_date_discarded'] += 1
+                    return False, metadata
+
+                self.filter_stage_counters['full_extraction'] += 1
+                with measure(self.stage_seconds, 'extract'):
+                    article = self._from_html(html, url=url, download_date=download_date)
 
             publishing_date = self.__get_publishing_date(warc_record, article)
             if not publishing_date:
                 if self.__filter_strict_date:
+                    self.filter_stage_counters['date_discarded'] += 1
                     return False, article
-            else:  # here we for sure have a date
-                # is article published too early?
-                if self.__filter_start_date and publishing_date < self.__filter_start_date:
-                    return False, article
-                if self.__filter_end_date and publishing_date > self.__filter_end_date:
-                    return False, article
+            elif not self.__is_in_date_range(publishing_date):
+                self.filter_stage_counters['date_discarded'] += 1
+                return False, article
 
         return True, article
 
+    def __is_valid_host(self, url):
+        """
+        Returns True if the host of url is one of the valid hosts or a subdomain of one of them, or, if
+        substring_host_match is True, if one of the valid hosts is contained in url
+        :param url:
+        :return:
+        """
+        if self.__substring_host_match:
+            # this gives false positives, e.g., g.co?forward_url=facebook.com passes for facebook.com
+            return any(valid_host in url for valid_host in self.__filter_valid_hosts)
+        return self.__host_index.match_url(url) is not None
+
+    def __is_in_date_range(self, date, tolerance=datetime.timedelta(0)):
+        """
+        Returns True if date is within [start_date - tolerance, end_date + tolerance]
+        :param date:
+        :param tolerance:
+        :return:
+        """
+        # is article published too early?
+        if self.__filter_start_date and date < self.__filter_start_date - tolerance:
+            return False
+        if self.__filter_end_date and date > self.__filter_end_date + tolerance:
+            return False
+        return True
+
     def __get_publishing_date(self, warc_record, article):
         """
         Extracts the publishing date from the record
@@ -154,38 +276,6 @@ class CommonCrawlExtractor:
         """
         return self.__cc_base_url + name
 
-    def __get_remote_index(self):
-        """
-        Gets the index of news crawl files from commoncrawl.org and returns an array of names
-        :return:
-        """
-        temp_filename = "tmpaws.txt"
-
-        if os.name == 'nt':
-            awk_parameter = '"{ print $4 }"'
-        else:
-            awk_parameter = "'{ print $4 }'"
-
-        # get the remote info
-        cmd = "aws s3 ls --recursive s3://commoncrawl/crawl-data/CC-NEWS/ --no-sign-request > %s && " \
-              "awk %s %s " % (temp_filename, awk_parameter, temp_filename)
-
-        self.__logger.info('executing: %s', cmd)
-        exitcode, stdout_data = subprocess.getstatusoutput(cmd)
-
-        if exitcode > 0:
-            raise Exception(stdout_data)
-
-        print(stdout_data)
-
-        try:
-            os.remove(temp_filename)
-        except OSError:
-            pass
-
-        lines = stdout_data.splitlines()
-        return lines
-
     def __on_download_progress_update(self, blocknum, blocksize, totalsize):
         """
         Prints some download progress information
@@ -206,16 +296,23 @@ class CommonCrawlExtractor:
         else:  # total size is unknown
             sys.stdout.write("\rread %s" % (size(readsofar)))
 
+    def __get_local_filepath(self, url):
+        """
+        Returns the path to which the file at url is downloaded
+        :param url:
+        :return:
+        """
+        return get_local_filepath(self.__local_download_dir_warc, url)
+
     def __download(self, url):
         """
         Download and save a file locally.
         :param url: Where to download from
         :return: File path name of the downloaded file
         """
-        local_filename = urllib.parse.quote_plus(url)
-        local_filepath = os.path.join(self.__local_download_dir_warc, local_filename)
+        local_filepath = self.__get_local_filepath(url)
 
-        if os.path.isfile(local_filepath) and self.__reuse_previously_downloaded_files:
+        if self.__reuse_previously_downloaded_files and is_downloaded(local_filepath, self.__expected_size):
             self.__logger.info("found local file %s, not downloading again due to configuration", local_filepath)
             return local_filepath
         else:
@@ -227,86 +324,272 @@ class CommonCrawlExtractor:
 
             # download
             self.__logger.info('downloading %s (local: %s)', url, local_filepath)
-            urllib.request.urlretrieve(url, local_filepath, reporthook=self.__on_download_progress_update)
+            with measure(self.stage_seconds, 'download'):
+                download_file(url, local_filepath, reporthook=self.__on_download_progress_update,
+                              expected_size=self.__expected_size, verify_gzip=self.__verify_gzip)
             self.__logger.info('download completed, local file: %s', local_filepath)
             return local_filepath
 
+    def __get_decode_errors(self):
+        return "replace" if self.__ignore_unicode_errors else "strict"
+
     def _from_warc(self, record):
-        return NewsPlease.from_warc(record, decode_errors="replace" if self.__ignore_unicode_errors else "strict", fetch_images=self.__fetch_images)
+        return NewsPlease.from_warc(record, decode_errors=self.__get_decode_errors(), fetch_images=self.__fetch_images)
+
+    def _from_html(self, html, url=None, download_date=None):
+        return NewsPlease.from_html(html, url=url, download_date=download_date, fetch_images=self.__fetch_images)
 
     def __process_warc_gz_file(self, path_name):
         """
-        Iterates all transactions in one WARC file and for each transaction tries to extract an article object.
-        Afterwards, each article is checked against the filter criteria and if all are passed, the function
-        on_valid_article_extracted is invoked with the article object.
+        Iterates all transactions in one local WARC file, see __process_warc_gz_stream, and deletes the file afterwards
+        if configured. If there is a checkpoint of a previous, interrupted extraction, the extraction resumes from there.
         :param path_name:
         :return:
         """
+        checkpoint = self.__load_checkpoint()
+        if self.__warc_ledger is not None:
+            self.__warc_ledger.start_extraction(self.__warc_download_url)
+        with open(path_name, 'rb') as stream:
+            if checkpoint:
+                self.__logger.info('resuming %s at offset %i', path_name, checkpoint['offset'])
+                stream.seek(checkpoint['offset'])
+            counters = self.__process_warc_gz_stream(stream, checkpoint)
+
+        # cleanup
+        if self.__delete_warc_after_extraction:
+            os.remove(path_name)
+
+        self.__complete_warc(*counters)
+
+    def __stream_warc_gz_file(self, url):
+        """
+        Iterates all transactions in one remote WARC file while it is downloaded, see __process_warc_gz_stream. The
+        response is read ahead into a bounded buffer, so that downloading and extracting overlap. If downloaded files
+        are reused and not deleted, the WARC file is also saved locally. If there is a checkpoint of a previous,
+        interrupted extraction, only the rest of the file is requested with a range request and not saved locally.
+        :param url:
+        :return:
+        """
+        checkpoint = self.__load_checkpoint()
+        offset = checkpoint['offset'] if checkpoint else 0
+        tee_path = None
+        if self.__reuse_previously_downloaded_files and not self.__delete_warc_after_extraction and not offset:
+            tee_path = self.__get_local_filepath(url)
+
+        self.__logger.info('streaming %s (local: %s, offset: %i)', url, tee_path, offset)
+        with open_remote_stream(url, tee_path=tee_path, timeout=self.__stream_timeout, offset=offset) as stream:
+            if self.__warc_ledger is not None:
+                self.__warc_ledger.start_extraction(url)
+            counters = self.__process_warc_gz_stream(stream, checkpoint)
+        self.__logger.info('streaming completed: %s', url)
+
+        self.__complete_warc(*counters)
+
+    def __get_checkpoint_path(self):
+        return get_checkpoint_path(self.__local_download_dir_warc, self.__warc_download_url)
+
+    def __load_checkpoint(self):
+        """
+        Loads the checkpoint of a previous, interrupted extraction of the current WARC file
+        :return: A dict with the offset of the next record and the counters at that record, or None
+        """
+        if not self.__checkpoint_interval:
+            return None
+        checkpoint = read_json(self.__get_checkpoint_path())
+        if not checkpoint or checkpoint.get('warc_url') != self.__warc_download_url:
+            return None
+        return checkpoint
+
+    def __save_checkpoint(self, offset, counter_article_passed, counter_article_discarded, counter_article_error,
+                          counter_article_total):
+        """
+        Saves the offset of the next record, i.e., the record from which the extraction resumes, and the counters of
+        all records before it. If the callback on extracted articles collects them, e.g., an ArticleBatcher, it is
+        flushed first, which returns once the articles have been delivered and, in case of an ArticleBatcher, saved by
+        the consumer of the batches, so that the articles before the checkpoint are not lost if the extraction is
+        interrupted.
+        :return:
+        """
+        if isinstance(self.__callback_on_article_extracted, ArticleBatcher):
+            self.__callback_on_article_extracted.flush(checkpoint_offset=offset)
+        else:
+            flush = getattr(self.__callback_on_article_extracted, 'flush', None)
+            if flush is not None:
+                flush()
+        write_json_atomically(self.__get_checkpoint_path(), {
+            'warc_url': self.__warc_download_url,
+            'offset': offset,
+            'counters': [counter_article_passed, counter_article_discarded, counter_article_error,
+                         counter_article_total],
+            'filter_stage_counters': dict(self.filter_stage_counters),
+        })
+        # the records before the checkpoint are not extracted again, so they are duplicates from now on
+        if self.__deduplicator is not None:
+            self.__deduplicator.commit()
+
+    def __remove_checkpoint(self):
+        try:
+            os.remove(self.__get_checkpoint_path())
+        except OSError:
+            pass
+
+    def __process_warc_gz_stream(self, stream, checkpoint=None):
+        """
+        Iterates all transactions in one WARC file and processes each response record, see process_record. If
+        checkpoints are enabled, the offset of the record after every checkpoint_interval-th response record is saved
+        once that record has been processed. Hence, if the extraction is interrupted, it resumes with the first record
+        whose article has not been passed to callback_on_article_extracted yet. The offset is only determined after
+        processing, since the archive iterator reads the current record to its end to determine it.
+        :param stream: A readable stream of the gzipped WARC file
+        :param checkpoint: if not None, the checkpoint from which the extraction resumes, stream must then start at
+        the offset of the checkpoint
+        :return: A tuple of the counters of passed, discarded, erroneous and all articles
+        """
         counter_article_total = 0
         counter_article_passed = 0
         counter_article_discarded = 0
         counter_article_error = 0
         start_time = time.time()
-
-        with open(path_name, 'rb') as stream:
-            for record in ArchiveIterator(stream):
+        if checkpoint:
+            counter_article_passed, counter_article_discarded, counter_article_error, counter_article_total = \
+                checkpoint['counters']
+            self.filter_stage_counters.update(checkpoint['filter_stage_counters'])
+        counter_article_resumed = counter_article_total
+        if isinstance(self.__callback_on_article_extracted, ArticleBatcher):
+            # the consumer of the batches restores what it has saved at the checkpoint, or discards it if there is none
+            self.__callback_on_article_extracted.start_warc(
+                self.__warc_download_url,
+                resume_offset=(checkpoint['offset'] if checkpoint else 0) if self.__checkpoint_interval else None)
+
+        archive_iterator = ArchiveIterator(stream)
+        self.__deduplicator = RecordDeduplicator(self.__duplicate_filter, self.__deduplicate_urls) \
+            if self.__duplicate_filter is not None else None
+        for record in self.__iterate_timed(archive_iterator):
+            if record.rec_type == 'response':
+                counter_article_total += 1
+
+                if self.__deduplicator is not None and self.__deduplicator.is_duplicate(record):
+                    # the record is skipped before its payload is decoded
+                    self.filter_stage_counters['duplicate_discarded'] += 1
+                    self.__logger.info('article discard (duplicate %s)',
+                                       record.rec_headers.get_header('WARC-Target-URI'))
+                    outcome = 'discarded'
+                else:
+                    outcome = self.process_record(record)
+                if outcome == 'passed':
+                    counter_article_passed += 1
+                elif outcome == 'discarded':
+                    counter_article_discarded += 1
+                else:
+                    counter_article_error += 1
+
+                if self.__checkpoint_interval and counter_article_total % self.__checkpoint_interval == 0:
+                    self.__save_checkpoint(archive_iterator.get_record_offset() + archive_iterator.get_record_length(),
+                                           counter_article_passed, counter_article_discarded, counter_article_error,
+                                           counter_article_total)
+
+                if counter_article_total % 10 == 0:
+                    elapsed_secs = time.time() - start_time
+                    secs_per_article = elapsed_secs / (counter_article_total - counter_article_resumed)
+                    self.__logger.info('statistics')
+                    self.__logger.info('pass = %i, discard = %i, error = %i, total = %i',
+                                       counter_article_passed,
+                                       counter_article_discarded, counter_article_error, counter_article_total)
+                    self.__logger.info('extraction from current WARC file started %s; %f s/article',
+                                       human(start_time), secs_per_article)
+                    if self.filter_stage_counters:
+                        self.__logger.info('filter stages: %s', dict(self.filter_stage_counters))
+
+        return counter_article_passed, counter_article_discarded, counter_article_error, counter_article_total
+
+    def __iterate_timed(self, iterator):
+        """
+        Yields the items of iterator, while the time spent to get them, i.e., to read and decompress the WARC file, is
+        added to the decompress stage
+        """
+        iterator = iter(iterator)
+        while True:
+            with measure(self.stage_seconds, 'decompress'):
+                item = next(iterator, None)
+            if item is None:
+                return
+            yield item
+
+    def process_record(self, record):
+        """
+        Tries to extract an article object from a single response record. Afterwards, the article is checked against
+        the filter criteria and if all are passed, the function on_valid_article_extracted is invoked with the article
+        object.
+        :param record: A WARC record of the type 'response'
+        :return: 'passed', 'discarded' or 'error' (only if continue_after_error is True, else errors are raised)
+        """
+        try:
+            article = None
+            # if the article passes filter tests, we notify the user
+            # the time of the full extraction within filter_record is not added to the filter stage
+            extract_seconds = self.stage_seconds['extract']
+            try:
+                with measure(self.stage_seconds, 'filter'):
+                    filter_pass, article = self.filter_record(record)
+            except (UnicodeDecodeError, EmptyResponseError):
+                filter_pass = False
+            finally:
+                self.stage_seconds['filter'] -= self.stage_seconds['extract'] - extract_seconds
+            if filter_pass:
                 try:
-                    if record.rec_type == 'response':
-                        counter_article_total += 1
-
-                        # if the article passes filter tests, we notify the user
-                        try:
-                            filter_pass, article = self.filter_record(record)
-                        except (UnicodeDecodeError, EmptyResponseError):
-                            filter_pass = False
-                        if filter_pass:
-                            try:
-                                if not article:
-                                    article = self._from_warc(record)
-                            except (UnicodeDecodeError, EmptyResponseError):
-                                filter_pass = False
-                        if filter_pass:
-                            counter_article_passed += 1
-
-                            self.__logger.info('article pass (%s; %s; %s)', article.source_domain, article.date_publish,
-                                               article.title)
-                            self.__callback_on_article_extracted(article)
-                        else:
-                            counter_article_discarded += 1
-
-                            if article:
-                                self.__logger.info('article discard (%s; %s; %s)', article.source_domain,
-                                                   article.date_publish,
-                                                   article.title)
-                            else:
-                                self.__logger.info('article discard (%s)',
-                                                   record.rec_headers.get_header('WARC-Target-URI'))
-
-                        if counter_article_total % 10 == 0:
-                            elapsed_secs = time.time() - start_time
-                            secs_per_article = elapsed_secs / counter_article_total
-                            self.__logger.info('statistics')
-                            self.__logger.info('pass = %i, discard = %i, error = %i, total = %i',
-                                               counter_article_passed,
-                                               counter_article_discarded, counter_article_error, counter_article_total)
-                            self.__logger.info('extraction from current WARC file started %s; %f s/article',
-                                               human(start_time), secs_per_article)
-                except:
-                    if self.__continue_after_error:
-                        self.__logger.error('Unexpected error: %s (%s)', *sys.exc_info()[0:2])
-                        self.__logger.error(sys.exc_info()[2], exc_info=True)
-                        counter_article_error += 1
-                        pass
-                    else:
-                        raise
-
-        # cleanup
-        if self.__delete_warc_after_extraction:
-            os.remove(path_name)
+                    if not article:
+                        with measure(self.stage_seconds, 'extract'):
+                            article = self._from_warc(record)
+                except (UnicodeDecodeError, EmptyResponseError):
+                    filter_pass = False
+            if filter_pass:
+                self.__logger.info('article pass (%s; %s; %s)', article.source_domain, article.date_publish,
+                                   article.title)
+                with measure(self.stage_seconds, 'callback'):
+                    self.__callback_on_article_extracted(article)
+                return 'passed'
+            else:
+                if article:
+                    self.__logger.info('article discard (%s; %s; %s)', article.source_domain,
+                                       article.date_publish,
+                                       article.title)
+                else:
+                    self.__logger.info('article discard (%s)',
+                                       record.rec_headers.get_header('WARC-Target-URI'))
+                return 'discarded'
+        except:
+            if self.__continue_after_error:
+                self.__logger.error('Unexpected error: %s (%s)', *sys.exc_info()[0:2])
+                self.__logger.error(sys.exc_info()[2], exc_info=True)
+                return 'error'
+            else:
+                raise
 
-        self.__register_fully_extracted_warc_file(self.__warc_download_url)
+    def __complete_warc(self, counter_article_passed, counter_article_discarded, counter_article_error,
+                        counter_article_total):
+        """
+        Registers the WARC file as fully extracted and notifies the callback. If the articles are sent in batches, the
+        last batch is delivered first, so that the WARC file is only recorded as done and its checkpoint only removed
+        once all of its articles have been delivered.
+        :return:
+        """
+        if isinstance(self.__callback_on_article_extracted, ArticleBatcher):
+            self.__callback_on_article_extracted.flush(warc_completed=True)
+        self.__register_fully_extracted_warc_file(self.__warc_download_url, counter_article_passed,
+                                                  counter_article_discarded, counter_article_error,
+                                                  counter_article_total)
+        self.__remove_checkpoint()
+        if self.__deduplicator is not None:
+            self.__deduplicator.commit()
+        kwargs = {}
+        if _accepts_keyword_argument(self.__callback_on_warc_completed, 'filter_stage_counters'):
+            kwargs['filter_stage_counters'] = dict(self.filter_stage_counters)
+        if _accepts_keyword_argument(self.__callback_on_warc_completed, 'stage_seconds'):
+            kwargs['stage_seconds'] = dict(self.stage_seconds)
+        if _accepts_keyword_argument(self.__callback_on_warc_completed, 'busy_seconds'):
+            kwargs['busy_seconds'] = time.perf_counter() - self.__start_time
         self.__callback_on_warc_completed(self.__warc_download_url, counter_article_passed, counter_article_discarded,
-                                          counter_article_error, counter_article_total)
+                                          counter_article_error, counter_article_total, **kwargs)
 
     def __run(self):
         """
@@ -315,23 +598,39 @@ class CommonCrawlExtractor:
         on_valid_article_extracted will be invoked after the extraction of the article has completed.
         :return:
         """
-        self.__setup()
-
-        local_path_name = self.__download(self.__warc_download_url)
-        self.__process_warc_gz_file(local_path_name)
-
-    def extract_from_commoncrawl(self, warc_download_url, callback_on_article_extracted,
-                                 callback_on_warc_completed=None,
-                                 valid_hosts=None,
-                                 start_date=None, end_date=None,
-                                 strict_date=True, reuse_previously_downloaded_files=True, local_download_dir_warc=None,
-                                 continue_after_error=True, ignore_unicode_errors=False,
-                                 show_download_progress=False, log_level=logging.ERROR, delete_warc_after_extraction=True,
-                                 log_pathname_fully_extracted_warcs=None, fetch_images=False):
+        os.makedirs(self.__local_download_dir_warc, exist_ok=True)
+        self.__start_time = time.perf_counter()
+        self.filter_stage_counters.clear()
+        self.stage_seconds.clear()
+        if self.__warc_ledger is not None:
+            self.__warc_ledger.start(self.__warc_download_url)
+        try:
+            local_path_name = self.__get_local_filepath(self.__warc_download_url)
+            if self.__stream_warc and \
+                    not (self.__reuse_previously_downloaded_files and
+                         is_downloaded(local_path_name, self.__expected_size)):
+                self.__stream_warc_gz_file(self.__warc_download_url)
+            else:
+                local_path_name = self.__download(self.__warc_download_url)
+                self.__process_warc_gz_file(local_path_name)
+        except BaseException as e:
+            if self.__warc_ledger is not None:
+                self.__warc_ledger.fail(self.__warc_download_url, repr(e))
+            raise
+
+    def configure(self, warc_download_url, callback_on_article_extracted,
+                  callback_on_warc_completed=None,
+                  valid_hosts=None,
+                  start_date=None, end_date=None,
+                  strict_date=True, reuse_previously_downloaded_files=True, local_download_dir_warc=None,
+                  continue_after_error=True, ignore_unicode_errors=False,
+                  show_download_progress=False, log_level=logging.ERROR, delete_warc_after_extraction=True,
+                  log_pathname_fully_extracted_warcs=None, fetch_images=False, stream_warc=False,
+                  substring_host_match=False, checkpoint_interval=0, warc_ledger=None, expected_size=None,
+                  verify_gzip=False, duplicate_filter=None, deduplicate_urls=False):
         """
-        Crawl and extract articles form the news crawl provided by commoncrawl.org. For each article that was extracted
-        successfully the callback function callback_on_article_extracted is invoked where the first parameter is the
-        article object.
+        Configures the extractor, see extract_from_commoncrawl. This is only needed if you want to process single records
+        using process_record instead of a whole WARC file.
         :param log_pathname_fully_extracted_warcs:
         :param delete_warc_after_extraction:
         :param warc_download_url:
@@ -346,6 +645,23 @@ class CommonCrawlExtractor:
         :param continue_after_error:
         :param show_download_progress:
         :param log_level:
+        :param fetch_images:
+        :param stream_warc: if True, the WARC file is extracted while it is downloaded. It is only saved locally if
+        reuse_previously_downloaded_files is True and delete_warc_after_extraction is False.
+        :param substring_host_match: if True, a record passes the host filter if one of the valid_hosts is contained
+        anywhere in its URL, else its host must equal one of the valid_hosts or be a subdomain of one of them.
+        :param checkpoint_interval: if not 0, the position within the WARC file is saved every checkpoint_interval
+        response records in local_download_dir_warc, so that an interrupted extraction of the WARC file resumes from
+        the last checkpoint, by seeking in the local file or with a range request if the WARC file is streamed.
+        :param warc_ledger: if not None, a WarcLedger in which the state of the WARC file is recorded
+        :param expected_size: if not None, the size of the WARC file, e.g., according to the listing of the WARC files.
+        Local files of another size are not reused and downloads of another size are rejected.
+        :param verify_gzip: if True, all gzip members of a downloaded WARC file are decompressed once to verify the file
+        before it is extracted
+        :param duplicate_filter: if not None, a filter shared by all extraction processes and runs, e.g., a BloomFilter,
+        and response records whose WARC-Payload-Digest is in the filter are skipped before they are decoded. The keys
+        of the other records are added to the filter at each checkpoint and once the WARC file is completed.
+        :param deduplicate_urls: if True, records whose normalized URL is in duplicate_filter are skipped, too
         :return:
         """
         self.__warc_download_url = warc_download_url
@@ -365,5 +681,75 @@ class CommonCrawlExtractor:
         self.__log_level = log_level
         self.__delete_warc_after_extraction = delete_warc_after_extraction
         self.__log_pathname_fully_extracted_warcs = log_pathname_fully_extracted_warcs
+        self.__stream_warc = stream_warc
+        self.__substring_host_match = substring_host_match
+        self.__checkpoint_interval = checkpoint_interval
+        self.__warc_ledger = warc_ledger
+        self.__expected_size = expected_size
+        self.__verify_gzip = verify_gzip
+        self.__duplicate_filter = duplicate_filter
+        self.__deduplicate_urls = deduplicate_urls
 
+        self.__setup()
+
+    def extract_from_commoncrawl(self, warc_download_url, callback_on_article_extracted,
+                                 callback_on_warc_completed=None,
+                                 valid_hosts=None,
+                                 start_date=None, end_date=None,
+                                 strict_date=True, reuse_previously_downloaded_files=True, local_download_dir_warc=None,
+                                 continue_after_error=True, ignore_unicode_errors=False,
+                                 show_download_progress=False, log_level=logging.ERROR, delete_warc_after_extraction=True,
+                                 log_pathname_fully_extracted_warcs=None, fetch_images=False, stream_warc=False,
+                                 substring_host_match=False, checkpoint_interval=0, warc_ledger=None,
+                                 expected_size=None, verify_gzip=False, duplicate_filter=None,
+                                 deduplicate_urls=False):
+        """
+        Crawl and extract articles form the news crawl provided by commoncrawl.org. For each article that was extracted
+        successfully the callback function callback_on_article_extracted is invoked where the first parameter is the
+        article object.
+        :param log_pathname_fully_extracted_warcs:
+        :param delete_warc_after_extraction:
+        :param warc_download_url:
+        :param callback_on_article_extracted:
+        :param callback_on_warc_completed:
+        :param valid_hosts:
+        :param start_date:
+        :param end_date:
+        :param strict_date:
+        :param reuse_previously_downloaded_files:
+        :param local_download_dir_warc:
+        :param continue_after_error:
+        :param show_download_progress:
+        :param log_level:
+        :param fetch_images:
+        :param stream_warc: if True, the WARC file is extracted while it is downloaded. It is only saved locally if
+        reuse_previously_downloaded_files is True and delete_warc_after_extraction is False.
+        :param substring_host_match: if True, a record passes the host filter if one of the valid_hosts is contained
+        anywhere in its URL, else its host must equal one of the valid_hosts or be a subdomain of one of them.
+        :param checkpoint_interval: if not 0, the position within the WARC file is saved every checkpoint_interval
+        response records in local_download_dir_warc, so that an interrupted extraction of the WARC file resumes from
+        the last checkpoint, by seeking in the local file or with a range request if the WARC file is streamed.
+        :param warc_ledger: if not None, a WarcLedger in which the state of the WARC file is recorded
+        :param expected_size: if not None, the size of the WARC file, e.g., according to the listing of the WARC files.
+        Local files of another size are not reused and downloads of another size are rejected.
+        :param verify_gzip: if True, all gzip members of a downloaded WARC file are decompressed once to verify the file
+        before it is extracted
+        :param duplicate_filter: if not None, a filter shared by all extraction processes and runs, e.g., a BloomFilter,
+        and response records whose WARC-Payload-Digest is in the filter are skipped before they are decoded. The keys
+        of the other records are added to the filter at each checkpoint and once the WARC file is completed.
+        :param deduplicate_urls: if True, records whose normalized URL is in duplicate_filter are skipped, too
+        :return:
+        """
+        self.configure(warc_download_url, callback_on_article_extracted,
+                       callback_on_warc_completed=callback_on_warc_completed, valid_hosts=valid_hosts,
+                       start_date=start_date, end_date=end_date, strict_date=strict_date,
+                       reuse_previously_downloaded_files=reuse_previously_downloaded_files,
+                       local_download_dir_warc=local_download_dir_warc, continue_after_error=continue_after_error,
+                       ignore_unicode_errors=ignore_unicode_errors, show_download_progress=show_download_progress,
+                       log_level=log_level, delete_warc_after_extraction=delete_warc_after_extraction,
+                       log_pathname_fully_extracted_warcs=log_pathname_fully_extracted_warcs,
+                       fetch_images=fetch_images, stream_warc=stream_warc,
+                       substring_host_match=substring_host_match, checkpoint_interval=checkpoint_interval,
+                       warc_ledger=warc_ledger, expected_size=expected_size, verify_gzip=verify_gzip,
+                       duplicate_filter=duplicate_filter, deduplicate_urls=deduplicate_urls)
         self.__run()
@@ -0,0 +1,127 @@
+"""
+Aggregates the statistics of a crawl of commoncrawl.org over all extraction processes. The extraction processes report
+each completed WARC file to the parent process, which is the only place where the statistics of the whole crawl are
+known.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# the stages of the extraction of a WARC file whose time is measured
+STAGES = ('download', 'decompress', 'filter', 'extract', 'callback')
+
+
+@contextmanager
+def measure(stage_seconds, stage):
+    """
+    Adds the wall time spent within the with block to stage_seconds[stage]
+    :param stage_seconds: A Counter
+    :param stage: see STAGES
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds[stage] += time.perf_counter() - start
+
+
+class CrawlMetrics(object):
+    """
+    The statistics of a crawl: the numbers of WARC files and articles, the time spent in each stage of the extraction
+    and the time each extraction process was busy. All methods are thread-safe.
+    """
+
+    def __init__(self, number_of_warcs, number_of_warcs_skipped=0):
+        """
+        :param number_of_warcs: number of WARC files of the crawl, including the skipped ones
+        :param number_of_warcs_skipped: number of WARC files that are skipped, e.g., because they were fully extracted
+        before
+        """
+        self.number_of_warcs = number_of_warcs
+        self.number_of_warcs_skipped = number_of_warcs_skipped
+        self.number_of_warcs_processed = 0
+        self.articles = Counter()
+        self.filter_stages = Counter()
+        self.stage_seconds = Counter()
+        self.worker_busy_seconds = Counter()
+        self.start_time = time.time()
+        self.__lock = threading.Lock()
+
+    def add_warc(self, worker, passed, discarded, error, total, filter_stage_counters=None, stage_seconds=None,
+                 busy_seconds=None):
+        """
+        Adds the statistics of a completed WARC file
+        :param worker: the id of the process that extracted the WARC file, e.g., its pid
+        :param passed:
+        :param discarded:
+        :param error:
+        :param total:
+        :param filter_stage_counters: see CommonCrawlExtractor.filter_record
+        :param stage_seconds: A dict of the seconds spent in each stage, see STAGES
+        :param busy_seconds: the seconds the worker spent on the WARC file, if None, the extraction processes are
+        expected to report their busy time with add_worker_time
+        """
+        with self.__lock:
+            self.number_of_warcs_processed += 1
+            self.articles.update({'passed': passed, 'discarded': discarded, 'error': error, 'total': total})
+            self.filter_stages.update(filter_stage_counters or {})
+            self.stage_seconds.update(stage_seconds or {})
+            if busy_seconds is not None:
+                self.worker_busy_seconds[worker] += busy_seconds
+
+    def add_worker_time(self, worker, busy_seconds, stage_seconds=None):
+        """
+        Adds time a worker spent on a part of a WARC file, e.g., a single record
+        """
+        with self.__lock:
+            self.worker_busy_seconds[worker] += busy_seconds
+            self.stage_seconds.update(stage_seconds or {})
+
+    def snapshot(self):
+        """
+        :return: A JSON serializable dict of the current statistics
+        """
+        with self.__lock:
+            elapsed_secs = time.time() - self.start_time
+            remaining_warcs = self.number_of_warcs - self.number_of_warcs_processed - self.number_of_warcs_skipped
+            # the wall time per WARC file already accounts for the number of parallel extraction processes
+            secs_per_warc = elapsed_secs / self.number_of_warcs_processed if self.number_of_warcs_processed else None
+            return {
+                'elapsed_seconds': elapsed_secs,
+                'warcs': {'processed': self.number_of_warcs_processed, 'skipped': self.number_of_warcs_skipped,
+                          'remaining': remaining_warcs, 'total': self.number_of_warcs},
+                'articles': {key: self.articles[key] for key in ('passed', 'discarded', 'error', 'total')},
+                'articles_per_second': self.articles['total'] / elapsed_secs if elapsed_secs else None,
+                'seconds_per_warc': secs_per_warc,
+                'eta_seconds': remaining_warcs * secs_per_warc if secs_per_warc is not None else None,
+                'stage_seconds': {stage: self.stage_seconds[stage] for stage in STAGES},
+                'filter_stages': dict(self.filter_stages),
+                'worker_utilization': {str(worker): min(1.0, busy / elapsed_secs) if elapsed_secs else None
+                                       for worker, busy in sorted(self.worker_busy_seconds.items(),
+                                                                     key=lambda item: str(item[0]))},
+            }
+
+    def log(self, logger):
+        """
+        Logs the current statistics
+        """
+        metrics = self.snapshot()
+        warcs = metrics['warcs']
+        articles = metrics['articles']
+        logger.info("warc processing statistics")
+        logger.info("warc files skipped = %i, processed = %i, remaining = %i, total = %i", warcs['skipped'],
+                    warcs['processed'], warcs['remaining'], warcs['total'])
+        logger.info("articles pass = %i, discard = %i, error = %i, total = %i", articles['passed'],
+                    articles['discarded'], articles['error'], articles['total'])
+        logger.info("global [articles/s] = %.2f", metrics['articles_per_second'] or 0)
+        if metrics['eta_seconds'] is not None:
+            logger.info("global [h/warc] = %.3f", metrics['seconds_per_warc'] / 3600)
+            logger.info("estimated remaining time [h] = %.3f", metrics['eta_seconds'] / 3600)
+        logger.info("stages [s] = %s", ', '.join('%s: %.1f' % item for item in metrics['stage_seconds'].items()))
+        if metrics['filter_stages']:
+            logger.info("filter stages = %s", metrics['filter_stages'])
+        logger.info("worker utilization = %s",
+                    ', '.join('%s: %.0f%%' % (worker, 100 * utilization)
+                              for worker, utilization in metrics['worker_utilization'].items()))
+        return metrics
@@ -26,6 +26,10 @@ class NewscrawlerItem(scrapy.Item):
     html_title = scrapy.Field()
     # Response object from crawler
     spider_response = scrapy.Field()
+    # Parsed HTML of the response, shared by the extractors during the extraction
+    parsed_document = scrapy.Field()
+    # Names of the extractors that were skipped, since cheaper extractors already resolved their fields
+    skipped_extractors = scrapy.Field()
     # Title of the article as store in the RSS feed
     rss_title = scrapy.Field()
     # Extracted article title
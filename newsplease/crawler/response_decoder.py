@@ -32,17 +32,26 @@ def detect_encoding(bytesobject):
     return None
 
 
-def decode_response(response):
-    """Read the first chunk of server response and decode it"""
-    guessed_encoding = detect_encoding(response.content)
-    LOGGER.debug('response/guessed encoding: %s / %s', response.encoding, guessed_encoding)
-    # process
+def decode_content(content, fallback_encoding=None):
+    """Decode the raw content of a response, using the detected encoding and the given one as fallback"""
+    # unicode-test, whose result is kept, so that UTF-8 content is only decoded once
+    try:
+        return content.decode('UTF-8')
+    except UnicodeDecodeError:
+        pass
+    guessed_encoding = cchardet.detect(content)['encoding']
+    LOGGER.debug('fallback/guessed encoding: %s / %s', fallback_encoding, guessed_encoding)
     if guessed_encoding is not None:
         try:
-            htmltext = response.content.decode(guessed_encoding)
-        except UnicodeDecodeError:
-            LOGGER.warning('encoding error: %s / %s', response.encoding, guessed_encoding)
-            htmltext = response.text
-    else:
-        htmltext = response.text
-    return htmltext
+            return content.decode(guessed_encoding)
+        except (UnicodeDecodeError, LookupError):
+            LOGGER.warning('encoding error: %s / %s', fallback_encoding, guessed_encoding)
+    try:
+        return content.decode(fallback_encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return content.decode('utf-8', errors='replace')
+
+
+def decode_response(response):
+    """Read the server response and decode it"""
+    return decode_content(response.content, response.encoding)
@@ -1,15 +1,18 @@
 import socket
-import copy
-import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import requests
 import urllib3
 
-from .response_decoder import decode_response
+from .response_decoder import decode_content
 
 MAX_FILE_SIZE = 20000000
 MIN_FILE_SIZE = 10
+# size of the chunks in which responses are read
+CHUNK_SIZE = 65536
+# default number of urls that are crawled in parallel
+MAX_WORKERS = 32
 
 LOGGER = logging.getLogger(__name__)
 
@@ -22,7 +25,6 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 class SimpleCrawler(object):
-    _results = {}
 
     @staticmethod
     def fetch_url(url, timeout=None):
@@ -32,62 +34,146 @@ class SimpleCrawler(object):
         :param timeout: in seconds, if None, the urllib default is used
         :return:
         """
-        return SimpleCrawler._fetch_url(url, False, timeout=timeout)
+        return SimpleCrawler._fetch_url(url, timeout=timeout)
 
     @staticmethod
-    def _fetch_url(url, is_threaded, timeout=None):
+    def fetch_url_bytes(url, timeout=None):
         """
-        Crawls the html content of the parameter url and saves the html in _results
+        Crawls the raw content of the parameter url without decoding it
         :param url:
-        :param is_threaded: If True, results will be stored for later processing by the fetch_urls method. Else not.
         :param timeout: in seconds, if None, the urllib default is used
-        :return: html of the url
+        :return: The content as bytes, or None if the url could not be crawled
+        """
+        return SimpleCrawler._download(url, timeout=timeout)[0]
+
+    @staticmethod
+    def _download(url, timeout=None):
+        """
+        Downloads the content of the parameter url. The response is read in chunks, so that the download is aborted as
+        soon as MAX_FILE_SIZE is exceeded.
+        :param url:
+        :param timeout: in seconds, if None, the urllib default is used
+        :return: A tuple of the content as bytes (None if the url could not be crawled) and the encoding declared in
+        the response headers
         """
-        html_str = None
-        # send
         try:
-            # read by streaming chunks (stream=True, iter_content=xx)
-            # so we can stop downloading as soon as MAX_FILE_SIZE is reached
-            response = requests.get(url, timeout=timeout, verify=False, allow_redirects=True, headers=HEADERS)
+            response = requests.get(url, timeout=timeout, verify=False, allow_redirects=True, headers=HEADERS,
+                                    stream=True)
         except (requests.exceptions.MissingSchema, requests.exceptions.InvalidURL):
             LOGGER.error('malformed URL: %s', url)
+            return None, None
         except requests.exceptions.TooManyRedirects:
             LOGGER.error('too many redirects: %s', url)
+            return None, None
         except requests.exceptions.SSLError as err:
             LOGGER.error('SSL: %s %s', url, err)
+            return None, None
         except (
             socket.timeout, requests.exceptions.ConnectionError,
             requests.exceptions.Timeout, socket.error, socket.gaierror
         ) as err:
             LOGGER.error('connection/timeout error: %s %s', url, err)
-        else:
+            return None, None
+
+        with response:
             # safety checks
             if response.status_code != 200:
                 LOGGER.error('not a 200 response: %s', response.status_code)
-            elif response.text is None or len(response.text) < MIN_FILE_SIZE:
-                LOGGER.error('too small/incorrect: %s %s', url, len(response.text))
-            elif len(response.text) > MAX_FILE_SIZE:
-                LOGGER.error('too large: %s %s', url, len(response.text))
-            else:
-                html_str = decode_response(response)
-        if is_threaded:
-            SimpleCrawler._results[url] = html_str
-        return html_str
+                return None, None
+            content_length = response.headers.get('Content-Length', '')
+            if content_length.isdigit() and int(content_length) > MAX_FILE_SIZE:
+                LOGGER.error('too large: %s %s', url, content_length)
+                return None, None
+
+            chunks = []
+            size = 0
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > MAX_FILE_SIZE:
+                        LOGGER.error('too large: %s %s', url, size)
+                        return None, None
+                    chunks.append(chunk)
+            except (requests.exceptions.RequestException, socket.error) as err:
+                LOGGER.error('connection/timeout error: %s %s', url, err)
+                return None, None
+
+            if size < MIN_FILE_SIZE:
+                LOGGER.error('too small/incorrect: %s %s', url, size)
+                return None, None
+            return b''.join(chunks), response.encoding
+
+    @staticmethod
+    def _fetch_url(url, timeout=None):
+        """
+        Crawls the html content of the parameter url
+        :param url:
+        :param timeout: in seconds, if None, the urllib default is used
+        :return: html of the url, or None if the url could not be crawled
+        """
+        content, encoding = SimpleCrawler._download(url, timeout=timeout)
+        if content is None:
+            return None
+        # UTF-8 content is decoded exactly once, other content once more after its encoding has been guessed
+        return decode_content(content, encoding)
 
     @staticmethod
-    def fetch_urls(urls, timeout=None):
+    def fetch_urls(urls, timeout=None, max_workers=MAX_WORKERS):
         """
         Crawls the html content of all given urls in parallel. Returns when all requests are processed.
         :param urls:
         :param timeout: in seconds, if None, the urllib default is used
-        :return:
+        :param max_workers: maximum number of urls that are crawled in parallel
+        :return: A dict containing the given urls as keys, and their html (None if the url could not be crawled) as
+        corresponding values.
+        """
+        return dict(SimpleCrawler.iter_urls(urls, timeout=timeout, max_workers=max_workers))
+
+    @staticmethod
+    def iter_urls(urls, timeout=None, max_workers=MAX_WORKERS):
+        """
+        Crawls the html content of all given urls in parallel and yields each result as soon as it is completed. The
+        urls are consumed lazily, so at most max_workers responses are held in memory at once.
+        :param urls: An iterable of urls
+        :param timeout: in seconds, if None, the urllib default is used
+        :param max_workers: maximum number of urls that are crawled in parallel
+        :return: A generator of (url, html) tuples in the order of completion, html is None if the url could not be
+        crawled
         """
-        threads = [threading.Thread(target=SimpleCrawler._fetch_url, args=(url, True, timeout)) for url in urls]
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
-
-        results = copy.deepcopy(SimpleCrawler._results)
-        SimpleCrawler._results = {}
-        return results
+        for _, url, html_str in SimpleCrawler.iter_keyed_urls(enumerate(urls), timeout=timeout,
+                                                               max_workers=max_workers):
+            yield url, html_str
+
+    @staticmethod
+    def iter_keyed_urls(keyed_urls, timeout=None, max_workers=MAX_WORKERS, max_keys_ahead=None):
+        """
+        Same as iter_urls, but takes (key, url) tuples and yields (key, url, html) tuples, e.g., to relate each result
+        to the position of its url in the input.
+        :param keyed_urls: An iterable of (key, url) tuples
+        :param timeout: in seconds, if None, the urllib default is used
+        :param max_workers: maximum number of urls that are crawled in parallel
+        :param max_keys_ahead: if not None, the keys must be ascending integers, e.g., line numbers, and a url is only
+        crawled once its key is less than max_keys_ahead greater than the smallest key that is still crawled, so that
+        a slow url holds back the following ones instead of letting them complete arbitrarily far ahead of it
+        :return: A generator of (key, url, html) tuples in the order of completion
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # the key of each pending future
+            pending = {}
+            keyed_urls = iter(keyed_urls)
+            next_keyed_url = next(keyed_urls, None)
+            while next_keyed_url is not None or pending:
+                while next_keyed_url is not None and len(pending) < max_workers and \
+                        (max_keys_ahead is None or not pending or
+                         next_keyed_url[0] - min(pending.values()) < max_keys_ahead):
+                    key, url = next_keyed_url
+                    pending[executor.submit(SimpleCrawler._fetch_keyed_url, key, url, timeout)] = key
+                    next_keyed_url = next(keyed_urls, None)
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    yield future.result()
+
+    @staticmethod
+    def _fetch_keyed_url(key, url, timeout=None):
+        return key, url, SimpleCrawler._fetch_url(url, timeout=timeout)
@@ -0,0 +1,100 @@
+"""
+Skips records of WARC files whose payload, or optionally whose URL, has been seen before, e.g., in another WARC file of
+the same or of a previous crawl. CC-NEWS contains many copies of the same article due to re-crawls and syndicated URLs,
+which are detected by the headers of their records only, i.e., before their payload is decoded.
+"""
+from six.moves import urllib
+
+# query parameters that do not change the content of a page
+TRACKING_PARAMETERS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid',
+                       'ocid', 'cmpid')
+
+
+def normalize_url(url):
+    """
+    Normalizes url, so that URLs that only differ in their scheme, a leading www., the case of the host, tracking
+    parameters, the order of the query parameters, the fragment or a trailing slash are equal
+    :param url:
+    :return: the normalized URL without scheme
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted((name, value) for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in TRACKING_PARAMETERS)
+    normalized_url = host + (parts.path.rstrip('/') or '')
+    if query:
+        normalized_url += '?' + urllib.parse.urlencode(query)
+    return normalized_url
+
+
+def get_record_keys(warc_record, deduplicate_urls=False):
+    """
+    Returns the keys of a record under which it is looked up, i.e., its payload digest and, if deduplicate_urls, its
+    normalized URL
+    :return: A list of strings, which is empty if the record has neither
+    """
+    keys = []
+    digest = warc_record.rec_headers.get_header('WARC-Payload-Digest')
+    if digest:
+        keys.append('digest:' + digest)
+    if deduplicate_urls:
+        url = warc_record.rec_headers.get_header('WARC-Target-URI')
+        if url:
+            keys.append('url:' + normalize_url(url))
+    return keys
+
+
+class RecordDeduplicator(object):
+    """
+    Detects the duplicate records of one WARC file. A record is a duplicate if one of its keys is in the shared filter,
+    e.g., a BloomFilter, or belongs to an earlier record of the same WARC file. The keys of the records are only added
+    to the shared filter by commit, once their articles have been saved, e.g., at a checkpoint or once the WARC file is
+    completed. Hence, if the extraction is interrupted, the records after the last commit are not skipped when it is
+    resumed.
+    """
+
+    def __init__(self, duplicate_filter, deduplicate_urls=False, in_flight_keys=None):
+        """
+        :param duplicate_filter: a set-like object that supports "in" and update(keys)
+        :param deduplicate_urls: if True, records with the same normalized URL are duplicates, too
+        :param in_flight_keys: if not None, a set shared by the deduplicators of the WARC files that are read at the
+        same time in this process, so that their records are also duplicates of each other's uncommitted records
+        """
+        self.duplicate_filter = duplicate_filter
+        self.deduplicate_urls = deduplicate_urls
+        self.in_flight_keys = in_flight_keys
+        self.pending_keys = set()
+
+    def is_duplicate(self, warc_record):
+        """
+        Returns True if the record is a duplicate, else its keys are remembered until the next commit
+        """
+        keys = get_record_keys(warc_record, self.deduplicate_urls)
+        if any(key in self.pending_keys or (self.in_flight_keys is not None and key in self.in_flight_keys) or
+               key in self.duplicate_filter for key in keys):
+            return True
+        self.pending_keys.update(keys)
+        if self.in_flight_keys is not None:
+            self.in_flight_keys.update(keys)
+        return False
+
+    def commit(self):
+        """
+        Adds the keys of all records since the last commit to the shared filter
+        """
+        if self.pending_keys:
+            self.duplicate_filter.update(self.pending_keys)
+            if self.in_flight_keys is not None:
+                self.in_flight_keys.difference_update(self.pending_keys)
+            self.pending_keys = set()
+
+    def abort(self):
+        """
+        Forgets the keys of all records since the last commit, e.g., if the extraction of the WARC file failed, so that
+        the records of other WARC files with these keys are not skipped
+        """
+        if self.in_flight_keys is not None:
+            self.in_flight_keys.difference_update(self.pending_keys)
+        self.pending_keys = set()
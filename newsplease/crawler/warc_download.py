@@ -0,0 +1,183 @@
+import logging
+import os
+import zlib
+
+from six.moves import urllib
+
+LOGGER = logging.getLogger(__name__)
+
+# size of the chunks in which files are downloaded and verified
+CHUNK_SIZE = 1024 * 1024
+# timeout in seconds of the requests of download_file
+DOWNLOAD_TIMEOUT = 60
+# number of requests after which download_file gives up
+DOWNLOAD_ATTEMPTS = 3
+
+
+class DownloadSizeError(IOError):
+    """
+    Raised if a completed download does not have the expected size
+    """
+    pass
+
+
+def get_local_filepath(local_download_dir_warc, url):
+    """
+    Returns the path to which the WARC file at url is downloaded
+    :param local_download_dir_warc:
+    :param url:
+    :return:
+    """
+    return os.path.join(local_download_dir_warc, urllib.parse.quote_plus(url))
+
+
+def get_checkpoint_path(local_download_dir_warc, url):
+    """
+    Returns the path of the checkpoint of the extraction of the WARC file at url
+    :param local_download_dir_warc:
+    :param url:
+    :return:
+    """
+    return get_local_filepath(local_download_dir_warc, url) + '.checkpoint.json'
+
+
+def is_downloaded(local_filepath, expected_size=None):
+    """
+    Returns True if the file at local_filepath exists and, if expected_size is not None, has this size. Files of former
+    versions, which did not download to a partial file first, may be truncated.
+    """
+    if not os.path.isfile(local_filepath):
+        return False
+    if expected_size is not None and os.path.getsize(local_filepath) != expected_size:
+        LOGGER.warning('size of %s is %i bytes instead of %i, not reusing it', local_filepath,
+                       os.path.getsize(local_filepath), expected_size)
+        return False
+    return True
+
+
+def verify_gzip_members(path, chunk_size=CHUNK_SIZE):
+    """
+    Decompresses all gzip members of the file at path, which checks the CRC and length of each member, without keeping
+    the decompressed data. A WARC file consists of one gzip member per record.
+    :param path:
+    :param chunk_size: size of the chunks in which the file is read
+    :return: the number of gzip members
+    :raises IOError: if a member is corrupt or the file ends within a member
+    """
+    number_of_members = 0
+    decompressor = None
+    with open(path, 'rb') as file:
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            while data:
+                if decompressor is None:
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    number_of_members += 1
+                try:
+                    # decompress in bounded steps, so that highly compressed members do not use much memory
+                    decompressor.decompress(data, chunk_size)
+                    while decompressor.unconsumed_tail:
+                        decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+                except zlib.error as e:
+                    raise IOError('corrupt gzip member %i in %s: %s' % (number_of_members, path, e))
+                if decompressor.eof:
+                    data = decompressor.unused_data
+                    decompressor = None
+                else:
+                    data = b''
+    if decompressor is not None:
+        raise IOError('%s ends within gzip member %i' % (path, number_of_members))
+    return number_of_members
+
+
+def download_file(url, local_filepath, reporthook=None, expected_size=None, verify_gzip=False,
+                  timeout=DOWNLOAD_TIMEOUT, max_attempts=DOWNLOAD_ATTEMPTS):
+    """
+    Downloads the file at url to local_filepath. The file is written to local_filepath + '.part' first, which is renamed
+    to local_filepath once the download has completed and has been validated, so that local_filepath never refers to a
+    partial file. If the download is interrupted, the partial file is kept and the download is resumed with a HTTP
+    range request, also by later calls, e.g., after the process has been killed.
+    :param url:
+    :param local_filepath:
+    :param reporthook: see urllib.request.urlretrieve. It is called after each chunk with the size of the file downloaded
+    so far in blocks of one byte and the total size, so that the progress includes the part downloaded before a resume.
+    :param expected_size: if not None, the size of the file, e.g., according to the listing of the WARC files. A
+    download of another size is rejected.
+    :param verify_gzip: if True, all gzip members of the file are checked before the rename, see verify_gzip_members
+    :param timeout: in seconds, per request
+    :param max_attempts: number of requests before the download fails, each request resumes the previous ones
+    :return: local_filepath
+    """
+    part_filepath = local_filepath + '.part'
+    for attempt in range(1, max_attempts + 1):
+        try:
+            __download_part(url, part_filepath, reporthook, expected_size, timeout)
+            break
+        except (IOError, OSError) as e:
+            # client errors, e.g., if the file does not exist, and downloads of the wrong size are not retried
+            if attempt == max_attempts or isinstance(e, DownloadSizeError) or \
+                    isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                raise
+            LOGGER.warning('download of %s interrupted (attempt %i of %i), resuming: %s', url, attempt, max_attempts,
+                           e)
+
+    if verify_gzip:
+        try:
+            verify_gzip_members(part_filepath)
+        except IOError:
+            os.remove(part_filepath)
+            raise
+    os.replace(part_filepath, local_filepath)
+    return local_filepath
+
+
+def __download_part(url, part_filepath, reporthook, expected_size, timeout):
+    """
+    Downloads the rest of the file at url, which is appended to part_filepath, and validates the size of the file
+    """
+    offset = os.path.getsize(part_filepath) if os.path.isfile(part_filepath) else 0
+    if expected_size is not None and offset > expected_size:
+        LOGGER.warning('partial download %s is larger than %s, restarting', part_filepath, url)
+        os.remove(part_filepath)
+        offset = 0
+
+    if expected_size is None or offset < expected_size:
+        request = urllib.request.Request(url)
+        if offset:
+            request.add_header('Range', 'bytes=%i-' % offset)
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code != 416:
+                raise
+            # the partial file is not smaller than the file at url
+            os.remove(part_filepath)
+            raise IOError('partial download %s does not match %s' % (part_filepath, url))
+
+        with response:
+            if offset and response.status != 206:
+                LOGGER.info('range requests not supported, restarting the download of %s', url)
+                offset = 0
+            content_length = response.headers.get('Content-Length')
+            total_size = offset + int(content_length) if content_length is not None else -1
+            if offset:
+                LOGGER.info('resuming the download of %s at %i bytes', url, offset)
+            with open(part_filepath, 'ab' if offset else 'wb') as part_file:
+                size = offset
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    part_file.write(chunk)
+                    size += len(chunk)
+                    if reporthook:
+                        reporthook(size, 1, total_size)
+            if 0 <= total_size != size:
+                raise IOError('download of %s ended after %i of %i bytes' % (url, size, total_size))
+
+    size = os.path.getsize(part_filepath)
+    if expected_size is not None and size != expected_size:
+        os.remove(part_filepath)
+        raise DownloadSizeError('size of %s is %i bytes instead of %i' % (url, size, expected_size))
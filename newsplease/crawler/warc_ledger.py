@@ -0,0 +1,240 @@
+"""
+Records the state of each WARC file of a crawl of commoncrawl.org in an SQLite database, which replaces the list of
+fully extracted WARC files. Many extraction processes can update the ledger concurrently: the database is in WAL mode,
+so that readers do not block the writer, and each update is a short transaction that waits for the write lock.
+
+The ledger can be inspected while a crawl is running:
+python3 -m newsplease.crawler.warc_ledger cc_download_warc/warcs.sqlite
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# the states of a WARC file
+QUEUED = 'queued'
+DOWNLOADING = 'downloading'
+EXTRACTING = 'extracting'
+DONE = 'done'
+FAILED = 'failed'
+STATES = (QUEUED, DOWNLOADING, EXTRACTING, DONE, FAILED)
+
+# seconds to wait for the write lock of the database
+LOCK_TIMEOUT = 60
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS warcs (
+    url TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    queued_at REAL,
+    started_at REAL,
+    downloaded_at REAL,
+    finished_at REAL,
+    articles_passed INTEGER,
+    articles_discarded INTEGER,
+    articles_error INTEGER,
+    articles_total INTEGER,
+    error TEXT
+)
+'''
+
+
+class WarcLedger(object):
+    """
+    The state of each WARC file, the number of attempts to extract it, when its last attempt started, finished
+    downloading and finished, and the number of articles extracted from it. Each process opens its own connection, so
+    an instance can be passed to extraction processes. Within a process, the connection is shared by all threads.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        """
+        :param path: path of the database, which is created if it does not exist
+        :param timeout: seconds to wait for the write lock of the database
+        """
+        self.path = path
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+        self._lock = threading.RLock()
+        with self.__transaction() as connection:
+            connection.execute(_SCHEMA)
+            connection.execute('CREATE INDEX IF NOT EXISTS warcs_state ON warcs (state)')
+
+    def __getstate__(self):
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['timeout'])
+
+    def __connect(self):
+        # connections must not be shared with forked processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._pid = os.getpid()
+        return self._connection
+
+    @contextmanager
+    def __transaction(self):
+        """
+        A transaction that holds the write lock of the database from its start, so that it cannot fail with a deadlock
+        once it has started
+        """
+        with self._lock:
+            connection = self.__connect()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+    def queue(self, warc_download_urls):
+        """
+        Sets the state of all given WARC files to queued, except those that are done
+        """
+        now = time.time()
+        with self.__transaction() as connection:
+            connection.executemany('INSERT INTO warcs (url, state, queued_at) VALUES (?, ?, ?) '
+                                   'ON CONFLICT (url) DO UPDATE SET state = excluded.state, '
+                                   'queued_at = excluded.queued_at WHERE state != ?',
+                                   [(url, QUEUED, now, DONE) for url in warc_download_urls])
+
+    def requeue(self, warc_download_urls):
+        """
+        Sets the state of all given WARC files to queued, even if they are done, e.g., since their articles were lost
+        """
+        now = time.time()
+        with self.__transaction() as connection:
+            connection.executemany('UPDATE warcs SET state = ?, queued_at = ?, finished_at = NULL, '
+                                   'articles_passed = NULL, articles_discarded = NULL, articles_error = NULL, '
+                                   'articles_total = NULL WHERE url = ?',
+                                   [(QUEUED, now, url) for url in warc_download_urls])
+
+    def start(self, warc_download_url):
+        """
+        Starts an attempt to download and extract a WARC file
+        """
+        with self.__transaction() as connection:
+            connection.execute('INSERT INTO warcs (url, state, attempts, started_at) VALUES (?, ?, 1, ?) '
+                               'ON CONFLICT (url) DO UPDATE SET state = excluded.state, attempts = attempts + 1, '
+                               'started_at = excluded.started_at, downloaded_at = NULL, finished_at = NULL, '
+                               'error = NULL', (warc_download_url, DOWNLOADING, time.time()))
+
+    def start_extraction(self, warc_download_url):
+        """
+        Sets the state of a WARC file to extracting once it has been downloaded, or once its stream has been opened
+        """
+        with self.__transaction() as connection:
+            connection.execute('UPDATE warcs SET state = ?, downloaded_at = ? WHERE url = ?',
+                               (EXTRACTING, time.time(), warc_download_url))
+
+    def complete(self, warc_download_url, counter_article_passed=None, counter_article_discarded=None,
+                 counter_article_error=None, counter_article_total=None):
+        """
+        Sets the state of a WARC file to done
+        """
+        with self.__transaction() as connection:
+            connection.execute('INSERT INTO warcs (url, state, finished_at, articles_passed, articles_discarded, '
+                               'articles_error, articles_total) VALUES (?, ?, ?, ?, ?, ?, ?) '
+                               'ON CONFLICT (url) DO UPDATE SET state = excluded.state, '
+                               'finished_at = excluded.finished_at, articles_passed = excluded.articles_passed, '
+                               'articles_discarded = excluded.articles_discarded, '
+                               'articles_error = excluded.articles_error, articles_total = excluded.articles_total, '
+                               'error = NULL',
+                               (warc_download_url, DONE, time.time(), counter_article_passed,
+                                counter_article_discarded, counter_article_error, counter_article_total))
+
+    def fail(self, warc_download_url, error):
+        """
+        Sets the state of a WARC file to failed
+        :param error: the exception or message, which is saved as text
+        """
+        with self.__transaction() as connection:
+            connection.execute('INSERT INTO warcs (url, state, finished_at, error) VALUES (?, ?, ?, ?) '
+                               'ON CONFLICT (url) DO UPDATE SET state = excluded.state, '
+                               'finished_at = excluded.finished_at, error = excluded.error',
+                               (warc_download_url, FAILED, time.time(), str(error)))
+
+    def import_list(self, path):
+        """
+        Imports a list of fully extracted WARC files, i.e., the former fullyextractedwarcs.list, as done
+        :return: the number of imported WARC files
+        """
+        with open(path) as list_file:
+            urls = [line.strip() for line in list_file if line.strip()]
+        with self.__transaction() as connection:
+            connection.executemany('INSERT INTO warcs (url, state) VALUES (?, ?) '
+                                   'ON CONFLICT (url) DO UPDATE SET state = excluded.state',
+                                   [(url, DONE) for url in urls])
+        return len(urls)
+
+    def get_state(self, warc_download_url):
+        """
+        :return: the state of the WARC file, or None if it is not in the ledger
+        """
+        with self._lock:
+            row = self.__connect().execute('SELECT state FROM warcs WHERE url = ?', (warc_download_url,)).fetchone()
+        return row[0] if row else None
+
+    def get_urls(self, state):
+        """
+        :return: A set of the URLs of all WARC files in state
+        """
+        with self._lock:
+            return {row[0] for row in self.__connect().execute('SELECT url FROM warcs WHERE state = ?', (state,))}
+
+    def get_status(self):
+        """
+        :return: A JSON serializable dict of the number of WARC files in each state, the total number of articles of the
+        WARC files that are done, and the average seconds spent per WARC file
+        """
+        with self._lock:
+            connection = self.__connect()
+            warcs = dict.fromkeys(STATES, 0)
+            warcs.update(connection.execute('SELECT state, COUNT(*) FROM warcs GROUP BY state').fetchall())
+            passed, discarded, error, total, retried = connection.execute(
+                'SELECT SUM(articles_passed), SUM(articles_discarded), SUM(articles_error), SUM(articles_total), '
+                'SUM(attempts > 1) FROM warcs').fetchone()
+            download_secs, extraction_secs = connection.execute(
+                'SELECT AVG(downloaded_at - started_at), AVG(finished_at - downloaded_at) FROM warcs '
+                'WHERE state = ? AND downloaded_at IS NOT NULL', (DONE,)).fetchone()
+            failures = connection.execute('SELECT url, attempts, error FROM warcs WHERE state = ? '
+                                          'ORDER BY finished_at DESC LIMIT 10', (FAILED,)).fetchall()
+        return {
+            'warcs': warcs,
+            'warcs_retried': retried or 0,
+            'articles': {'passed': passed or 0, 'discarded': discarded or 0, 'error': error or 0, 'total': total or 0},
+            'seconds_per_warc': {'download': download_secs, 'extraction': extraction_secs},
+            'recent_failures': [{'url': url, 'attempts': attempts, 'error': error}
+                                for url, attempts, error in failures],
+        }
+
+    def log_status(self, logger):
+        """
+        Logs the number of WARC files in each state
+        """
+        status = self.get_status()
+        logger.info('warc ledger: %s', ', '.join('%s = %i' % item for item in status['warcs'].items()))
+        return status
+
+
+def main():
+    if len(sys.argv) != 2:
+        print('usage: python3 -m newsplease.crawler.warc_ledger PATH_OF_LEDGER')
+        sys.exit(1)
+    if not os.path.isfile(sys.argv[1]):
+        print('ledger not found: %s' % sys.argv[1])
+        sys.exit(1)
+    print(json.dumps(WarcLedger(sys.argv[1]).get_status(), indent=4))
+
+
+if __name__ == '__main__':
+    main()
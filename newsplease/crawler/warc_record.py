@@ -0,0 +1,34 @@
+import io
+
+from warcio.recordloader import ArcWarcRecord
+from warcio.statusandheaders import StatusAndHeaders
+
+
+def serialize_warc_record(record):
+    """
+    Converts a WARC record of an ArchiveIterator into a tuple of plain values, which can be pickled, e.g., to send it
+    to another process. The payload is read, so the record cannot be read afterwards.
+    :param record:
+    :return: A tuple, which can be passed to deserialize_warc_record
+    """
+    http_headers = None
+    if record.http_headers is not None:
+        http_headers = (record.http_headers.statusline, record.http_headers.headers, record.http_headers.protocol)
+    return (record.format, record.rec_type,
+            (record.rec_headers.statusline, record.rec_headers.headers, record.rec_headers.protocol),
+            http_headers, record.content_type, record.length, record.raw_stream.read())
+
+
+def deserialize_warc_record(serialized_record):
+    """
+    Restores a WARC record serialized with serialize_warc_record. The restored record provides the same headers and
+    content stream as the original one.
+    :param serialized_record:
+    :return: An ArcWarcRecord
+    """
+    record_format, rec_type, rec_headers, http_headers, content_type, length, payload = serialized_record
+    if http_headers is not None:
+        http_headers = StatusAndHeaders(http_headers[0], http_headers[1], protocol=http_headers[2])
+    return ArcWarcRecord(record_format, rec_type,
+                         StatusAndHeaders(rec_headers[0], rec_headers[1], protocol=rec_headers[2]),
+                         io.BytesIO(payload), http_headers, content_type, length)
@@ -0,0 +1,144 @@
+"""
+Distributes the WARC files of a crawl of commoncrawl.org across several nodes. Each WARC file is assigned to one of
+shard_count shards by a stable hash of its name, so that every node computes the same assignment without coordination.
+Optionally, nodes take leases on the WARC files in a directory on a shared filesystem, which allows idle nodes to
+steal WARC files that the node of their shard has not started yet.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# seconds after which the lease of a WARC file that was not completed expires, e.g., because its node crashed
+LEASE_TIMEOUT = 24 * 60 * 60
+
+
+def get_warc_name(warc_download_url):
+    return warc_download_url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def get_shard_index(warc_download_url, shard_count):
+    """
+    Returns the shard of a WARC file, which only depends on the name of the WARC file, not on its URL, so that all
+    nodes agree even if they use different mirrors
+    :param warc_download_url:
+    :param shard_count:
+    :return: An int in [0, shard_count)
+    """
+    digest = hashlib.md5(get_warc_name(warc_download_url).encode('utf-8')).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def assign_shards(warc_download_urls, shard_index, shard_count, steal=False):
+    """
+    Returns the WARC files that the node of shard_index processes
+    :param warc_download_urls:
+    :param shard_index:
+    :param shard_count:
+    :param steal: if True, the WARC files of the other shards follow those of shard_index in reverse order, so that they
+    are stolen from the end of the other shards while their nodes process them from the start
+    :return: A list of URLs
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError('shard_index must be in [0, %i), not %i' % (shard_count, shard_index))
+    own_urls = []
+    other_urls = []
+    for warc_download_url in warc_download_urls:
+        if get_shard_index(warc_download_url, shard_count) == shard_index:
+            own_urls.append(warc_download_url)
+        else:
+            other_urls.append(warc_download_url)
+    return own_urls + other_urls[::-1] if steal else own_urls
+
+
+class LeaseDirectory(object):
+    """
+    Leases on WARC files in a directory that is shared by all nodes. A lease is a file that is created exclusively, so
+    only one node can take it. Once the WARC file has been extracted, a marker file is added and the lease is kept
+    forever. The lease of a WARC file that is not completed expires after lease_timeout seconds and can then be taken
+    over by another node. Instances can be passed to extraction processes.
+    """
+
+    def __init__(self, path, node_id=None, lease_timeout=LEASE_TIMEOUT):
+        """
+        :param path: the shared directory, which is created if it does not exist
+        :param node_id: identifies the node, which may take its own leases again, e.g., after a restart. If None, the
+        host name is used.
+        :param lease_timeout: seconds after which an uncompleted lease expires, if None, leases never expire
+        """
+        self.path = path
+        self.node_id = node_id or socket.gethostname()
+        self.lease_timeout = lease_timeout
+        os.makedirs(path, exist_ok=True)
+
+    def __get_lease_path(self, warc_download_url):
+        return os.path.join(self.path, get_warc_name(warc_download_url) + '.lease')
+
+    def __read_owner(self, lease_path):
+        try:
+            with open(lease_path) as lease_file:
+                return json.load(lease_file).get('node')
+        except (OSError, ValueError):
+            # the lease is being written
+            return None
+
+    def __create(self, lease_path, warc_download_url):
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as lease_file:
+            json.dump({'node': self.node_id, 'pid': os.getpid(), 'url': warc_download_url,
+                       'acquired_at': time.time()}, lease_file)
+        return True
+
+    def acquire(self, warc_download_url):
+        """
+        Takes the lease of a WARC file
+        :return: True if the calling node holds the lease now, False if another node holds it or the WARC file has been
+        completed
+        """
+        lease_path = self.__get_lease_path(warc_download_url)
+        if self.__create(lease_path, warc_download_url):
+            return True
+        if os.path.exists(lease_path + '.done'):
+            return False
+        if self.__read_owner(lease_path) == self.node_id:
+            return True
+
+        if self.lease_timeout is None:
+            return False
+        try:
+            age = time.time() - os.path.getmtime(lease_path)
+        except OSError:
+            return False
+        if age < self.lease_timeout:
+            return False
+        # only one node can move the expired lease away, which then takes it
+        expired_path = '%s.expired.%s.%i' % (lease_path, self.node_id, os.getpid())
+        try:
+            os.rename(lease_path, expired_path)
+        except OSError:
+            return False
+        if time.time() - os.path.getmtime(expired_path) < self.lease_timeout:
+            # another node took over the lease in the meantime, so its new lease was moved away and is restored
+            try:
+                os.link(expired_path, lease_path)
+            except OSError:
+                pass
+            os.remove(expired_path)
+            return False
+        os.remove(expired_path)
+        LOGGER.info('taking over expired lease of %s', warc_download_url)
+        return self.__create(lease_path, warc_download_url)
+
+    def complete(self, warc_download_url):
+        """
+        Marks the WARC file as completed, so that its lease never expires
+        """
+        with open(self.__get_lease_path(warc_download_url) + '.done', 'w') as marker_file:
+            marker_file.write(self.node_id)
@@ -0,0 +1,152 @@
+import io
+import logging
+import os
+import queue
+import threading
+
+from six.moves import urllib
+
+LOGGER = logging.getLogger(__name__)
+
+# size of the chunks in which the source is read
+CHUNK_SIZE = 1024 * 1024
+# number of chunks that are read ahead, i.e., the maximum size of the buffer is MAX_BUFFERED_CHUNKS * CHUNK_SIZE
+MAX_BUFFERED_CHUNKS = 64
+# timeout in seconds of the requests of open_remote_stream
+STREAM_TIMEOUT = 60
+
+
+class ReadAheadStream(io.RawIOBase):
+    """
+    A readable stream that reads its source, e.g., the response of a HTTP request, in a background thread into a
+    bounded buffer. Hence, downloading and processing the data overlap, while the memory used for the buffer is
+    limited. Optionally, all data read from the source is also written to a file (tee), which is completed only if
+    the source was read to its end.
+    """
+
+    def __init__(self, source, tee_path=None, expected_size=None, chunk_size=CHUNK_SIZE,
+                 max_buffered_chunks=MAX_BUFFERED_CHUNKS, offset=0):
+        """
+        :param source: A readable file-like object, which is closed when this stream is closed
+        :param tee_path: if not None, the data is also written to this path. The data is written to tee_path + '.part'
+        first, which is renamed to tee_path once the source has been read completely and deleted otherwise.
+        :param expected_size: if not None, the number of bytes the source must contain, e.g., the Content-Length of a
+        response. If the source ends early, e.g., because the connection was closed, an IOError is raised.
+        :param chunk_size: size of the chunks in which the source is read
+        :param max_buffered_chunks: maximum number of chunks that are read ahead
+        :param offset: position of the first byte of source within the whole file, e.g., if source is the response of
+        a range request, so that tell() returns positions within the whole file
+        """
+        super(ReadAheadStream, self).__init__()
+        self.source = source
+        self.tee_path = tee_path
+        self.expected_size = expected_size
+        self.chunk_size = chunk_size
+        self.completed = False
+        self.bytes_read = 0
+        self.offset = offset
+
+        self.__buffer = queue.Queue(max_buffered_chunks)
+        self.__chunk = b''
+        self.__position = 0
+        self.__consumed = 0
+        self.__eof = False
+        self.__source_exhausted = False
+        self.__stopped = threading.Event()
+        self.__tee_file = open(tee_path + '.part', 'wb') if tee_path else None
+        self.__thread = threading.Thread(target=self.__read_ahead, daemon=True)
+        self.__thread.start()
+
+    def __put(self, item):
+        # the consumer may stop reading at any time, so never block forever on a full buffer
+        while not self.__stopped.is_set():
+            try:
+                self.__buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __read_ahead(self):
+        try:
+            while not self.__stopped.is_set():
+                chunk = self.source.read(self.chunk_size)
+                if self.__tee_file:
+                    self.__tee_file.write(chunk)
+                self.bytes_read += len(chunk)
+                if not chunk:
+                    if self.expected_size is not None and self.bytes_read < self.expected_size:
+                        raise IOError('source ended after %i of %i bytes' % (self.bytes_read, self.expected_size))
+                    self.__source_exhausted = True
+                if not self.__put(chunk) or not chunk:
+                    return
+        except Exception as e:
+            self.__put(e)
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.offset + self.__consumed
+
+    def readinto(self, buffer):
+        if self.__position >= len(self.__chunk):
+            if self.__eof:
+                return 0
+            item = self.__buffer.get()
+            if isinstance(item, Exception):
+                self.__eof = True
+                raise item
+            if not item:
+                self.__eof = True
+                self.completed = True
+                return 0
+            self.__chunk = item
+            self.__position = 0
+
+        size = min(len(buffer), len(self.__chunk) - self.__position)
+        buffer[:size] = self.__chunk[self.__position:self.__position + size]
+        self.__position += size
+        self.__consumed += size
+        return size
+
+    def close(self):
+        if self.closed:
+            return
+        self.__stopped.set()
+        self.__thread.join()
+        try:
+            self.source.close()
+        except Exception:
+            pass
+        if self.__tee_file:
+            self.__tee_file.close()
+            if self.__source_exhausted:
+                os.replace(self.tee_path + '.part', self.tee_path)
+            else:
+                LOGGER.info('stream was not read completely, deleting %s', self.tee_path + '.part')
+                os.remove(self.tee_path + '.part')
+        super(ReadAheadStream, self).close()
+
+
+def open_remote_stream(url, tee_path=None, timeout=STREAM_TIMEOUT, offset=0):
+    """
+    Requests the file at url and returns a ReadAheadStream of the response.
+    :param url:
+    :param tee_path: see ReadAheadStream, must be None if offset is not 0
+    :param timeout: in seconds
+    :param offset: if not 0, only the file from this position on is requested with a HTTP range request
+    :return: A ReadAheadStream
+    """
+    if offset and tee_path:
+        raise ValueError('a partial file cannot be saved locally')
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header('Range', 'bytes=%i-' % offset)
+    response = urllib.request.urlopen(request, timeout=timeout)
+    if offset and response.status != 206:
+        response.close()
+        raise IOError('range request not supported: %s' % url)
+    content_length = response.headers.get('Content-Length')
+    return ReadAheadStream(response, tee_path=tee_path, expected_size=int(content_length) if content_length else None,
+                           offset=offset)
@@ -27,15 +27,17 @@ python3 -m newsplease.examples.commoncrawl
 Note that by default the script does not extract main images since they are not contained
 WARC files. You can enable extraction of main images by setting `my_fetch_images=True`
 """
+import argparse
 import hashlib
 import json
 import logging
 import os
-import sys
 import datetime
 from datetime import date
 
 from ..crawler import commoncrawl_crawler as commoncrawl_crawler
+from ..crawler.cdx_extractor import CdxExtractor
+from ..helper_classes.parquet_sink import ParquetShardWriter
 
 __author__ = "Felix Hamborg"
 __copyright__ = "Copyright 2017"
@@ -49,6 +51,9 @@ my_local_download_dir_warc = './cc_download_warc/'
 my_local_download_dir_article = './cc_download_articles/'
 # hosts (if None or empty list, any host is OK)
 my_filter_valid_hosts = []  # example: ['elrancaguino.cl']
+# if True, an article passes the host filter if one of my_filter_valid_hosts is contained anywhere in its URL, else its
+# host must equal one of my_filter_valid_hosts or be a subdomain of one of them
+my_substring_host_match = False
 # start date (if None, any date is OK as start date), as datetime
 my_filter_start_date = None  # datetime.datetime(2016, 1, 1)
 # end date (if None, any date is OK as end date), as datetime
@@ -63,8 +68,10 @@ my_warc_files_end_date = None # example: datetime.datetime(2020, 3, 2)
 # if date filtering is strict and news-please could not detect the date of an article, the article will be discarded
 my_filter_strict_date = True
 # if True, the script checks whether a file has been downloaded already and uses that file instead of downloading
-# again. Note that there is no check whether the file has been downloaded completely or is valid!
+# again. Interrupted downloads are resumed, and only files whose size matches the listing of the WARC files are reused.
 my_reuse_previously_downloaded_files = True
+# if True, downloaded WARC files are decompressed once to verify them before they are extracted
+my_verify_gzip = False
 # continue after error
 my_continue_after_error = True
 # show the progress of downloading the WARC files
@@ -80,10 +87,60 @@ my_delete_warc_after_extraction = True
 # if True, will continue extraction from the latest fully downloaded but not fully extracted WARC files and then
 # crawling new WARC files. This assumes that the filter criteria have not been changed since the previous run!
 my_continue_process = True
+# if True, only the WARC files whose extraction failed in a previous run are extracted. The state of all WARC files is
+# recorded in warcs.sqlite in my_local_download_dir_warc, run python3 -m newsplease.crawler.warc_ledger PATH_OF_LEDGER
+# for a report.
+my_retry_failed_warcs_only = False
 # if True, will crawl and extract main image of each article. Note that the WARC files
 # do not contain any images, so that news-please will crawl the current image from
 # the articles online webpage, if this option is enabled.
 my_fetch_images = False
+# if True, each WARC file is extracted while it is downloaded instead of downloading it completely first, which saves
+# time and disk space. The WARC file is only kept on disk if my_reuse_previously_downloaded_files is True and
+# my_delete_warc_after_extraction is False.
+my_stream_warc = False
+# if True, upcoming WARC files are downloaded in the background while others are extracted. At most
+# my_prefetch_max_files files with a total size of about my_prefetch_max_bytes are kept on disk at a time.
+my_prefetch_warcs = False
+my_prefetch_max_bytes = 8 * 1024 ** 3
+my_prefetch_max_files = 8
+# if True, the records of the WARC files are read in this process and distributed to the extraction processes, so that
+# all processes stay busy even if the WARC files differ in size. my_number_of_reader_threads WARC files are read at a
+# time.
+my_distribute_records = False
+my_number_of_reader_threads = 2
+# if not 0, the position within a WARC file is saved every my_checkpoint_interval records, so that an interrupted
+# extraction resumes from there instead of from the start of the WARC file (requires my_continue_process = True)
+my_checkpoint_interval = 1000
+# if True, the articles are sent in batches of my_article_batch_size articles to this process, where
+# on_article_batch_extracted writes them, instead of invoking on_valid_article_extracted in each extraction process
+my_batch_articles = False
+my_article_batch_size = 100
+# if not None, the articles are written in batches into Parquet shards in this directory instead (requires pyarrow, see
+# ParquetShardWriter for the layout of the directory). Only shards listed in a manifest in its _SUCCESS directory are
+# complete.
+my_parquet_dir = None  # example: './cc_download_parquet/'
+# to distribute a crawl across several nodes, each node is started with the same my_shard_count and a different
+# my_shard_index in [0, my_shard_count), e.g., --shard-index 0 --shard-count 4. Each node extracts the WARC files assigned
+# to its shard by a hash of their names.
+my_shard_index = 0
+my_shard_count = 1
+# if not None, a directory on a filesystem shared by all nodes, in which the nodes take leases on the WARC files they
+# extract. Once a node has extracted the WARC files of its shard, it takes over those that other nodes have not started.
+my_lease_dir = None
+# if not None, only the records of the main crawl of commoncrawl.org that match my_cdx_url_patterns (if None, all URLs of
+# my_filter_valid_hosts and their subdomains) are fetched with range requests instead of downloading the WARC files of
+# the news crawl. The records are looked up in this URL index, i.e., a CDX server, a local CDXJ file or the columnar
+# (Parquet) index, see newsplease.crawler.cdx_extractor. Only records captured within [my_warc_files_start_date,
+# my_warc_files_end_date] are extracted.
+my_cdx_index = None  # example: 'https://index.commoncrawl.org/CC-MAIN-2024-10-index'
+my_cdx_url_patterns = None  # example: ['*.elrancaguino.cl', 'example.com/news/*']
+# if not None, records whose payload has been extracted before, e.g., re-crawls of the same article, are skipped before
+# they are decoded. The payload digests are kept in a Bloom filter in this directory, which is shared by all extraction
+# processes and later runs; delete it to extract all records again. If my_deduplicate_urls is True, records with the same
+# normalized URL are skipped, too.
+my_duplicate_filter_dir = None  # example: './cc_download_warc/duplicates/'
+my_deduplicate_urls = False
 ############ END YOUR CONFIG #########
 
 
@@ -130,6 +187,22 @@ def on_valid_article_extracted(article):
         # ...
 
 
+def on_article_batch_extracted(warc_download_url, articles, warc_completed):
+    """
+    This function will be invoked in this process for each batch of articles if my_batch_articles is True. Batches are
+    passed one at a time, so this is the only writer of the articles. Here, the articles of each WARC file are appended
+    to a single JSON lines file.
+    :param warc_download_url: the WARC file from which the articles were extracted
+    :param articles: a list of articles that were extracted successfully and that satisfy the filter criteria
+    :param warc_completed: True if this is the last batch of the WARC file
+    :return:
+    """
+    filename = hashlib.sha256(warc_download_url.encode()).hexdigest() + '.jsonl'
+    with open(os.path.join(my_local_download_dir_article, filename), 'a', encoding='utf-8') as outfile:
+        for article in articles:
+            outfile.write(json.dumps(article.__dict__, default=str, ensure_ascii=False) + '\n')
+
+
 def callback_on_warc_completed(warc_path, counter_article_passed, counter_article_discarded,
                                counter_article_error, counter_article_total, counter_warc_processed):
     """
@@ -151,22 +224,73 @@ def main():
     global my_local_download_dir_article
     global my_delete_warc_after_extraction
     global my_number_of_extraction_processes
+    global my_shard_index
+    global my_shard_count
+    global my_lease_dir
 
-    if len(sys.argv) >= 2:
-        my_local_download_dir_warc = sys.argv[1]
-    if len(sys.argv) >= 3:
-        my_local_download_dir_article = sys.argv[2]
-    if len(sys.argv) >= 4:
-        my_delete_warc_after_extraction = sys.argv[3] == "delete"
-    if len(sys.argv) >= 5:
-        my_number_of_extraction_processes = int(sys.argv[4])
+    parser = argparse.ArgumentParser(description='Extracts articles from the news crawl of commoncrawl.org.')
+    parser.add_argument('download_dir_warc', nargs='?', default=my_local_download_dir_warc)
+    parser.add_argument('download_dir_article', nargs='?', default=my_local_download_dir_article)
+    parser.add_argument('delete_warc_after_extraction', nargs='?',
+                        help='"delete" to delete each WARC file after its extraction')
+    parser.add_argument('number_of_extraction_processes', nargs='?', type=int,
+                        default=my_number_of_extraction_processes)
+    parser.add_argument('--shard-index', type=int, default=my_shard_index)
+    parser.add_argument('--shard-count', type=int, default=my_shard_count)
+    parser.add_argument('--lease-dir', default=my_lease_dir,
+                        help='directory shared by all nodes, which enables them to take over WARC files of other shards')
+    args = parser.parse_args()
+
+    my_local_download_dir_warc = args.download_dir_warc
+    my_local_download_dir_article = args.download_dir_article
+    if args.delete_warc_after_extraction is not None:
+        my_delete_warc_after_extraction = args.delete_warc_after_extraction == "delete"
+    my_number_of_extraction_processes = args.number_of_extraction_processes
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error('--shard-index must be in [0, --shard-count)')
+    my_shard_index = args.shard_index
+    my_shard_count = args.shard_count
+    my_lease_dir = args.lease_dir
 
     print("my_local_download_dir_warc=" + my_local_download_dir_warc)
     print("my_local_download_dir_article=" + my_local_download_dir_article)
     print("my_delete_warc_after_extraction=" + str(my_delete_warc_after_extraction))
     print("my_number_of_extraction_processes=" + str(my_number_of_extraction_processes))
+    print("my_shard_index=%i, my_shard_count=%i, my_lease_dir=%s" % (my_shard_index, my_shard_count, my_lease_dir))
 
     __setup__()
+    if my_cdx_index:
+        __extract_from_cdx()
+        return
+    callback_on_article_batch = on_article_batch_extracted if my_batch_articles else None
+    parquet_shard_writer = None
+    if my_parquet_dir:
+        # if records are deduplicated, a WARC file must only be done once its articles are in a complete shard
+        callback_on_article_batch = parquet_shard_writer = ParquetShardWriter(
+            my_parquet_dir, shard_per_warc=my_duplicate_filter_dir is not None)
+    try:
+        __crawl(callback_on_article_batch)
+    finally:
+        if parquet_shard_writer:
+            parquet_shard_writer.close()
+
+
+def __extract_from_cdx():
+    CdxExtractor().extract_from_cdx(my_cdx_index, on_valid_article_extracted,
+                                    url_patterns=my_cdx_url_patterns,
+                                    valid_hosts=my_filter_valid_hosts,
+                                    from_date=my_warc_files_start_date,
+                                    to_date=my_warc_files_end_date,
+                                    start_date=my_filter_start_date,
+                                    end_date=my_filter_end_date,
+                                    strict_date=my_filter_strict_date,
+                                    continue_after_error=my_continue_after_error,
+                                    log_level=my_log_level,
+                                    fetch_images=my_fetch_images,
+                                    substring_host_match=my_substring_host_match)
+
+
+def __crawl(callback_on_article_batch):
     commoncrawl_crawler.crawl_from_commoncrawl(on_valid_article_extracted,
                                                callback_on_warc_completed=callback_on_warc_completed,
                                                valid_hosts=my_filter_valid_hosts,
@@ -183,7 +307,24 @@ def main():
                                                log_level=my_log_level,
                                                delete_warc_after_extraction=my_delete_warc_after_extraction,
                                                continue_process=True,
-                                               fetch_images=my_fetch_images)
+                                               fetch_images=my_fetch_images,
+                                               stream_warc=my_stream_warc,
+                                               prefetch_warcs=my_prefetch_warcs,
+                                               prefetch_max_bytes=my_prefetch_max_bytes,
+                                               prefetch_max_files=my_prefetch_max_files,
+                                               distribute_records=my_distribute_records,
+                                               number_of_reader_threads=my_number_of_reader_threads,
+                                               substring_host_match=my_substring_host_match,
+                                               checkpoint_interval=my_checkpoint_interval,
+                                               callback_on_article_batch=callback_on_article_batch,
+                                               article_batch_size=my_article_batch_size,
+                                               retry_failed_warcs_only=my_retry_failed_warcs_only,
+                                               verify_gzip=my_verify_gzip,
+                                               shard_index=my_shard_index,
+                                               shard_count=my_shard_count,
+                                               lease_dir=my_lease_dir,
+                                               duplicate_filter_dir=my_duplicate_filter_dir,
+                                               deduplicate_urls=my_deduplicate_urls)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+"""
+A persistent Bloom filter of strings, which is kept in memory-mapped files, so that it is shared by all processes on a
+host and by consecutive runs.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import threading
+
+from newsplease.helper_classes.checkpoint import read_json, write_json_atomically
+
+try:
+    import fcntl
+except ImportError:
+    # e.g., on Windows, where concurrent updates may lose keys, which only causes false negatives
+    fcntl = None
+
+LOGGER = logging.getLogger(__name__)
+
+# number of keys for which the error rate holds
+DEFAULT_CAPACITY = 100 * 1000 ** 2
+# probability that a key that was not added is reported as added, once capacity keys have been added
+DEFAULT_ERROR_RATE = 0.001
+# number of files across which the bits are distributed, each file is locked separately when keys are added
+DEFAULT_NUMBER_OF_SHARDS = 16
+
+_PARAMETERS_FILENAME = 'bloom.json'
+
+
+class BloomFilter(object):
+    """
+    A Bloom filter whose bits are distributed across number_of_shards files in a directory. Each key is assigned to one
+    shard by its hash, so that processes adding keys to different shards do not wait for each other. Lookups read the
+    memory-mapped files without locking, while keys are added under an exclusive lock of their shard file. Each process
+    maps the files itself, so an instance can be passed to extraction processes.
+
+    The parameters are saved in the directory when it is created and are used whenever it is opened again.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE,
+                 number_of_shards=DEFAULT_NUMBER_OF_SHARDS):
+        """
+        :param path: the directory of the filter, which is created if it does not exist
+        :param capacity: number of keys for which the error rate holds
+        :param error_rate: probability of false positives once capacity keys have been added
+        :param number_of_shards: number of files
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        parameters_path = os.path.join(path, _PARAMETERS_FILENAME)
+        parameters = read_json(parameters_path)
+        if not parameters:
+            bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+            parameters = {
+                'capacity': capacity,
+                'error_rate': error_rate,
+                'number_of_shards': number_of_shards,
+                # rounded up to whole bytes
+                'bits_per_shard': int(math.ceil(bits / number_of_shards / 8.0)) * 8,
+                'number_of_hashes': max(1, int(round(bits / float(capacity) * math.log(2)))),
+            }
+            write_json_atomically(parameters_path, parameters)
+        elif (parameters['capacity'], parameters['error_rate']) != (capacity, error_rate):
+            LOGGER.info('using the capacity %i and error rate %f of the existing filter %s', parameters['capacity'],
+                        parameters['error_rate'], path)
+        self.capacity = parameters['capacity']
+        self.error_rate = parameters['error_rate']
+        self.number_of_shards = parameters['number_of_shards']
+        self.bits_per_shard = parameters['bits_per_shard']
+        self.number_of_hashes = parameters['number_of_hashes']
+        self._shards = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'path': self.path, 'capacity': self.capacity, 'error_rate': self.error_rate,
+                'number_of_shards': self.number_of_shards}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['capacity'], state['error_rate'], state['number_of_shards'])
+
+    def __get_shards(self):
+        # memory maps must not be shared with forked processes, since their locks would be shared, too
+        if self._shards is None or self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._shards = []
+            for shard_index in range(self.number_of_shards):
+                shard_path = os.path.join(self.path, 'bloom-%03i.bin' % shard_index)
+                shard_file = os.fdopen(os.open(shard_path, os.O_RDWR | os.O_CREAT), 'r+b')
+                if os.path.getsize(shard_path) < self.bits_per_shard // 8:
+                    # a sparse file, so that only the pages with bits set use disk space
+                    shard_file.truncate(self.bits_per_shard // 8)
+                self._shards.append((shard_file, mmap.mmap(shard_file.fileno(), self.bits_per_shard // 8)))
+            self._pid = os.getpid()
+        return self._shards
+
+    def __get_positions(self, key):
+        """
+        Returns the shard of key and the positions of its bits within the shard, which are derived from a single hash
+        by double hashing
+        """
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=24).digest()
+        hash_1 = int.from_bytes(digest[:8], 'little')
+        hash_2 = int.from_bytes(digest[8:16], 'little') | 1
+        shard_index = int.from_bytes(digest[16:], 'little') % self.number_of_shards
+        return shard_index, [(hash_1 + i * hash_2) % self.bits_per_shard for i in range(self.number_of_hashes)]
+
+    def __contains__(self, key):
+        shard_index, positions = self.__get_positions(key)
+        bits = self.__get_shards()[shard_index][1]
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def add(self, key):
+        self.update([key])
+
+    def update(self, keys):
+        """
+        Adds all keys, locking each shard only once
+        """
+        keys_by_shard = {}
+        for key in keys:
+            shard_index, positions = self.__get_positions(key)
+            keys_by_shard.setdefault(shard_index, []).extend(positions)
+        shards = self.__get_shards()
+        with self._lock:
+            for shard_index, positions in keys_by_shard.items():
+                shard_file, bits = shards[shard_index]
+                if fcntl is not None:
+                    fcntl.flock(shard_file, fcntl.LOCK_EX)
+                try:
+                    for position in positions:
+                        bits[position >> 3] |= 1 << (position & 7)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(shard_file, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._shards is not None and self._pid == os.getpid():
+            for shard_file, bits in self._shards:
+                bits.close()
+                shard_file.close()
+        self._shards = None
@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+
+LOGGER = logging.getLogger(__name__)
+
+
+def write_json_atomically(path, data):
+    """
+    Writes data as JSON to path. The data is written to a temporary file first, which then replaces the file at path,
+    so that the file at path is always complete, even if the process is killed while writing.
+    :param path:
+    :param data: A JSON serializable object
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    """
+    Reads a JSON file written by write_json_atomically.
+    :param path:
+    :return: The content of the file, or None if the file does not exist or cannot be parsed
+    """
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except ValueError:
+        LOGGER.warning('ignoring corrupt checkpoint: %s', path)
+        return None
+
+
+class LineCheckpoint(object):
+    """
+    Tracks which lines of a file have been processed completely. Lines may complete out of order, hence only the
+    number of lines of the longest completed prefix of the file is saved. After resuming from the checkpoint, lines
+    after this prefix may be processed again, i.e., each line is processed at least once.
+    """
+
+    def __init__(self, path, source_path):
+        """
+        :param path: path of the checkpoint file, if None, the checkpoint is not persisted
+        :param source_path: path of the processed file
+        """
+        self.path = path
+        self.source_path = os.path.abspath(source_path)
+        self.line = 0
+        self._completed = set()
+
+        data = read_json(path)
+        if data is not None:
+            if data.get('source') == self.source_path:
+                self.line = data['line']
+            else:
+                LOGGER.warning('checkpoint %s belongs to %s, starting from the beginning of %s', path,
+                               data.get('source'), self.source_path)
+
+    def complete(self, line_number):
+        """
+        Marks the line with the given (zero-based) number as completely processed.
+        :param line_number:
+        """
+        self._completed.add(line_number)
+        while self.line in self._completed:
+            self._completed.remove(self.line)
+            self.line += 1
+
+    def save(self):
+        """
+        Persists the checkpoint, if a path was given.
+        """
+        if self.path:
+            write_json_atomically(self.path, {'source': self.source_path, 'line': self.line})
@@ -0,0 +1,108 @@
+"""
+Helper class to match hosts against a large list of valid hosts, e.g., thousands of news domains.
+"""
+from functools import lru_cache
+
+from six.moves import urllib
+
+# marks the end of a host in the trie, cannot clash with a label since labels are never empty
+_END = ''
+
+
+def normalize_host(host):
+    """
+    Normalizes a host name or URL, so that it can be compared with other normalized host names: the host is lower
+    case, encoded as IDNA and has neither a scheme, port, path nor a leading or trailing dot.
+    :param host: A host name, e.g., 'www.Example.com', or a URL
+    :return: The normalized host name, or None if it is empty or invalid
+    """
+    host = host.strip()
+    if '/' in host or ':' in host:
+        try:
+            host = urllib.parse.urlparse(host if '//' in host else '//' + host).hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+    host = host.lower().strip('.')
+    if not host:
+        return None
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    return host
+
+
+class HostIndex(object):
+    """
+    An index of valid hosts. A host matches if it is one of the valid hosts or a subdomain of one of them, e.g.,
+    'sport.example.com' matches 'example.com', but 'notexample.com' does not. The normalized valid hosts are kept in a
+    set and in a trie of their reversed labels. A lookup walks the trie along the labels of the host, i.e., it costs
+    O(number of labels) regardless of the number of valid hosts.
+    """
+
+    def __init__(self, hosts):
+        """
+        :param hosts: An iterable of host names or URLs, which are normalized with normalize_host
+        """
+        self.hosts = frozenset(host for host in map(normalize_host, hosts) if host)
+        self.__trie = {}
+        for host in self.hosts:
+            node = self.__trie
+            for label in reversed(host.split('.')):
+                node = node.setdefault(label, {})
+            node[_END] = True
+
+    def __len__(self):
+        return len(self.hosts)
+
+    def __contains__(self, host):
+        return self.match(host) is not None
+
+    def match(self, host):
+        """
+        Returns the valid host that host equals or is a subdomain of
+        :param host: A normalized host name, see normalize_host
+        :return: The matching valid host with the fewest labels, or None if there is none
+        """
+        if not host:
+            return None
+        labels = host.split('.')
+        node = self.__trie
+        for depth, label in enumerate(reversed(labels)):
+            node = node.get(label)
+            if node is None:
+                return None
+            if _END in node:
+                return '.'.join(labels[len(labels) - depth - 1:])
+        return None
+
+    def match_url(self, url):
+        """
+        Returns the valid host that the host of url equals or is a subdomain of, see match
+        :param url:
+        :return: The matching valid host, or None if there is none or url is invalid
+        """
+        try:
+            host = urllib.parse.urlparse(url).hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+        return self.match(normalize_host(host))
+
+
+@lru_cache(maxsize=4)
+def _build_host_index(hosts):
+    return HostIndex(hosts)
+
+
+def get_host_index(hosts):
+    """
+    Returns a HostIndex of hosts. The index is built only once per process for the same hosts, so that it is not
+    rebuilt for each WARC file that is processed by the same process.
+    :param hosts: A list of host names
+    :return: A HostIndex
+    """
+    return _build_host_index(tuple(hosts))
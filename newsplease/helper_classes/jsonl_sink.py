@@ -0,0 +1,32 @@
+import json
+import os
+
+
+class JsonLinesSink(object):
+    """
+    Writes articles to a file, one JSON object per line. The file is opened in append mode, so that a resumed job
+    continues the file of the interrupted one. URLs that could not be crawled are not written.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, url, article):
+        if article is not None:
+            self.file.write(json.dumps(article.get_serializable_dict(), ensure_ascii=False) + '\n')
+
+    def flush(self):
+        """
+        Writes all buffered articles to disk.
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
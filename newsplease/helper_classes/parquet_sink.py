@@ -0,0 +1,273 @@
+"""
+Writes the articles extracted from commoncrawl.org into Parquet shards, so that the output of a crawl consists of a few
+large, compressed, columnar files instead of one JSON file per article.
+"""
+import datetime
+import logging
+import os
+import uuid
+
+from dateutil import parser as date_parser
+
+from newsplease.helper_classes.checkpoint import read_json, write_json_atomically
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+LOGGER = logging.getLogger(__name__)
+
+# directory within the output directory that contains the manifests of the completed WARC files
+MANIFEST_DIR = '_SUCCESS'
+# directory within the output directory that contains the shards of the WARC files at their last checkpoints
+CHECKPOINT_DIR = '_CHECKPOINTS'
+TEXT_FIELDS = ('description', 'filename', 'image_url', 'language', 'localpath', 'maintext', 'source_domain', 'text',
+               'title', 'title_page', 'title_rss', 'url')
+DATE_FIELDS = ('date_download', 'date_modify', 'date_publish')
+# columns with few distinct values, which are dictionary encoded
+DICTIONARY_FIELDS = ['warc_url', 'source_domain', 'language']
+
+
+def _get_schema():
+    return pa.schema([('warc_url', pa.string()), ('authors', pa.list_(pa.string()))] +
+                     [(field, pa.timestamp('us')) for field in DATE_FIELDS] +
+                     [(field, pa.string()) for field in TEXT_FIELDS])
+
+
+def _to_datetime(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    try:
+        return date_parser.parse(str(value))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _get_warc_name(warc_download_url):
+    name = warc_download_url.rstrip('/').rsplit('/', 1)[-1]
+    return name[:-len('.warc.gz')] if name.endswith('.warc.gz') else name
+
+
+class _Shard(object):
+    """
+    A Parquet file that is being written. It is written to a temporary file, which is renamed once the shard is
+    complete.
+    """
+
+    def __init__(self, path, schema, compression):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.writer = pq.ParquetWriter(self.tmp_path, schema, compression=compression,
+                                       use_dictionary=DICTIONARY_FIELDS)
+        self.columns = {name: [] for name in schema.names}
+        self.rows = 0
+        # number of rows of each WARC file in the shard
+        self.warc_rows = {}
+
+    def size(self):
+        return os.path.getsize(self.tmp_path)
+
+
+class ParquetShardWriter(object):
+    """
+    Writes articles into Parquet shards within output_dir. Use an instance as callback_on_article_batch of
+    crawl_from_commoncrawl. Each row contains the fields of a NewsArticle and the URL of its WARC file.
+
+    Shards are written to temporary files and renamed only once they are complete. Once all articles of a WARC file are
+    in complete shards, a manifest is written to output_dir/_SUCCESS/<name of the WARC file>.json, which lists the
+    shards and the number of rows of the WARC file in each of them. Consumers should only read shards listed in a
+    manifest. If the crawl is interrupted, the temporary files can be deleted. When the crawl is continued,
+    crawl_from_commoncrawl extracts the WARC files without manifest again, even if they are done in its ledger, see
+    get_completed_warc_urls. If records are deduplicated, their keys are added to the filter once a WARC file is done, so
+    that the records of WARC files that are extracted again are skipped as duplicates. Hence, crawl_from_commoncrawl
+    requires shard_per_warc in this case, so that a WARC file only counts as done once its manifest has been written.
+
+    If the crawl saves checkpoints, the open shards with articles of a WARC file are completed at each of its
+    checkpoints, and its complete shards are saved in output_dir/_CHECKPOINTS/<name of the WARC file>.json, so that
+    they are listed in its manifest if its extraction resumes from the checkpoint. Hence, a large checkpoint_interval
+    avoids small shards.
+    """
+
+    def __init__(self, output_dir, row_group_size=10000, max_shard_bytes=512 * 1024 ** 2, shard_per_warc=False,
+                 compression='zstd'):
+        """
+        :param output_dir:
+        :param row_group_size: number of rows per row group. Rows are kept in memory until a row group is full.
+        :param max_shard_bytes: a new shard is started once a shard has reached this size
+        :param shard_per_warc: if True, each shard only contains the articles of one WARC file and is completed with the
+        WARC file, else the articles of all WARC files are written to the same shard until it is full
+        :param compression: compression of the columns, e.g., 'zstd', 'snappy', 'gzip' or None
+        """
+        if pa is None:
+            raise ModuleNotFoundError("Using ParquetShardWriter requires pyarrow")
+        self.output_dir = output_dir
+        self.row_group_size = row_group_size
+        self.max_shard_bytes = max_shard_bytes
+        self.shard_per_warc = shard_per_warc
+        self.compression = compression
+        self.schema = _get_schema()
+        # the open shard for each WARC file if shard_per_warc, else for None
+        self.shards = {}
+        # the completed shards of each WARC file whose manifest has not been written yet
+        self.warc_shards = {}
+        # the WARC files that have been completed, but whose articles are still in open shards
+        self.completed_warcs = set()
+        os.makedirs(os.path.join(output_dir, MANIFEST_DIR), exist_ok=True)
+        os.makedirs(os.path.join(output_dir, CHECKPOINT_DIR), exist_ok=True)
+
+    def __call__(self, warc_download_url, articles, warc_completed):
+        """
+        Adds a batch of articles, see crawl_from_commoncrawl
+        """
+        if articles:
+            shard = self.__get_shard(warc_download_url)
+            for article in articles:
+                shard.columns['warc_url'].append(warc_download_url)
+                shard.columns['authors'].append(list(article.authors) if article.authors else [])
+                for field in DATE_FIELDS:
+                    shard.columns[field].append(_to_datetime(getattr(article, field)))
+                for field in TEXT_FIELDS:
+                    value = getattr(article, field)
+                    shard.columns[field].append(str(value) if value is not None else None)
+            shard.warc_rows[warc_download_url] = shard.warc_rows.get(warc_download_url, 0) + len(articles)
+            self.warc_shards.setdefault(warc_download_url, [])
+
+            while len(shard.columns['url']) >= self.row_group_size:
+                self.__write_row_group(shard, self.row_group_size)
+            if shard.rows and shard.size() >= self.max_shard_bytes:
+                self.__complete_shard(shard)
+
+        if warc_completed:
+            self.completed_warcs.add(warc_download_url)
+            if self.shard_per_warc and warc_download_url in self.shards:
+                self.__complete_shard(self.shards[warc_download_url])
+            elif not any(warc_download_url in shard.warc_rows for shard in self.shards.values()):
+                self.__write_manifest(warc_download_url)
+
+    def save_checkpoint(self, warc_download_url, offset):
+        """
+        Completes the open shards with articles of a WARC file and saves its complete shards for the checkpoint at
+        offset, see crawl_from_commoncrawl. The shards of the previous checkpoint are kept, since the extraction
+        resumes from there if it is interrupted before the new checkpoint has been saved.
+        """
+        for shard in list(self.shards.values()):
+            if warc_download_url in shard.warc_rows:
+                self.__complete_shard(shard)
+        checkpoints = self.__read_checkpoints(warc_download_url)[-1:]
+        checkpoints.append({'offset': offset, 'shards': list(self.warc_shards.get(warc_download_url, []))})
+        write_json_atomically(self.__get_checkpoint_path(warc_download_url),
+                              {'warc_url': warc_download_url, 'checkpoints': checkpoints})
+
+    def resume_warc(self, warc_download_url, offset):
+        """
+        Restores the complete shards of a WARC file at the checkpoint from which its extraction resumes, see
+        crawl_from_commoncrawl
+        :param offset: the offset of the checkpoint, 0 if the extraction starts from the beginning
+        """
+        checkpoints = [checkpoint for checkpoint in self.__read_checkpoints(warc_download_url)
+                       if checkpoint['offset'] == offset]
+        if offset and not checkpoints:
+            LOGGER.warning('no shards saved at offset %i of %s, the articles before are missing', offset,
+                           warc_download_url)
+        self.warc_shards[warc_download_url] = list(checkpoints[0]['shards']) if checkpoints else []
+        if checkpoints:
+            write_json_atomically(self.__get_checkpoint_path(warc_download_url),
+                                  {'warc_url': warc_download_url, 'checkpoints': checkpoints})
+        else:
+            self.__remove_checkpoints(warc_download_url)
+
+    def __get_checkpoint_path(self, warc_download_url):
+        return os.path.join(self.output_dir, CHECKPOINT_DIR, _get_warc_name(warc_download_url) + '.json')
+
+    def __read_checkpoints(self, warc_download_url):
+        checkpoints = read_json(self.__get_checkpoint_path(warc_download_url))
+        if not checkpoints or checkpoints['warc_url'] != warc_download_url:
+            return []
+        return checkpoints['checkpoints']
+
+    def __remove_checkpoints(self, warc_download_url):
+        try:
+            os.remove(self.__get_checkpoint_path(warc_download_url))
+        except OSError:
+            pass
+
+    def get_completed_warc_urls(self):
+        """
+        :return: A set of the URLs of the WARC files that have a manifest, i.e., whose articles are all in complete shards
+        """
+        manifest_dir = os.path.join(self.output_dir, MANIFEST_DIR)
+        warc_urls = set()
+        for name in os.listdir(manifest_dir):
+            if name.endswith('.json'):
+                manifest = read_json(os.path.join(manifest_dir, name))
+                if manifest:
+                    warc_urls.add(manifest['warc_url'])
+        return warc_urls
+
+    def __get_shard(self, warc_download_url):
+        key = warc_download_url if self.shard_per_warc else None
+        shard = self.shards.get(key)
+        if shard is None:
+            if self.shard_per_warc:
+                name = '%s-%s.parquet' % (_get_warc_name(warc_download_url), uuid.uuid4().hex[:8])
+            else:
+                name = 'part-%s.parquet' % uuid.uuid4().hex
+            shard = _Shard(os.path.join(self.output_dir, name), self.schema, self.compression)
+            self.shards[key] = shard
+        return shard
+
+    def __write_row_group(self, shard, rows=None):
+        """
+        Writes the first rows buffered rows of shard as a row group, if None, all of them
+        """
+        rows = rows or len(shard.columns['url'])
+        if not rows:
+            return
+        table = pa.Table.from_pydict({name: column[:rows] for name, column in shard.columns.items()},
+                                     schema=self.schema)
+        shard.writer.write_table(table, row_group_size=rows)
+        shard.rows += rows
+        for column in shard.columns.values():
+            del column[:rows]
+
+    def __complete_shard(self, shard):
+        """
+        Writes the remaining rows of shard, renames it and writes the manifests of the completed WARC files whose
+        articles are all in complete shards now
+        """
+        self.__write_row_group(shard)
+        shard.writer.close()
+        os.replace(shard.tmp_path, shard.path)
+        LOGGER.info('completed shard %s with %i rows', shard.path, shard.rows)
+        self.shards = {key: open_shard for key, open_shard in self.shards.items() if open_shard is not shard}
+
+        for warc_download_url, rows in shard.warc_rows.items():
+            self.warc_shards[warc_download_url].append({'path': os.path.basename(shard.path), 'rows': rows})
+        for warc_download_url in shard.warc_rows:
+            if warc_download_url in self.completed_warcs and \
+                    not any(warc_download_url in open_shard.warc_rows for open_shard in self.shards.values()):
+                self.__write_manifest(warc_download_url)
+
+    def __write_manifest(self, warc_download_url):
+        shards = self.warc_shards.pop(warc_download_url, [])
+        self.completed_warcs.discard(warc_download_url)
+        write_json_atomically(os.path.join(self.output_dir, MANIFEST_DIR, _get_warc_name(warc_download_url) + '.json'),
+                              {'warc_url': warc_download_url, 'rows': sum(shard['rows'] for shard in shards),
+                               'shards': shards})
+        self.__remove_checkpoints(warc_download_url)
+
+    def close(self):
+        """
+        Completes all open shards, which also writes the manifests of all completed WARC files
+        """
+        for shard in list(self.shards.values()):
+            self.__complete_shard(shard)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -4,29 +4,65 @@ import logging
 
 from .cleaner import Cleaner
 from .comparer.comparer import Comparer
+from .execution_planner import ExecutionPlanner
 from .extractors.abstract_extractor import AbstractExtractor
 
+# fields of NewsArticle that are determined by the extractors and the corresponding fields of ArticleCandidate
+EXTRACTED_FIELDS = {
+    'authors': 'author',
+    'date_publish': 'publish_date',
+    'description': 'description',
+    'image_url': 'topimage',
+    'language': 'language',
+    'maintext': 'text',
+    'title': 'title',
+}
+# fields of NewsArticle that are available without running any extractor
+OTHER_FIELDS = {'date_download', 'date_modify', 'filename', 'localpath', 'source_domain', 'text', 'title_page',
+                'title_rss', 'url'}
+
+
+def to_candidate_fields(fields):
+    """Converts names of NewsArticle fields to the names of the ArticleCandidate fields the extractors need to provide.
+
+    :param fields: Iterable of NewsArticle field names, or None for all fields
+    :return: A frozenset of ArticleCandidate field names, or None for all fields
+    """
+    if fields is None:
+        return None
+    unknown_fields = set(fields) - set(EXTRACTED_FIELDS) - OTHER_FIELDS
+    if unknown_fields:
+        raise ValueError('Unknown article fields: %s' % ', '.join(sorted(unknown_fields)))
+    return frozenset(EXTRACTED_FIELDS[field] for field in fields if field in EXTRACTED_FIELDS)
+
 
 class Extractor:
     """This class initializes all extractors and saves the results of them. When adding a new extractor, it needs to
     be initialized here and added to list_extractor.
     """
 
-    def __init__(self, extractor_list):
+    def __init__(self, extractor_list, fields=None):
         """
         Initializes all the extractors, comparers and the cleaner.
 
         :param extractor_list: List of strings containing all extractors to be initialized.
+        :param fields: List of NewsArticle fields that shall be extracted, or None to extract all fields. Extractors
+        that cannot provide any of these fields are not initialized.
         """
         def proc_instance(instance):
-            if instance is not None:
-                self.log.info('Extractor initialized: %s', extractor)
-                self.extractor_list.append(instance)
-            else:
+            if instance is None:
                 self.log.error("Misconfiguration: An unknown Extractor was found and"
                                " will be ignored: %s", extractor)
+            elif self.fields is not None and instance.candidate_fields is not None \
+                    and not self.fields & instance.candidate_fields:
+                self.log.info('Extractor skipped, since it provides none of the requested fields: %s', extractor)
+            else:
+                self.log.info('Extractor initialized: %s', extractor)
+                instance.requested_fields = self.fields
+                self.extractor_list.append(instance)
 
         self.log = logging.getLogger(__name__)
+        self.fields = to_candidate_fields(fields)
         self.extractor_list = []
         for extractor in extractor_list:
 
@@ -47,6 +83,7 @@ class Extractor:
                         # instantiate extractor
                         proc_instance(getattr(module, member[0], None)())
 
+        self.planner = ExecutionPlanner(self.extractor_list, self.fields)
         self.cleaner = Cleaner()
         self.comparer = Comparer()
 
@@ -57,14 +94,11 @@ class Extractor:
         :return: An updated NewscrawlerItem including the results of the extraction
         """
 
-        article_candidates = []
-
-        for extractor in self.extractor_list:
-            article_candidate = extractor.extract(item)
-            article_candidates.append(article_candidate)
+        article_candidates, skipped_extractors = self.planner.run(item)
+        item['skipped_extractors'] = skipped_extractors
 
         article_candidates = self.cleaner.clean(article_candidates)
-        article = self.comparer.compare(item, article_candidates)
+        article = self.comparer.compare(item, article_candidates, self.fields)
 
         item['article_title'] = article.title
         item['article_description'] = article.description
@@ -74,4 +108,8 @@ class Extractor:
         item['article_publish_date'] = article.publish_date
         item['article_language'] = article.language
 
+        # the parsed document is only needed during the extraction
+        if 'parsed_document' in item:
+            del item['parsed_document']
+
         return item
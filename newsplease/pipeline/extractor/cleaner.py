@@ -27,6 +27,9 @@ class Cleaner:
         """
 
         if len(arg) > 0:
+            # without tags and entities there is nothing to parse
+            if '<' not in arg and '&' not in arg and '\r' not in arg:
+                return arg.strip()
             try:
                 raw = html.fromstring(arg)
             except ValueError:
@@ -0,0 +1,69 @@
+import logging
+import threading
+from collections import Counter
+
+
+class ExecutionPlanner:
+    """This class decides in which order the extractors are run and which of them can be skipped. Cheap extractors are
+    run first. If they resolve all fields an expensive extractor could contribute to with high confidence, i.e., the
+    comparers would use their values without considering the other extractors, the expensive extractor is skipped.
+    """
+
+    def __init__(self, extractor_list, fields=None):
+        """
+        :param extractor_list: List of initialized extractors in the configured order.
+        :param fields: A set of the requested ArticleCandidate fields, or None if all fields are requested.
+        """
+        self.log = logging.getLogger(__name__)
+        self.extractor_list = extractor_list
+        self.fields = fields
+        # sorted is stable, so extractors of equal cost keep their configured order
+        self.execution_order = sorted(range(len(extractor_list)), key=lambda index: extractor_list[index].cost)
+        # how often each extractor was skipped, to audit the tradeoff between speed and quality
+        self.skip_counts = Counter()
+        self.lock = threading.Lock()
+
+    def _is_resolved(self, extractor, resolved_fields):
+        """Checks if all fields the extractor could contribute to are already resolved.
+
+        :param extractor: The extractor to check
+        :param resolved_fields: A set of the ArticleCandidate fields that are resolved
+        :return: True if the extractor can be skipped
+        """
+        if extractor.candidate_fields is None:
+            return False
+        contributing_fields = extractor.candidate_fields
+        if self.fields is not None:
+            contributing_fields = contributing_fields & self.fields
+        return contributing_fields <= resolved_fields
+
+    def run(self, item):
+        """Runs the extractors on the given item according to the plan.
+
+        :param item: NewscrawlerItem to be processed.
+        :return: A tuple of the list of ArticleCandidates in the configured order of the extractors and the list of
+        the names of the skipped extractors
+        """
+        article_candidates = [None] * len(self.extractor_list)
+        resolved_fields = set()
+        skipped_extractors = []
+
+        for index in self.execution_order:
+            extractor = self.extractor_list[index]
+            if resolved_fields and self._is_resolved(extractor, resolved_fields):
+                skipped_extractors.append(extractor.name)
+                continue
+
+            article_candidate = extractor.extract(item)
+            article_candidates[index] = article_candidate
+            for field in extractor.authoritative_fields:
+                if getattr(article_candidate, field) is not None:
+                    resolved_fields.add(field)
+
+        if skipped_extractors:
+            self.log.debug('%s: skipped extractors %s', item.get('url'), skipped_extractors)
+            with self.lock:
+                self.skip_counts.update(skipped_extractors)
+
+        return [article_candidate for article_candidate in article_candidates if article_candidate is not None], \
+            skipped_extractors
@@ -1,6 +1,7 @@
 from abc import ABCMeta, abstractmethod
 
 from ..article_candidate import ArticleCandidate
+from ..parsed_document import ParsedDocument
 
 
 class AbstractExtractor:
@@ -9,6 +10,15 @@ class AbstractExtractor:
 
     __metaclass__ = ABCMeta
 
+    # fields of ArticleCandidate this extractor can provide, None if unknown
+    candidate_fields = None
+    # fields of ArticleCandidate requested by the Extractor, None if all fields are requested
+    requested_fields = None
+    # relative cost of running the extractor, cheaper extractors are run first
+    cost = 5
+    # fields of ArticleCandidate the comparers take from this extractor without considering other extractors
+    authoritative_fields = frozenset()
+
     @abstractmethod
     def __init__(self):
         self.name = None
@@ -17,6 +27,15 @@ class AbstractExtractor:
         """Returns the name of the article extractor."""
         return self.name
 
+    def _is_requested(self, field):
+        """Returns True if the given field of ArticleCandidate shall be extracted."""
+        return self.requested_fields is None or field in self.requested_fields
+
+    def _parsed_document(self, item):
+        """Returns the ParsedDocument of the item's HTML-response, which is shared by all extractors and must not be
+        modified."""
+        return ParsedDocument.of(item)
+
     def _language(self, item):
         """Returns the language of the extracted article."""
         return None
@@ -55,12 +74,19 @@ class AbstractExtractor:
 
         article_candidate = ArticleCandidate()
         article_candidate.extractor = self._name()
-        article_candidate.title = self._title(item)
-        article_candidate.description = self._description(item)
-        article_candidate.text = self._text(item)
-        article_candidate.topimage = self._topimage(item)
-        article_candidate.author = self._author(item)
-        article_candidate.publish_date = self._publish_date(item)
-        article_candidate.language = self._language(item)
+        if self._is_requested('title'):
+            article_candidate.title = self._title(item)
+        if self._is_requested('description'):
+            article_candidate.description = self._description(item)
+        if self._is_requested('text'):
+            article_candidate.text = self._text(item)
+        if self._is_requested('topimage'):
+            article_candidate.topimage = self._topimage(item)
+        if self._is_requested('author'):
+            article_candidate.author = self._author(item)
+        if self._is_requested('publish_date'):
+            article_candidate.publish_date = self._publish_date(item)
+        if self._is_requested('language'):
+            article_candidate.language = self._language(item)
 
         return article_candidate
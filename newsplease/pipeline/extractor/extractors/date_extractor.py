@@ -1,11 +1,9 @@
-import json
 import re
-from copy import deepcopy
 
-from bs4 import BeautifulSoup
 from dateutil.parser import parse
 
 from .abstract_extractor import AbstractExtractor
+from ..parsed_document import ParsedDocument
 
 try:
     import urllib.request as urllib2
@@ -24,6 +22,9 @@ class DateExtractor(AbstractExtractor):
     a subclass of ExtractorInterface.
     """
 
+    candidate_fields = frozenset(['publish_date'])
+    cost = 2
+
     def __init__(self):
         self.name = "date_extractor"
 
@@ -31,24 +32,23 @@ class DateExtractor(AbstractExtractor):
         """Returns the publish_date of the extracted article."""
 
         url = item['url']
-        html = deepcopy(item['spider_response'].body)
         publish_date = None
 
         try:
-            if html is None:
+            if item['spider_response'].body is None:
                 request = urllib2.Request(url)
                 # Using a browser user agent, decreases the change of sites blocking this request - just a suggestion
                 # request.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 6.1) AppleWebKit/537.36 (KHTML, like Gecko)
                 # Chrome/41.0.2228.0 Safari/537.36')
-                html = urllib2.build_opener().open(request).read()
-
-            html = BeautifulSoup(html, "lxml")
+                document = ParsedDocument(urllib2.build_opener().open(request).read())
+            else:
+                document = self._parsed_document(item)
 
-            publish_date = self._extract_from_json(html)
+            publish_date = self._extract_from_json(document)
             if publish_date is None:
-                publish_date = self._extract_from_meta(html)
+                publish_date = self._extract_from_meta(document.tree)
             if publish_date is None:
-                publish_date = self._extract_from_html_tag(html)
+                publish_date = self._extract_from_html_tag(document.tree)
             if publish_date is None:
                 publish_date = self._extract_from_url(url)
         except Exception as e:
@@ -57,6 +57,15 @@ class DateExtractor(AbstractExtractor):
 
         return publish_date
 
+    def _element_string(self, element):
+        """Returns the text of an element if it is its only content (or the only content of its only child element),
+        else None."""
+        if len(element) == 0:
+            return element.text
+        if len(element) == 1 and not element.text and not element[0].tail:
+            return self._element_string(element[0])
+        return None
+
     def parse_date_str(self, date_string):
         try:
             date = parse(date_string)
@@ -73,14 +82,13 @@ class DateExtractor(AbstractExtractor):
             return self.parse_date_str(m.group(0))
         return None
 
-    def _extract_from_json(self, html):
+    def _extract_from_json(self, document):
         date = None
         try:
-            script = html.find('script', type='application/ld+json')
-            if script is None:
+            if not document.ldjson:
                 return None
 
-            data = json.loads(script.string)
+            data = document.ldjson[0]
 
             try:
                 date = self.parse_date_str(data['datePublished'])
@@ -96,9 +104,9 @@ class DateExtractor(AbstractExtractor):
 
         return date
 
-    def _extract_from_meta(self, html):
+    def _extract_from_meta(self, root):
         date = None
-        for meta in html.findAll("meta"):
+        for meta in root.iter("meta"):
             meta_name = meta.get('name', '').lower()
             item_prop = meta.get('itemprop', '').lower()
             http_equiv = meta.get('http-equiv', '').lower()
@@ -106,93 +114,93 @@ class DateExtractor(AbstractExtractor):
 
             # <meta name="pubdate" content="2015-11-26T07:11:02Z" >
             if 'pubdate' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name='publishdate' content='201511261006'/>
             if 'publishdate' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="timestamp"  data-type="date" content="2015-11-25 22:40:25" />
             if 'timestamp' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="DC.date.issued" content="2015-11-26">
             if 'dc.date.issued' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta property="article:published_time"  content="2015-11-25" />
             if 'article:published_time' == meta_property:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
                 # <meta name="Date" content="2015-11-26" />
             if 'date' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta property="bt:pubDate" content="2015-11-26T00:10:33+00:00">
             if 'bt:pubdate' == meta_property:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
                 # <meta name="sailthru.date" content="2015-11-25T19:56:04+0000" />
             if 'sailthru.date' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="article.published" content="2015-11-26T11:53:00.000Z" />
             if 'article.published' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="published-date" content="2015-11-26T11:53:00.000Z" />
             if 'published-date' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="article.created" content="2015-11-26T11:53:00.000Z" />
             if 'article.created' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="article_date_original" content="Thursday, November 26, 2015,  6:42 AM" />
             if 'article_date_original' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="cXenseParse:recs:publishtime" content="2015-11-26T14:42Z"/>
             if 'cxenseparse:recs:publishtime' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta name="DATE_PUBLISHED" content="11/24/2015 01:05AM" />
             if 'date_published' == meta_name:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta itemprop="datePublished" content="2015-11-26T11:53:00.000Z" />
             if 'datepublished' == item_prop:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta itemprop="datePublished" content="2015-11-26T11:53:00.000Z" />
             if 'datecreated' == item_prop:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
             # <meta property="og:image" content="http://www.dailytimes.com.pk/digital
             # _images/400/2015-11-26/norway-return-number-of-asylum-seekers-to-pakistan-1448538771-7363.jpg"/>
             if 'og:image' == meta_property or "image" == item_prop:
-                url = meta['content'].strip()
+                url = meta.attrib['content'].strip()
                 possible_date = self._extract_from_url(url)
                 if possible_date is not None:
                     return self.parse_date_str(possible_date)
 
             # <meta http-equiv="data" content="10:27:15 AM Thursday, November 26, 2015">
             if 'date' == http_equiv:
-                date = meta['content'].strip()
+                date = meta.attrib['content'].strip()
                 break
 
         if date is not None:
@@ -200,32 +208,31 @@ class DateExtractor(AbstractExtractor):
 
         return None
 
-    def _extract_from_html_tag(self, html):
+    def _extract_from_html_tag(self, root):
         # <time>
-        for time in html.findAll("time"):
+        for time in root.iter("time"):
             datetime = time.get('datetime', '')
             if len(datetime) > 0:
                 return self.parse_date_str(datetime)
 
-            datetime = time.get('class', '')
+            datetime = time.get('class', '').split()
             if len(datetime) > 0 and datetime[0].lower() == "timestamp":
-                return self.parse_date_str(time.string)
+                return self.parse_date_str(self._element_string(time))
 
-        tag = html.find("span", {"itemprop": "datePublished"})
-        if tag is not None:
-            date_string = tag.get("content")
+        tags = root.xpath('//span[@itemprop="datePublished"]')
+        if tags:
+            date_string = tags[0].get("content")
             if date_string is None:
-                date_string = tag.text
+                date_string = tags[0].text_content()
             if date_string is not None:
                 return self.parse_date_str(date_string)
 
         # class=
-        for tag in html.find_all(['span', 'p', 'div'], class_=re_class):
-            date_string = tag.string
-            if date_string is None:
-                date_string = tag.text
+        for tag in root.iter('span', 'p', 'div'):
+            if not re_class.search(tag.get('class', '')):
+                continue
 
-            date = self.parse_date_str(date_string)
+            date = self.parse_date_str(tag.text_content())
 
             if date is not None:
                 return date
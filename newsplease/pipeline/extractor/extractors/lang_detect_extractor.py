@@ -3,8 +3,6 @@ import re
 
 from langdetect import detect
 from langdetect.lang_detect_exception import LangDetectException
-from lxml import html
-
 from .abstract_extractor import AbstractExtractor
 
 
@@ -14,6 +12,9 @@ class LangExtractor(AbstractExtractor):
 
     """
 
+    candidate_fields = frozenset(['language'])
+    cost = 3
+
     def __init__(self):
         self.name = "langdetect"
         self.langcode_pattern = re.compile(r'\b[a-zA-Z]{2}(?=([-_]|\b))')
@@ -22,11 +23,7 @@ class LangExtractor(AbstractExtractor):
         """Returns the language of the extracted article by analyzing metatags and inspecting the visible text
         with langdetect"""
 
-        response = item['spider_response'].body
-        try:
-            root = html.fromstring(response)
-        except ValueError:
-            root = html.fromstring(response.encode("utf-8"))
+        root = self._parsed_document(item).tree
 
         # Check for lang-attributes
         lang = root.get('lang')
@@ -1,8 +1,5 @@
 from .abstract_extractor import AbstractExtractor
 from ..article_candidate import ArticleCandidate
-from bs4 import BeautifulSoup
-from bs4.element import Tag
-import json
 from dateutil.parser import parse
 import re
 
@@ -14,6 +11,11 @@ class LdjsonExtractor(AbstractExtractor):
     """
     # TODO Move the ldjson extraction to helpers since it is also used in heuristics and is duplicate
 
+    candidate_fields = frozenset(['title', 'description', 'topimage', 'author', 'publish_date', 'language'])
+    cost = 1
+    # the comparers return the ldjson value of these fields if there is one
+    authoritative_fields = frozenset(['title', 'description', 'topimage', 'author', 'publish_date'])
+
     def __init__(self):
         self.name = "ldjson"
 
@@ -27,13 +29,12 @@ class LdjsonExtractor(AbstractExtractor):
         article_candidate = ArticleCandidate()
         article_candidate.extractor = self._name()
 
-        soup = BeautifulSoup(item['spider_response'].body, parser="lxml", features="lxml")
-        ldjson_candidates = soup.select('script[type="application/ld+json"]')
+        # copy the list of the shared document, since @graph contents are appended to it
+        parsed_ldjson = list(self._parsed_document(item).ldjson)
 
-        if not ldjson_candidates:
+        if not parsed_ldjson:
             return article_candidate
 
-        parsed_ldjson = [self._map_ldjson(ldjson_tag) for ldjson_tag in ldjson_candidates]
         for single_ldjson in parsed_ldjson:
             if hasattr(single_ldjson, '__contains__') and "@graph" in single_ldjson:
                 if isinstance(single_ldjson["@graph"], list):
@@ -41,7 +42,7 @@ class LdjsonExtractor(AbstractExtractor):
                 elif isinstance(single_ldjson["@graph"], dict):
                     parsed_ldjson.append(single_ldjson["@graph"])
         filtered_ldjson = [ldjson for ldjson in parsed_ldjson
-                           if "@type" in ldjson and ldjson["@type"] in ["NewsArticle", "Article"]]
+                           if hasattr(ldjson, '__contains__') and "@type" in ldjson and ldjson["@type"] in ["NewsArticle", "Article"]]
 
         if not filtered_ldjson:
             return article_candidate
@@ -87,10 +88,3 @@ class LdjsonExtractor(AbstractExtractor):
                 parts = re.split("GMT\\+\\d{4}", datestring)
                 return parse(parts[0] + "T" + parts[1])
             return None
-
-    @staticmethod
-    def _map_ldjson(ldjson_tag: Tag):
-        try:
-            return json.loads(ldjson_tag.encode_contents())
-        except json.JSONDecodeError:
-            return None
@@ -11,6 +11,9 @@ class NewspaperExtractor(AbstractExtractor):
     a subclass of ExtractorsInterface
     """
 
+    candidate_fields = frozenset(['title', 'description', 'text', 'topimage', 'author', 'publish_date', 'language'])
+    cost = 10
+
     def __init__(self):
         self.log = logging.getLogger(__name__)
         self.name = "newspaper"
@@ -29,8 +32,11 @@ class NewspaperExtractor(AbstractExtractor):
         article_candidate.extractor = self._name()
 
         article = Article('', **self._article_kwargs())
-        article.set_html(item['spider_response'].body)
-        article.parse()
+        if self._is_requested('text') or self._is_requested('topimage'):
+            article.set_html(item['spider_response'].body)
+            article.parse()
+        else:
+            self._parse_metadata(article, item)
         article_candidate.title = article.title
         article_candidate.description = article.meta_description
         article_candidate.text = article.text
@@ -45,3 +51,18 @@ class NewspaperExtractor(AbstractExtractor):
         article_candidate.language = article.meta_lang
 
         return article_candidate
+
+    def _parse_metadata(self, article, item):
+        """Sets only the meta data of the article, as Article.parse does, but without cleaning the document and
+        without extracting the text and images, which is the costly part of parse.
+
+        :param article: The Article to set the meta data of
+        :param item: A NewscrawlerItem to parse.
+        """
+        # the methods of the content extractor used here do not modify the shared document
+        doc = self._parsed_document(item).tree
+        article.set_title(article.extractor.get_title(doc))
+        article.set_authors(article.extractor.get_authors(doc))
+        article.set_meta_language(article.extractor.get_meta_lang(doc))
+        article.set_meta_description(article.extractor.get_meta_description(doc))
+        article.publish_date = article.extractor.get_publishing_date(article.url, doc)
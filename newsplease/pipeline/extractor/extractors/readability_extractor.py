@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from readability import Document
 
 from .abstract_extractor import AbstractExtractor
@@ -12,6 +10,9 @@ class ReadabilityExtractor(AbstractExtractor):
 
     """
 
+    candidate_fields = frozenset(['title', 'description'])
+    cost = 8
+
     def __init__(self):
         self.name = "readability"
 
@@ -22,13 +23,16 @@ class ReadabilityExtractor(AbstractExtractor):
         :return: ArticleCandidate containing the recovered article data.
         """
 
-        doc = Document(deepcopy(item['spider_response'].body))
-        description = doc.summary()
+        # readability modifies the tree it works on, so it cannot use the shared ParsedDocument
+        doc = Document(item['spider_response'].body)
 
         article_candidate = ArticleCandidate()
         article_candidate.extractor = self._name
-        article_candidate.title = doc.short_title()
-        article_candidate.description = description
+        if self._is_requested('title'):
+            article_candidate.title = doc.short_title()
+        # the summary is the expensive part of readability
+        if self._is_requested('description'):
+            article_candidate.description = doc.summary()
         article_candidate.text = self._text(item)
         article_candidate.topimage = self._topimage(item)
         article_candidate.author = self._author(item)
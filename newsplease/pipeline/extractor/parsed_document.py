@@ -0,0 +1,58 @@
+import json
+
+from lxml import html
+
+
+class ParsedDocument:
+    """Parses the HTML-response of an item only once and provides the parsed tree as well as views derived from it to
+    all extractors. The views are created lazily, i.e., only if an extractor requests them. The tree is shared by all
+    extractors, hence extractors must not modify it (make a deepcopy if necessary).
+    """
+
+    def __init__(self, body):
+        """
+        :param body: The HTML-response, either as string or bytes
+        """
+        self.body = body
+        self._tree = None
+        self._ldjson = None
+
+    @staticmethod
+    def of(item):
+        """Returns the ParsedDocument of the given item. It is created and cached within the item on first access.
+
+        :param item: A NewscrawlerItem
+        :return: The ParsedDocument of the item's HTML-response
+        """
+        document = item.get('parsed_document')
+        if document is None:
+            document = ParsedDocument(item['spider_response'].body)
+            item['parsed_document'] = document
+        return document
+
+    @property
+    def tree(self):
+        """The root element of the lxml tree of the document."""
+        if self._tree is None:
+            try:
+                self._tree = html.fromstring(self.body)
+            except ValueError:
+                # strings containing an encoding declaration cannot be parsed, but their utf-8 encoding can
+                self._tree = html.fromstring(self.body.encode("utf-8"))
+        return self._tree
+
+    @property
+    def ldjson(self):
+        """A list containing the parsed content of each ld+json script of the document in document order. Scripts that
+        cannot be parsed are represented by None."""
+        if self._ldjson is None:
+            self._ldjson = [self._load_json(script.text)
+                            for script in self.tree.xpath('//script[@type="application/ld+json"]')]
+        return self._ldjson
+
+    @staticmethod
+    def _load_json(text):
+        try:
+            return json.loads(text)
+        except (ValueError, TypeError):
+            return None
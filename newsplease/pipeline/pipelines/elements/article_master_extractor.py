@@ -15,8 +15,9 @@ class ArticleMasterExtractor(object):
         self.cfg = CrawlerConfig.get_instance()
         self.extractor_list = self.cfg.section("ArticleMasterExtractor")[
             "extractors"]
+        self.fields = self.cfg.section("ArticleMasterExtractor").get("fields")
 
-        self.extractor = article_extractor.Extractor(self.extractor_list)
+        self.extractor = article_extractor.Extractor(self.extractor_list, fields=self.fields)
 
     def process_item(self, item, spider):
         return self.extractor.extract(item)
\ No newline at end of file
@@ -2,6 +2,7 @@ import logging
 
 from dateutil import parser as dateparser
 
+from newsplease.NewsArticle import NewsArticle
 from newsplease.config import CrawlerConfig
 
 
@@ -48,7 +48,6 @@ news-please is an open source, easy-to-use news crawler that extracts structured
           'ago>=0.0.9',
           'six>=1.10.0',
           'lxml>=3.3.5',
-          'awscli>=1.11.117',
           'hurry.filesize>=0.9',
           'bs4',
           'cchardet>=2.1.7'
@@ -56,6 +55,12 @@ news-please is an open source, easy-to-use news crawler that extracts structured
       extras_require={
           ':sys_platform == "win32"': [
               'pywin32>=220'
+          ],
+          'async': [
+              'aiohttp>=3.7'
+          ],
+          'parquet': [
+              'pyarrow>=1.0'
           ]
       },
       entry_points={
@@ -0,0 +1,154 @@
+"""
+Fixtures shared by the tests, i.e., small WARC files and a local HTTP server that supports range requests
+"""
+import io
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from warcio.archiveiterator import ArchiveIterator
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+ARTICLE_HTML = """<html>
+<head>
+<title>Article %(index)i about the news</title>
+<meta property="article:published_time" content="2021-05-%(day)02iT10:00:00Z">
+</head>
+<body>
+<article>
+<h1>Article %(index)i about the news</h1>
+<p>This is the first paragraph of article number %(index)i, which reports on something that happened in the city
+council yesterday. The members discussed the budget of the next year for a long time.</p>
+<p>The second paragraph of article %(index)i adds some more details, so that the extractors find enough text to
+consider this page an article and not a navigation page.</p>
+</article>
+</body>
+</html>
+"""
+
+
+def get_article_url(index):
+    return 'https://www.news-%i.example/articles/%i.html' % (index % 3, index)
+
+
+def write_warc(path, number_of_articles):
+    """
+    Writes a gzipped WARC file with a request and a response record for each of number_of_articles distinct articles,
+    i.e., like a WARC file of CC-NEWS
+    :return: the URLs of the articles in the order of their records
+    """
+    urls = []
+    with open(path, 'wb') as file:
+        writer = WARCWriter(file, gzip=True)
+        for index in range(number_of_articles):
+            url = get_article_url(index)
+            html = (ARTICLE_HTML % {'index': index, 'day': index % 28 + 1}).encode('utf-8')
+            request_headers = StatusAndHeaders('GET /articles/%i.html HTTP/1.1' % index,
+                                               [('Host', url.split('/')[2])], is_http_request=True)
+            writer.write_record(writer.create_warc_record(url, 'request', http_headers=request_headers))
+            response_headers = StatusAndHeaders('200 OK', [('Content-Type', 'text/html; charset=utf-8'),
+                                                           ('Content-Length', str(len(html)))],
+                                                protocol='HTTP/1.1')
+            writer.write_record(writer.create_warc_record(url, 'response', payload=io.BytesIO(html),
+                                                          http_headers=response_headers))
+            urls.append(url)
+    return urls
+
+
+def get_record_offsets(path):
+    """
+    :return: A list of (offset, length, type, url) tuples of all records of the WARC file at path
+    """
+    with open(path, 'rb') as file:
+        archive_iterator = ArchiveIterator(file)
+        records = []
+        for record in archive_iterator:
+            rec_type = record.rec_type
+            url = record.rec_headers.get_header('WARC-Target-URI')
+            # the iterator determines the length once the record has been read to its end
+            record.content_stream().read()
+            records.append((archive_iterator.get_record_offset(), archive_iterator.get_record_length(), rec_type,
+                            url))
+    return records
+
+
+@pytest.fixture
+def warc_file(tmp_path):
+    """
+    A WARC file with 12 articles in the served directory of http_server, see write_warc
+    :return: A tuple of the path and the URLs of the articles
+    """
+    directory = tmp_path / 'www'
+    directory.mkdir(exist_ok=True)
+    path = str(directory / 'CC-NEWS-20210501000000-00001.warc.gz')
+    return path, write_warc(path, 12)
+
+
+class _RangeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files of the directory of the server and supports single byte ranges. The response of a path can be
+    replaced by a (status, body) tuple in the responses dict of the server.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        self.server.requests.append((self.path, range_header))
+        if self.path in self.server.responses:
+            status, body = self.server.responses[self.path]
+            self.__send(status, body)
+            return
+
+        path = os.path.join(self.server.directory, self.path.lstrip('/'))
+        if not os.path.isfile(path):
+            self.__send(404, b'')
+            return
+        with open(path, 'rb') as file:
+            data = file.read()
+        match = re.match(r'bytes=(\d+)-(\d*)$', range_header or '')
+        if not match:
+            self.__send(200, data)
+            return
+        start = int(match.group(1))
+        end = min(int(match.group(2)), len(data) - 1) if match.group(2) else len(data) - 1
+        self.__send(206, data[start:end + 1], {'Content-Range': 'bytes %i-%i/%i' % (start, end, len(data))})
+
+    def __send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Accept-Ranges', 'bytes')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client may stop reading early
+            pass
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """
+    A local HTTP server for the directory www within tmp_path, see _RangeRequestHandler. The server has the attributes
+    url, directory, requests, i.e., a list of (path, Range header) tuples, and responses.
+    """
+    directory = tmp_path / 'www'
+    directory.mkdir(exist_ok=True)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _RangeRequestHandler)
+    server.daemon_threads = True
+    server.directory = str(directory)
+    server.requests = []
+    server.responses = {}
+    server.url = 'http://127.0.0.1:%i/' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
@@ -0,0 +1,65 @@
+from newsplease.NewsArticle import NewsArticle
+from newsplease.crawler.article_batch import CHECKPOINT, RESUME, ArticleBatcher, deserialize_article, serialize_article
+
+
+def _article(url):
+    article = NewsArticle()
+    article.url = url
+    article.title = 'Title of %s' % url
+    return article
+
+
+def test_serialized_article_is_restored():
+    article = _article('https://news.example/1.html')
+    assert deserialize_article(serialize_article(article)).get_dict() == article.get_dict()
+
+
+def test_batches_are_sent_when_full_and_on_completion():
+    batches = []
+    batcher = ArticleBatcher(batches.append, 2)
+    batcher.start_warc('warc-1')
+    for index in range(3):
+        batcher(_article('https://news.example/%i.html' % index))
+    assert [(url, len(articles), completed) for url, articles, completed, _ in batches] == [('warc-1', 2, False)]
+
+    batcher.flush(warc_completed=True)
+    batcher.flush(warc_completed=True)
+    assert [(url, len(articles), completed) for url, articles, completed, _ in batches] == [
+        ('warc-1', 2, False), ('warc-1', 1, True), ('warc-1', 0, True)]
+
+
+def test_flush_waits_until_the_batches_are_delivered():
+    queued = []
+    delivered = []
+
+    def wait_until_delivered():
+        delivered.extend(queued)
+        del queued[:]
+
+    batcher = ArticleBatcher(queued.append, 2, wait_until_delivered=wait_until_delivered)
+    batcher.start_warc('warc-1')
+    for index in range(3):
+        batcher(_article('https://news.example/%i.html' % index))
+    # full batches are only queued, so that the extraction continues while they are delivered
+    assert len(queued) == 1 and not delivered
+
+    batcher.flush()
+    assert not queued
+    assert [len(articles) for _, articles, _, _ in delivered] == [2, 1]
+
+    # a checkpoint without new articles still waits for the batches sent before
+    queued.append(('warc-0', [], True, None))
+    batcher.flush()
+    assert not queued and len(delivered) == 3
+
+
+def test_checkpoints_are_sent_even_without_articles():
+    batches = []
+    batcher = ArticleBatcher(batches.append, 2)
+    batcher.start_warc('warc-1', resume_offset=100)
+    batcher(_article('https://news.example/1.html'))
+    batcher.flush(checkpoint_offset=200)
+    batcher.flush(checkpoint_offset=300)
+    batcher.flush()
+    assert [(len(articles), completed, checkpoint) for _, articles, completed, checkpoint in batches] == [
+        (0, False, (RESUME, 100)), (1, False, (CHECKPOINT, 200)), (0, False, (CHECKPOINT, 300))]
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from conftest import ARTICLE_HTML
+from newsplease import NewsPlease
+
+pytest.importorskip('aiohttp')
+
+
+@pytest.fixture
+def article_urls(http_server):
+    urls = []
+    for index in range(6):
+        path = '%s/article-%i.html' % (http_server.directory, index)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(ARTICLE_HTML % {'index': index, 'day': index + 1})
+        urls.append(http_server.url + 'article-%i.html' % index)
+    return urls
+
+
+async def _collect(urls, stop_after=None, **kwargs):
+    results = []
+    async for url, article in NewsPlease.iter_urls_async(urls, timeout=10, **kwargs):
+        results.append((url, article))
+        if len(results) == stop_after:
+            break
+    return results
+
+
+def test_articles_are_yielded_as_they_are_extracted(article_urls, http_server):
+    missing_url = http_server.url + 'missing.html'
+    results = dict(asyncio.run(_collect(article_urls + [missing_url], max_concurrency=2)))
+
+    assert set(results) == set(article_urls + [missing_url])
+    assert results[missing_url] is None
+    assert results[article_urls[3]].title == 'Article 3 about the news'
+
+
+def test_iteration_can_stop_early(article_urls):
+    results = asyncio.run(_collect(article_urls, stop_after=2, max_concurrency=2))
+    assert len(results) == 2
+
+
+def test_from_urls_async_returns_the_crawled_articles(article_urls, http_server):
+    articles = NewsPlease.from_urls_concurrent(article_urls + [http_server.url + 'missing.html'], timeout=10)
+    assert set(articles) == set(article_urls)
@@ -0,0 +1,104 @@
+import datetime
+import json
+import os
+
+import pytest
+
+from conftest import get_record_offsets
+from newsplease.crawler.cdx_extractor import CdxExtractor, UrlPattern, query_cdx
+
+
+def test_domain_pattern_matches_subdomains():
+    pattern = UrlPattern('*.example.com')
+    assert pattern.match('https://example.com/')
+    assert pattern.match('http://www.example.com/news/1.html')
+    assert pattern.match('https://news.EXAMPLE.com:8080/1.html')
+    assert not pattern.match('https://example.com.evil.org/')
+    assert not pattern.match('https://notexample.com/')
+
+
+def test_prefix_pattern():
+    pattern = UrlPattern('example.com/news/*')
+    assert pattern.match('https://www.example.com/news/1.html')
+    assert pattern.match('http://example.com/news/')
+    assert not pattern.match('https://example.com/sports/1.html')
+    assert not pattern.match('https://news.example.com/news/1.html')
+
+
+def test_exact_pattern_ignores_scheme_and_www():
+    pattern = UrlPattern('https://www.example.com/news/1.html')
+    assert pattern.match('http://example.com/news/1.html')
+    assert not pattern.match('https://example.com/news/1.html?page=2')
+
+
+def _write_cdxj(path, captures):
+    with open(path, 'w', encoding='utf-8') as file:
+        for capture in captures:
+            file.write('%s %s %s\n' % ('com,example)/', capture.pop('timestamp'), json.dumps(capture)))
+
+
+def test_query_local_cdxj_file(tmp_path):
+    path = str(tmp_path / 'index.cdxj')
+    _write_cdxj(path, [
+        {'timestamp': '20240301120000', 'url': 'https://www.example.com/news/1.html', 'status': '200',
+         'mime-detected': 'text/html'},
+        # not successful
+        {'timestamp': '20240301120000', 'url': 'https://example.com/news/2.html', 'status': '404',
+         'mime-detected': 'text/html'},
+        # no HTML page
+        {'timestamp': '20240301120000', 'url': 'https://example.com/news/3.pdf', 'status': '200',
+         'mime-detected': 'application/pdf'},
+        # outside of the time window
+        {'timestamp': '20240201120000', 'url': 'https://example.com/news/4.html', 'status': '200'},
+        {'timestamp': '20240401120000', 'url': 'https://example.com/news/5.html', 'status': '200'},
+        # not matching the URL patterns
+        {'timestamp': '20240301120000', 'url': 'https://example.org/news/6.html', 'status': '200'},
+        {'timestamp': '20240302120000', 'url': 'https://other.org/7.html', 'status': '200', 'mime': 'text/html'},
+    ])
+    # a line that is not a capture
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write('\n')
+
+    captures = list(query_cdx(path, ['*.example.com', 'other.org/*'], from_date=datetime.datetime(2024, 3, 1),
+                              to_date=datetime.datetime(2024, 3, 31)))
+    assert [capture['url'] for capture in captures] == ['https://www.example.com/news/1.html',
+                                                        'https://other.org/7.html']
+    # the timestamp of the line is kept
+    assert [capture['timestamp'] for capture in captures] == ['20240301120000', '20240302120000']
+
+
+def _get_capture(path, response_index):
+    offset, length, _, url = [record for record in get_record_offsets(path) if record[2] == 'response'][response_index]
+    return {'url': url, 'filename': os.path.basename(path), 'offset': str(offset), 'length': str(length)}
+
+
+def test_fetch_record_with_range_request(http_server, warc_file):
+    path, urls = warc_file
+    capture = _get_capture(path, 3)
+
+    record = CdxExtractor().fetch_record(capture, cc_data_url=http_server.url)
+    assert record.rec_type == 'response'
+    assert record.rec_headers.get_header('WARC-Target-URI') == urls[3]
+    offset, length = int(capture['offset']), int(capture['length'])
+    assert http_server.requests == [('/' + capture['filename'], 'bytes=%i-%i' % (offset, offset + length - 1))]
+
+
+def test_fetch_record_with_short_response(http_server, warc_file):
+    path, _ = warc_file
+    capture = _get_capture(path, 3)
+    with open(path, 'rb') as file:
+        file.seek(int(capture['offset']))
+        http_server.responses['/' + capture['filename']] = (206, file.read(int(capture['length']) - 10))
+
+    with pytest.raises(IOError, match='instead of'):
+        CdxExtractor().fetch_record(capture, cc_data_url=http_server.url)
+
+
+def test_fetch_record_without_range_support(http_server, warc_file):
+    path, _ = warc_file
+    capture = _get_capture(path, 3)
+    with open(path, 'rb') as file:
+        http_server.responses['/' + capture['filename']] = (200, file.read())
+
+    with pytest.raises(IOError, match='status 200'):
+        CdxExtractor().fetch_record(capture, cc_data_url=http_server.url)
@@ -0,0 +1,187 @@
+import os
+import shutil
+import types
+
+import pytest
+
+from conftest import get_record_offsets
+from newsplease.NewsArticle import NewsArticle
+from newsplease.crawler.article_batch import RESUME, ArticleBatcher, deserialize_article
+from newsplease.crawler.commoncrawl_extractor import CommonCrawlExtractor
+from newsplease.crawler.warc_download import get_checkpoint_path, get_local_filepath
+from newsplease.helper_classes.checkpoint import read_json
+
+CHECKPOINT_INTERVAL = 4
+# the extraction is interrupted while the article of this response record is passed to the callback
+INTERRUPTED_RECORD = 6
+
+
+class _Interrupted(BaseException):
+    pass
+
+
+class _UrlExtractor(CommonCrawlExtractor):
+    """
+    Skips the article extraction, so that the articles are only identified by their URL
+    """
+
+    def _from_warc(self, record):
+        return types.SimpleNamespace(url=record.rec_headers.get_header('WARC-Target-URI'), source_domain=None,
+                                     date_publish=None, title=None)
+
+
+def _extract(warc_download_url, local_download_dir_warc, interrupt_after=None, **kwargs):
+    """
+    Extracts the WARC file with checkpoints and, if interrupt_after is not None, interrupts the extraction once this
+    number of articles has been extracted
+    :return: A tuple of the URLs of the extracted articles and the arguments of callback_on_warc_completed, if called
+    """
+    urls = []
+    completed = []
+
+    def on_article(article):
+        if len(urls) == interrupt_after:
+            raise _Interrupted()
+        urls.append(article.url)
+
+    def on_warc_completed(warc_path, passed, discarded, error, total):
+        completed.append((warc_path, passed, discarded, error, total))
+
+    try:
+        _UrlExtractor().extract_from_commoncrawl(warc_download_url, on_article,
+                                                 callback_on_warc_completed=on_warc_completed,
+                                                 local_download_dir_warc=local_download_dir_warc,
+                                                 continue_after_error=False, checkpoint_interval=CHECKPOINT_INTERVAL,
+                                                 **kwargs)
+    except _Interrupted:
+        assert interrupt_after is not None
+    return urls, completed
+
+
+def _assert_checkpoint(checkpoint_path, warc_download_url, warc_path, urls):
+    """
+    Checks that the checkpoint of the interrupted extraction points to the record after the last checkpoint_interval-th
+    response record before the interruption
+    :return: the index of the response record and the offset at which the extraction resumes
+    """
+    resume_index = INTERRUPTED_RECORD // CHECKPOINT_INTERVAL * CHECKPOINT_INTERVAL
+    checkpoint = read_json(checkpoint_path)
+    assert checkpoint['warc_url'] == warc_download_url
+    assert checkpoint['counters'] == [resume_index, 0, 0, resume_index]
+    responses = [record for record in get_record_offsets(warc_path) if record[2] == 'response']
+    offset, length, _, url = responses[resume_index - 1]
+    assert url == urls[resume_index - 1]
+    assert checkpoint['offset'] == offset + length
+    return resume_index, checkpoint['offset']
+
+
+def test_resume_from_checkpoint_in_local_file(warc_file, tmp_path):
+    path, articles = warc_file
+    warc_download_url = 'https://data.commoncrawl.org/crawl-data/CC-NEWS/2021/05/' + os.path.basename(path)
+    local_download_dir_warc = str(tmp_path / 'warc')
+    os.makedirs(local_download_dir_warc)
+    # the file was downloaded before, so that it is not requested
+    shutil.copy(path, get_local_filepath(local_download_dir_warc, warc_download_url))
+    checkpoint_path = get_checkpoint_path(local_download_dir_warc, warc_download_url)
+
+    urls, completed = _extract(warc_download_url, local_download_dir_warc, interrupt_after=INTERRUPTED_RECORD,
+                               delete_warc_after_extraction=False)
+    assert urls == articles[:INTERRUPTED_RECORD]
+    assert not completed
+    resume_index, _ = _assert_checkpoint(checkpoint_path, warc_download_url, path, articles)
+
+    urls, completed = _extract(warc_download_url, local_download_dir_warc, delete_warc_after_extraction=False)
+    # only the records after the checkpoint are extracted again
+    assert urls == articles[resume_index:]
+    assert completed == [(warc_download_url, len(articles), 0, 0, len(articles))]
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_resume_from_checkpoint_with_range_request(http_server, warc_file, tmp_path):
+    path, articles = warc_file
+    warc_download_url = http_server.url + os.path.basename(path)
+    local_download_dir_warc = str(tmp_path / 'warc')
+    checkpoint_path = get_checkpoint_path(local_download_dir_warc, warc_download_url)
+
+    urls, completed = _extract(warc_download_url, local_download_dir_warc, interrupt_after=INTERRUPTED_RECORD,
+                               stream_warc=True)
+    assert urls == articles[:INTERRUPTED_RECORD]
+    assert not completed
+    resume_index, offset = _assert_checkpoint(checkpoint_path, warc_download_url, path, articles)
+
+    urls, completed = _extract(warc_download_url, local_download_dir_warc, stream_warc=True)
+    assert http_server.requests[-1] == ('/' + os.path.basename(path), 'bytes=%i-' % offset)
+    assert urls == articles[resume_index:]
+    assert completed == [(warc_download_url, len(articles), 0, 0, len(articles))]
+    assert not os.path.exists(checkpoint_path)
+
+
+class _InterruptingExtractor(CommonCrawlExtractor):
+    """
+    Extracts articles that are only identified by their URL, like _UrlExtractor, and interrupts the extraction at the
+    response record with the index interrupt_at, if not None
+    """
+
+    def __init__(self, interrupt_at=None):
+        self.interrupt_at = interrupt_at
+        self.records = 0
+
+    def _from_warc(self, record):
+        if self.records == self.interrupt_at:
+            raise _Interrupted()
+        self.records += 1
+        article = NewsArticle()
+        article.url = record.rec_headers.get_header('WARC-Target-URI')
+        return article
+
+
+def _deliver_to(writer):
+    """
+    :return: a function that delivers the batches of an ArticleBatcher to writer like crawl_from_commoncrawl
+    """
+
+    def deliver(batch):
+        warc_download_url, articles, warc_completed, checkpoint = batch
+        if checkpoint is not None and checkpoint[0] == RESUME:
+            writer.resume_warc(warc_download_url, checkpoint[1])
+            return
+        if articles or warc_completed:
+            writer(warc_download_url, [deserialize_article(article) for article in articles], warc_completed)
+        if checkpoint is not None:
+            writer.save_checkpoint(warc_download_url, checkpoint[1])
+
+    return deliver
+
+
+@pytest.mark.parametrize('shard_per_warc', [False, True])
+def test_resumed_extraction_keeps_the_articles_saved_before_the_checkpoint(warc_file, tmp_path, shard_per_warc):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from newsplease.helper_classes.parquet_sink import ParquetShardWriter
+
+    path, articles = warc_file
+    warc_download_url = 'https://data.commoncrawl.org/crawl-data/CC-NEWS/2021/05/' + os.path.basename(path)
+    local_download_dir_warc = str(tmp_path / 'warc')
+    os.makedirs(local_download_dir_warc)
+    shutil.copy(path, get_local_filepath(local_download_dir_warc, warc_download_url))
+    output_dir = str(tmp_path / 'parquet')
+
+    for interrupt_at in (INTERRUPTED_RECORD, None):
+        writer = ParquetShardWriter(output_dir, shard_per_warc=shard_per_warc)
+        try:
+            _InterruptingExtractor(interrupt_at).extract_from_commoncrawl(
+                warc_download_url, ArticleBatcher(_deliver_to(writer), 2),
+                callback_on_warc_completed=lambda *args: None, local_download_dir_warc=local_download_dir_warc, delete_warc_after_extraction=False,
+                continue_after_error=False, checkpoint_interval=CHECKPOINT_INTERVAL)
+        except _Interrupted:
+            # the crawl is interrupted without closing the writer, so its open shards are lost
+            assert interrupt_at is not None
+            continue
+        writer.close()
+
+    assert writer.get_completed_warc_urls() == {warc_download_url}
+    manifest = read_json(os.path.join(output_dir, '_SUCCESS', os.path.basename(path)[:-len('.warc.gz')] + '.json'))
+    urls = []
+    for shard in manifest['shards']:
+        urls.extend(pq.read_table(os.path.join(output_dir, shard['path'])).column('url').to_pylist())
+    assert urls == articles
+    assert manifest['rows'] == len(articles)
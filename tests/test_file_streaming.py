@@ -0,0 +1,59 @@
+import threading
+import time
+
+from newsplease import NewsPlease
+from newsplease.crawler.simple_crawler import SimpleCrawler
+from newsplease.helper_classes.checkpoint import read_json
+
+
+def _slow_first_url(monkeypatch, seconds=0.5):
+    """
+    Replaces the crawling of urls, so that the url with key 0 takes seconds and all others return at once
+    :return: A list to which the keys started while the first url is crawled are appended
+    """
+    started_while_slow = []
+    slow_done = threading.Event()
+
+    def fetch_keyed_url(key, url, timeout=None):
+        if key == 0:
+            time.sleep(seconds)
+            slow_done.set()
+        elif not slow_done.is_set():
+            started_while_slow.append(key)
+        return key, url, None
+
+    monkeypatch.setattr(SimpleCrawler, '_fetch_keyed_url', staticmethod(fetch_keyed_url))
+    return started_while_slow
+
+
+def test_slow_url_holds_back_the_following_urls(monkeypatch):
+    started_while_slow = _slow_first_url(monkeypatch)
+    keyed_urls = [(key, 'https://news.example/%i.html' % key) for key in range(50)]
+
+    results = list(SimpleCrawler.iter_keyed_urls(keyed_urls, max_workers=4, max_keys_ahead=8))
+    assert sorted(key for key, _, _ in results) == list(range(50))
+    assert started_while_slow and max(started_while_slow) < 8
+
+
+def test_without_limit_the_urls_run_ahead(monkeypatch):
+    started_while_slow = _slow_first_url(monkeypatch)
+    keyed_urls = [(key, 'https://news.example/%i.html' % key) for key in range(50)]
+
+    list(SimpleCrawler.iter_keyed_urls(keyed_urls, max_workers=4))
+    assert max(started_while_slow) == 49
+
+
+def test_file_is_streamed_to_the_sink_with_checkpoint(monkeypatch, tmp_path):
+    _slow_first_url(monkeypatch, seconds=0.1)
+    path = tmp_path / 'urls.txt'
+    urls = ['https://news.example/%i.html' % index for index in range(30)]
+    path.write_text('\n'.join(urls[:10] + [''] + urls[10:]) + '\n')
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+
+    received = []
+    processed = NewsPlease.from_file_streaming(str(path), lambda url, article: received.append(url),
+                                               checkpoint_path=checkpoint_path, checkpoint_interval=7,
+                                               max_workers=4, max_lines_ahead=5)
+    assert processed == len(urls)
+    assert sorted(received) == sorted(urls)
+    assert read_json(checkpoint_path)['line'] == len(urls) + 1
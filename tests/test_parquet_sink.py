@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+from newsplease.NewsArticle import NewsArticle
+from newsplease.crawler.warc_ledger import DONE, QUEUED, WarcLedger
+from newsplease.helper_classes.checkpoint import read_json
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+from newsplease.helper_classes.parquet_sink import CHECKPOINT_DIR, MANIFEST_DIR, ParquetShardWriter  # noqa: E402
+
+WARC_1 = 'https://data.commoncrawl.org/crawl-data/CC-NEWS/2021/05/CC-NEWS-20210501000000-00001.warc.gz'
+WARC_2 = 'https://data.commoncrawl.org/crawl-data/CC-NEWS/2021/05/CC-NEWS-20210501000000-00002.warc.gz'
+
+
+def _articles(count, prefix):
+    articles = []
+    for index in range(count):
+        article = NewsArticle()
+        article.url = 'https://news.example/%s/%i.html' % (prefix, index)
+        article.title = 'Article %i' % index
+        article.date_publish = '2021-05-01 10:00:00'
+        articles.append(article)
+    return articles
+
+
+def test_manifest_is_written_once_the_shard_is_complete(tmp_path):
+    output_dir = str(tmp_path / 'parquet')
+    writer = ParquetShardWriter(output_dir, row_group_size=2)
+    writer(WARC_1, _articles(3, 'a'), False)
+    writer(WARC_1, [], True)
+    writer(WARC_2, _articles(2, 'b'), True)
+    # the articles of both WARC files are still in the open shard, which would be lost if the crawl was interrupted
+    assert writer.get_completed_warc_urls() == set()
+    assert not [name for name in os.listdir(output_dir) if name.endswith('.parquet')]
+
+    writer.close()
+    assert writer.get_completed_warc_urls() == {WARC_1, WARC_2}
+    shards = [name for name in os.listdir(output_dir) if name.endswith('.parquet')]
+    assert len(shards) == 1
+    table = pq.read_table(os.path.join(output_dir, shards[0]))
+    assert table.column('warc_url').to_pylist() == [WARC_1] * 3 + [WARC_2] * 2
+    assert sorted(os.listdir(os.path.join(output_dir, MANIFEST_DIR))) == [
+        'CC-NEWS-20210501000000-00001.json', 'CC-NEWS-20210501000000-00002.json']
+
+
+def test_shard_per_warc_is_complete_with_its_warc(tmp_path):
+    writer = ParquetShardWriter(str(tmp_path / 'parquet'), shard_per_warc=True)
+    writer(WARC_1, _articles(3, 'a'), False)
+    assert writer.get_completed_warc_urls() == set()
+    writer(WARC_1, [], True)
+    assert writer.get_completed_warc_urls() == {WARC_1}
+    writer.close()
+
+
+def _read_manifest_rows(output_dir, warc_download_url):
+    """
+    :return: the URLs of the articles of a WARC file in the shards listed in its manifest
+    """
+    manifest = read_json(os.path.join(output_dir, MANIFEST_DIR, os.path.basename(warc_download_url)[:-8] + '.json'))
+    urls = []
+    for shard in manifest['shards']:
+        table = pq.read_table(os.path.join(output_dir, shard['path']))
+        urls.extend(url for url, warc_url in zip(table.column('url').to_pylist(),
+                                                  table.column('warc_url').to_pylist()) if warc_url == warc_download_url)
+    assert len(urls) == manifest['rows']
+    return urls
+
+
+@pytest.mark.parametrize('shard_per_warc', [False, True])
+def test_checkpoint_saves_the_shards_of_a_resumed_warc(tmp_path, shard_per_warc):
+    output_dir = str(tmp_path / 'parquet')
+    articles = _articles(6, 'a')
+    writer = ParquetShardWriter(output_dir, shard_per_warc=shard_per_warc)
+    writer.resume_warc(WARC_1, 0)
+    writer(WARC_1, articles[:2], False)
+    writer.save_checkpoint(WARC_1, 100)
+    writer(WARC_1, articles[2:4], False)
+    writer.save_checkpoint(WARC_1, 200)
+    # interrupted with articles after the checkpoint in an open shard, which are lost
+    writer(WARC_1, articles[4:5], False)
+
+    # the extraction resumes from the checkpoint at 200, the checkpoint at 100 is discarded
+    writer = ParquetShardWriter(output_dir, shard_per_warc=shard_per_warc)
+    writer.resume_warc(WARC_1, 200)
+    assert [checkpoint['offset'] for checkpoint in read_json(os.path.join(output_dir, CHECKPOINT_DIR,
+                                                                          'CC-NEWS-20210501000000-00001.json'))[
+        'checkpoints']] == [200]
+    writer(WARC_1, articles[4:], True)
+    writer.close()
+    assert writer.get_completed_warc_urls() == {WARC_1}
+    assert _read_manifest_rows(output_dir, WARC_1) == [article.url for article in articles]
+    assert not os.listdir(os.path.join(output_dir, CHECKPOINT_DIR))
+
+
+def test_checkpoints_are_ignored_if_the_warc_is_extracted_from_its_start(tmp_path):
+    output_dir = str(tmp_path / 'parquet')
+    articles = _articles(4, 'a')
+    writer = ParquetShardWriter(output_dir)
+    writer.resume_warc(WARC_1, 0)
+    writer(WARC_1, articles[:2], False)
+    writer.save_checkpoint(WARC_1, 100)
+
+    writer = ParquetShardWriter(output_dir)
+    writer.resume_warc(WARC_1, 0)
+    writer(WARC_1, articles, True)
+    writer.close()
+    assert _read_manifest_rows(output_dir, WARC_1) == [article.url for article in articles]
+
+
+def test_requeue_resets_done_warcs(tmp_path):
+    ledger = WarcLedger(str(tmp_path / 'warcs.sqlite'))
+    ledger.queue([WARC_1, WARC_2])
+    for warc_download_url in (WARC_1, WARC_2):
+        ledger.start(warc_download_url)
+        ledger.complete(warc_download_url, 3, 0, 0, 3)
+
+    ledger.requeue([WARC_2])
+    assert ledger.get_urls(DONE) == {WARC_1}
+    assert ledger.get_urls(QUEUED) == {WARC_2}
+    assert ledger.get_status()['articles']['passed'] == 3
+
+
+def test_deduplication_requires_a_shard_per_warc(tmp_path):
+    from newsplease.crawler.commoncrawl_crawler import crawl_from_commoncrawl
+
+    with pytest.raises(ValueError):
+        crawl_from_commoncrawl(lambda article: None, callback_on_article_batch=ParquetShardWriter(str(tmp_path / 'pq')),
+                               duplicate_filter_dir=str(tmp_path / 'duplicates'),
+                               local_download_dir_warc=str(tmp_path / 'warc'))
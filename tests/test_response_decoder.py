@@ -0,0 +1,15 @@
+from newsplease.crawler.response_decoder import decode_content
+
+
+def test_utf8_content_is_decoded_regardless_of_the_fallback():
+    html = '<html><body>Größere Nachrichten – 日本</body></html>'
+    assert decode_content(html.encode('utf-8'), 'iso-8859-1') == html
+
+
+def test_other_content_is_decoded_with_the_guessed_encoding():
+    html = '<html><body>%s</body></html>' % ('Привет, это новости из Москвы. ' * 20)
+    assert decode_content(html.encode('windows-1251'), None) == html
+
+
+def test_unknown_fallback_encoding_is_replaced():
+    assert decode_content(b'\xff\xfe\xfa', 'no-such-encoding') is not None
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import shutil
+import types
+
+from warcio.statusandheaders import StatusAndHeaders
+
+from newsplease.NewsArticle import NewsArticle
+from newsplease.crawler.commoncrawl_extractor import CommonCrawlExtractor
+from newsplease.crawler.warc_dedup import RecordDeduplicator, normalize_url
+from newsplease.crawler.warc_download import get_local_filepath
+from newsplease.helper_classes.bloom_filter import BloomFilter
+
+WARC_DOWNLOAD_URL = 'https://data.commoncrawl.org/crawl-data/CC-NEWS/2021/05/CC-NEWS-20210501000000-00001.warc.gz'
+
+
+def _bloom_filter(path):
+    return BloomFilter(str(path), capacity=1000, error_rate=0.001, number_of_shards=4)
+
+
+def _record(digest, url='https://news.example/1.html'):
+    return types.SimpleNamespace(rec_headers=StatusAndHeaders('', [('WARC-Payload-Digest', digest),
+                                                                   ('WARC-Target-URI', url)]))
+
+
+def _add_keys(bloom_filter, keys):
+    bloom_filter.update(keys)
+    bloom_filter.close()
+
+
+def test_bloom_filter_is_shared_by_processes(tmp_path):
+    bloom_filter = _bloom_filter(tmp_path / 'bloom')
+    assert 'digest:a' not in bloom_filter
+
+    # the filter is pickled and maps the files again in the other process
+    process = multiprocessing.Process(target=_add_keys, args=(bloom_filter, ['digest:a', 'digest:b']))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert 'digest:a' in bloom_filter and 'digest:b' in bloom_filter
+    assert 'digest:c' not in bloom_filter
+
+
+def test_bloom_filter_persists_across_runs(tmp_path):
+    bloom_filter = _bloom_filter(tmp_path / 'bloom')
+    bloom_filter.update('digest:%i' % index for index in range(100))
+    bloom_filter.close()
+
+    # the parameters of the existing filter are used
+    reopened = BloomFilter(str(tmp_path / 'bloom'), capacity=10)
+    assert reopened.capacity == 1000
+    assert all('digest:%i' % index in reopened for index in range(100))
+    false_positives = sum('other:%i' % index in reopened for index in range(1000))
+    assert false_positives < 10
+
+
+def test_keys_are_added_to_the_filter_only_on_commit(tmp_path):
+    bloom_filter = _bloom_filter(tmp_path / 'bloom')
+    deduplicator = RecordDeduplicator(bloom_filter)
+    assert not deduplicator.is_duplicate(_record('sha1:A'))
+    # duplicates within the same WARC file are detected before the commit
+    assert deduplicator.is_duplicate(_record('sha1:A'))
+    assert 'digest:sha1:A' not in bloom_filter
+
+    deduplicator.commit()
+    assert 'digest:sha1:A' in bloom_filter
+    assert RecordDeduplicator(bloom_filter).is_duplicate(_record('sha1:A'))
+
+
+def test_urls_are_deduplicated_if_configured(tmp_path):
+    deduplicator = RecordDeduplicator(_bloom_filter(tmp_path / 'bloom'), deduplicate_urls=True)
+    assert not deduplicator.is_duplicate(_record('sha1:A', 'https://www.news.example/1.html?utm_source=x'))
+    assert deduplicator.is_duplicate(_record('sha1:B', 'http://news.example/1.html/'))
+    assert normalize_url('https://WWW.news.example/1.html?b=2&a=1#top') == 'news.example/1.html?a=1&b=2'
+
+
+def test_aborted_warc_releases_its_in_flight_keys(tmp_path):
+    bloom_filter = _bloom_filter(tmp_path / 'bloom')
+    in_flight_keys = set()
+    failed = RecordDeduplicator(bloom_filter, in_flight_keys=in_flight_keys)
+    other = RecordDeduplicator(bloom_filter, in_flight_keys=in_flight_keys)
+    assert not failed.is_duplicate(_record('sha1:A'))
+    # the records of WARC files that are read at the same time are duplicates of each other
+    assert other.is_duplicate(_record('sha1:A'))
+
+    failed.abort()
+    assert not in_flight_keys
+    assert not other.is_duplicate(_record('sha1:A'))
+    assert 'digest:sha1:A' not in bloom_filter
+
+
+class _UrlExtractor(CommonCrawlExtractor):
+    """
+    Skips the article extraction, so that the articles are only identified by their URL
+    """
+
+    def _from_warc(self, record):
+        article = NewsArticle()
+        article.url = record.rec_headers.get_header('WARC-Target-URI')
+        return article
+
+
+class _Interrupted(BaseException):
+    pass
+
+
+def _extract(local_download_dir_warc, duplicate_filter, interrupt_after=None, checkpoint_interval=0):
+    """
+    Extracts the WARC file and, if interrupt_after is not None, interrupts the extraction once this number of articles
+    has been extracted
+    :return: A tuple of the URLs of the extracted articles and the filter stage counters of the WARC file, if completed
+    """
+    urls = []
+    completed = []
+
+    def on_article(article):
+        if len(urls) == interrupt_after:
+            raise _Interrupted()
+        urls.append(article.url)
+
+    def on_warc_completed(warc_path, passed, discarded, error, total, filter_stage_counters=None):
+        completed.append(filter_stage_counters)
+
+    try:
+        _UrlExtractor().extract_from_commoncrawl(WARC_DOWNLOAD_URL, on_article,
+                                                 callback_on_warc_completed=on_warc_completed,
+                                                 local_download_dir_warc=local_download_dir_warc,
+                                                 delete_warc_after_extraction=False, continue_after_error=False,
+                                                 duplicate_filter=duplicate_filter,
+                                                 checkpoint_interval=checkpoint_interval)
+    except _Interrupted:
+        assert interrupt_after is not None
+    return urls, completed[0] if completed else None
+
+
+def _copy_warc_file(path, tmp_path):
+    local_download_dir_warc = str(tmp_path / 'warc')
+    os.makedirs(local_download_dir_warc)
+    shutil.copy(path, get_local_filepath(local_download_dir_warc, WARC_DOWNLOAD_URL))
+    return local_download_dir_warc
+
+
+def test_records_of_a_completed_warc_are_discarded_as_duplicates(warc_file, tmp_path):
+    path, articles = warc_file
+    local_download_dir_warc = _copy_warc_file(path, tmp_path)
+
+    urls, filter_stage_counters = _extract(local_download_dir_warc, _bloom_filter(tmp_path / 'bloom'))
+    assert urls == articles
+    assert not filter_stage_counters.get('duplicate_discarded')
+
+    # e.g., a later crawl with the same filter
+    urls, filter_stage_counters = _extract(local_download_dir_warc, _bloom_filter(tmp_path / 'bloom'))
+    assert urls == []
+    assert filter_stage_counters['duplicate_discarded'] == len(articles)
+
+
+def test_records_after_the_last_checkpoint_are_not_duplicates(warc_file, tmp_path):
+    path, articles = warc_file
+    local_download_dir_warc = _copy_warc_file(path, tmp_path)
+
+    urls, filter_stage_counters = _extract(local_download_dir_warc, _bloom_filter(tmp_path / 'bloom'),
+                                           interrupt_after=6, checkpoint_interval=4)
+    assert urls == articles[:6] and filter_stage_counters is None
+
+    # the articles of the records after the checkpoint may be lost, so these records are extracted again
+    urls, filter_stage_counters = _extract(local_download_dir_warc, _bloom_filter(tmp_path / 'bloom'),
+                                           checkpoint_interval=4)
+    assert urls == articles[4:]
+    assert not filter_stage_counters.get('duplicate_discarded')
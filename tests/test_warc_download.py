@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from newsplease.crawler.warc_download import DownloadSizeError, download_file, is_downloaded
+
+
+def _partial_download(path, local_filepath, size):
+    with open(path, 'rb') as file, open(local_filepath + '.part', 'wb') as part_file:
+        part_file.write(file.read(size))
+
+
+def test_download_is_resumed_with_a_range_request(http_server, warc_file, tmp_path):
+    path, _ = warc_file
+    file_size = os.path.getsize(path)
+    local_filepath = str(tmp_path / 'local.warc.gz')
+    offset = file_size // 3
+    _partial_download(path, local_filepath, offset)
+    progress = []
+
+    download_file(http_server.url + os.path.basename(path), local_filepath, expected_size=file_size,
+                  verify_gzip=True, reporthook=lambda blocknum, blocksize, totalsize: progress.append(
+                      (blocknum * blocksize, totalsize)))
+
+    assert http_server.requests == [('/' + os.path.basename(path), 'bytes=%i-' % offset)]
+    with open(path, 'rb') as original, open(local_filepath, 'rb') as downloaded:
+        assert original.read() == downloaded.read()
+    assert not os.path.exists(local_filepath + '.part')
+    assert is_downloaded(local_filepath, file_size)
+    # the progress includes the part that was downloaded before
+    assert progress[0][0] > offset
+    assert progress[-1] == (file_size, file_size)
+
+
+def test_download_is_restarted_without_range_support(http_server, warc_file, tmp_path):
+    path, _ = warc_file
+    with open(path, 'rb') as file:
+        data = file.read()
+    http_server.responses['/' + os.path.basename(path)] = (200, data)
+    local_filepath = str(tmp_path / 'local.warc.gz')
+    _partial_download(path, local_filepath, 100)
+
+    download_file(http_server.url + os.path.basename(path), local_filepath, expected_size=len(data))
+
+    with open(local_filepath, 'rb') as downloaded:
+        assert downloaded.read() == data
+
+
+def test_download_of_wrong_size_is_rejected(http_server, warc_file, tmp_path):
+    path, _ = warc_file
+    local_filepath = str(tmp_path / 'local.warc.gz')
+
+    with pytest.raises(DownloadSizeError):
+        download_file(http_server.url + os.path.basename(path), local_filepath,
+                      expected_size=os.path.getsize(path) + 1)
+    assert not os.path.exists(local_filepath)
+    assert not os.path.exists(local_filepath + '.part')
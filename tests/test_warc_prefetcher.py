@@ -0,0 +1,53 @@
+import os
+import threading
+
+from newsplease.crawler.commoncrawl_crawler import _WarcPrefetcher
+
+
+def _iterate(prefetcher, timeout=30):
+    """
+    Iterates prefetcher in a thread, so that a test fails instead of hanging if the iteration does not end
+    :return: A tuple of the yielded items and the raised error
+    """
+    result = {'items': [], 'error': None}
+
+    def iterate():
+        try:
+            for warc_download_url, size in prefetcher:
+                result['items'].append((warc_download_url, size))
+                prefetcher.release(size)
+        except Exception as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=iterate, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'the iteration of the prefetched WARC files does not end'
+    return result['items'], result['error']
+
+
+def test_prefetches_the_warc_files(http_server, warc_file, tmp_path):
+    path, _ = warc_file
+    warc_download_url = http_server.url + os.path.basename(path)
+    local_download_dir_warc = tmp_path / 'warc'
+    local_download_dir_warc.mkdir()
+    prefetcher = _WarcPrefetcher([warc_download_url], str(local_download_dir_warc), False, 1024 ** 2, 2)
+
+    items, error = _iterate(prefetcher)
+    assert error is None
+    assert items == [(warc_download_url, os.path.getsize(path))]
+
+
+def test_error_of_the_prefetching_thread_is_raised(http_server, warc_file, tmp_path):
+    path, _ = warc_file
+    warc_download_urls = [http_server.url + os.path.basename(path), http_server.url + 'CC-NEWS-2.warc.gz']
+
+    def acquire(warc_download_url):
+        if warc_download_url == warc_download_urls[1]:
+            raise OSError('lease directory not available')
+        return True
+
+    prefetcher = _WarcPrefetcher(warc_download_urls, str(tmp_path / 'warc'), False, 1024 ** 2, 2, acquire=acquire)
+    items, error = _iterate(prefetcher)
+    assert [warc_download_url for warc_download_url, _ in items] == warc_download_urls[:1]
+    assert isinstance(error, OSError)
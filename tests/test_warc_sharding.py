@@ -0,0 +1,91 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from newsplease.crawler.warc_sharding import LeaseDirectory, assign_shards, get_shard_index
+
+WARC_URLS = ['https://data.commoncrawl.org/crawl-data/CC-NEWS/2021/05/CC-NEWS-20210501000000-%05i.warc.gz' % index
+             for index in range(1, 9)]
+
+
+def test_shards_are_stable():
+    # the assignment must never change, since nodes of different versions have to agree on it
+    assert [get_shard_index(url, 4) for url in WARC_URLS] == [3, 1, 1, 1, 0, 0, 3, 0]
+    # only the name of the WARC file counts, not the mirror it is downloaded from
+    assert get_shard_index('http://127.0.0.1:8767/CC-NEWS-20210501000000-00001.warc.gz', 4) == 3
+
+
+def test_shards_partition_the_warc_files():
+    shards = [assign_shards(WARC_URLS, shard_index, 3) for shard_index in range(3)]
+    assert sorted(url for shard in shards for url in shard) == sorted(WARC_URLS)
+    for shard in shards:
+        # the order of the listing is kept
+        assert shard == [url for url in WARC_URLS if url in shard]
+
+
+def test_stealing_appends_the_other_shards_in_reverse_order():
+    own_urls = assign_shards(WARC_URLS, 1, 4)
+    other_urls = [url for url in WARC_URLS if url not in own_urls]
+    assert assign_shards(WARC_URLS, 1, 4, steal=True) == own_urls + other_urls[::-1]
+
+
+def test_invalid_shard_index():
+    with pytest.raises(ValueError):
+        assign_shards(WARC_URLS, 4, 4)
+
+
+def test_only_one_node_takes_a_lease(tmp_path):
+    lease_dir = str(tmp_path / 'leases')
+    nodes = [LeaseDirectory(lease_dir, node_id='node-%i' % index) for index in range(16)]
+    with ThreadPoolExecutor(len(nodes)) as executor:
+        acquired = list(executor.map(lambda node: node.acquire(WARC_URLS[0]), nodes))
+    assert acquired.count(True) == 1
+
+    owner = nodes[acquired.index(True)]
+    # the owner may take its lease again, e.g., after a restart
+    assert owner.acquire(WARC_URLS[0])
+    assert not any(node.acquire(WARC_URLS[0]) for node in nodes if node is not owner)
+    # the leases of other WARC files are independent
+    assert any(node.acquire(WARC_URLS[1]) for node in nodes if node is not owner)
+
+
+def _expire(lease_dir, warc_download_url, seconds):
+    lease_path = os.path.join(lease_dir, os.path.basename(warc_download_url) + '.lease')
+    past = time.time() - seconds
+    os.utime(lease_path, (past, past))
+
+
+def test_expired_lease_is_taken_over_by_one_node(tmp_path):
+    lease_dir = str(tmp_path / 'leases')
+    crashed = LeaseDirectory(lease_dir, node_id='crashed', lease_timeout=60)
+    assert crashed.acquire(WARC_URLS[0])
+    nodes = [LeaseDirectory(lease_dir, node_id='node-%i' % index, lease_timeout=60) for index in range(8)]
+    assert not any(node.acquire(WARC_URLS[0]) for node in nodes)
+
+    _expire(lease_dir, WARC_URLS[0], 120)
+    with ThreadPoolExecutor(len(nodes)) as executor:
+        acquired = list(executor.map(lambda node: node.acquire(WARC_URLS[0]), nodes))
+    assert acquired.count(True) == 1
+    # the crashed node lost its lease
+    assert not crashed.acquire(WARC_URLS[0])
+    assert not [name for name in os.listdir(lease_dir) if '.expired.' in name]
+
+
+def test_leases_without_timeout_never_expire(tmp_path):
+    lease_dir = str(tmp_path / 'leases')
+    assert LeaseDirectory(lease_dir, node_id='crashed', lease_timeout=None).acquire(WARC_URLS[0])
+    _expire(lease_dir, WARC_URLS[0], 10 ** 6)
+    assert not LeaseDirectory(lease_dir, node_id='other', lease_timeout=None).acquire(WARC_URLS[0])
+
+
+def test_completed_lease_is_never_taken_again(tmp_path):
+    lease_dir = str(tmp_path / 'leases')
+    node = LeaseDirectory(lease_dir, node_id='node', lease_timeout=60)
+    assert node.acquire(WARC_URLS[0])
+    node.complete(WARC_URLS[0])
+    _expire(lease_dir, WARC_URLS[0], 120)
+
+    assert not LeaseDirectory(lease_dir, node_id='other', lease_timeout=60).acquire(WARC_URLS[0])
+    assert not node.acquire(WARC_URLS[0])
@@ -0,0 +1,119 @@
+import io
+import os
+
+import pytest
+from warcio.archiveiterator import ArchiveIterator
+
+from conftest import get_record_offsets
+from newsplease.crawler.warc_stream import ReadAheadStream, open_remote_stream
+
+
+def _read_records(stream):
+    """
+    :return: A list of (offset, length, type, url) tuples of the records of stream, see get_record_offsets
+    """
+    archive_iterator = ArchiveIterator(stream)
+    records = []
+    for record in archive_iterator:
+        rec_type = record.rec_type
+        url = record.rec_headers.get_header('WARC-Target-URI')
+        record.content_stream().read()
+        records.append((archive_iterator.get_record_offset(), archive_iterator.get_record_length(), rec_type, url))
+    return records
+
+
+def test_tee_is_renamed_once_the_source_is_read_completely(tmp_path):
+    data = os.urandom(10 * 1024 + 17)
+    tee_path = str(tmp_path / 'file.warc.gz')
+
+    with ReadAheadStream(io.BytesIO(data), tee_path=tee_path, expected_size=len(data), chunk_size=1024,
+                         max_buffered_chunks=2) as stream:
+        assert stream.read(100) == data[:100]
+        assert os.path.exists(tee_path + '.part')
+        assert not os.path.exists(tee_path)
+        assert stream.read() == data[100:]
+        assert stream.completed
+
+    assert not os.path.exists(tee_path + '.part')
+    with open(tee_path, 'rb') as file:
+        assert file.read() == data
+
+
+def test_tee_is_deleted_if_the_source_is_not_read_completely(tmp_path):
+    tee_path = str(tmp_path / 'file.warc.gz')
+
+    with ReadAheadStream(io.BytesIO(os.urandom(100 * 1024)), tee_path=tee_path, chunk_size=1024,
+                         max_buffered_chunks=2) as stream:
+        stream.read(10)
+        assert not stream.completed
+
+    assert not os.path.exists(tee_path + '.part')
+    assert not os.path.exists(tee_path)
+
+
+def test_source_that_ends_early_raises(tmp_path):
+    tee_path = str(tmp_path / 'file.warc.gz')
+
+    with ReadAheadStream(io.BytesIO(b'x' * 100), tee_path=tee_path, expected_size=200) as stream:
+        with pytest.raises(IOError):
+            stream.read()
+        assert not stream.completed
+
+    assert not os.path.exists(tee_path + '.part')
+    assert not os.path.exists(tee_path)
+
+
+def test_tell_includes_offset():
+    with ReadAheadStream(io.BytesIO(b'x' * 100), offset=1000, chunk_size=30) as stream:
+        assert stream.tell() == 1000
+        # a raw stream returns at most the rest of the current chunk
+        assert len(stream.read(20)) == 20
+        assert stream.tell() == 1020
+        stream.read()
+        assert stream.tell() == 1100
+
+
+def test_remote_stream_tees_the_whole_file(http_server, warc_file, tmp_path):
+    path, urls = warc_file
+    tee_path = str(tmp_path / 'local.warc.gz')
+
+    with open_remote_stream(http_server.url + os.path.basename(path), tee_path=tee_path) as stream:
+        records = _read_records(stream)
+
+    assert records == get_record_offsets(path)
+    assert [url for _, _, rec_type, url in records if rec_type == 'response'] == urls
+    with open(path, 'rb') as original, open(tee_path, 'rb') as tee:
+        assert original.read() == tee.read()
+    assert not os.path.exists(tee_path + '.part')
+
+
+def test_remote_stream_resumes_at_offset_with_a_range_request(http_server, warc_file):
+    path, _ = warc_file
+    all_records = get_record_offsets(path)
+    # resume at the fifth response record
+    start = [index for index, record in enumerate(all_records) if record[2] == 'response'][4]
+    offset = all_records[start][0]
+
+    with open_remote_stream(http_server.url + os.path.basename(path), offset=offset) as stream:
+        assert stream.tell() == offset
+        records = _read_records(stream)
+
+    # the offsets within the whole file are reported, so they can be saved in a checkpoint again
+    assert records == all_records[start:]
+    assert http_server.requests[-1] == ('/' + os.path.basename(path), 'bytes=%i-' % offset)
+
+
+def test_remote_stream_requires_range_support(http_server, warc_file):
+    path, _ = warc_file
+    with open(path, 'rb') as file:
+        http_server.responses['/' + os.path.basename(path)] = (200, file.read())
+
+    with pytest.raises(IOError):
+        open_remote_stream(http_server.url + os.path.basename(path), offset=100)
+
+
+def test_remote_stream_cannot_tee_a_partial_file(http_server, warc_file, tmp_path):
+    path, _ = warc_file
+    with pytest.raises(ValueError):
+        open_remote_stream(http_server.url + os.path.basename(path), tee_path=str(tmp_path / 'local.warc.gz'),
+                           offset=100)